@@ -0,0 +1,115 @@
+"""
+Micro-benchmark of list response serialization, default path versus
+FAST_JSON_RESPONSES, on synthetic pages. Needs no database:
+
+    python bench_serialization.py --receipts 1000 --items 25 --repeat 20
+
+The default path is what FastAPI does with a response_model: build the
+page model, re-validate it against the response field, dump it to JSON
+types and encode with the stdlib json module.
+"""
+import time
+import asyncio
+import argparse
+import random
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Callable
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from models import Page, Receipt, CreditLog
+from serialization import fast_json_response, RECEIPT_PAGE
+
+def synthetic_receipts(count: int, items: int) -> List[Dict[str, Any]]:
+    now = datetime.utcnow()
+    receipts = []
+    for i in range(count):
+        created = now - timedelta(hours=i)
+        receipts.append({
+            "id": str(uuid.uuid4()),
+            "supermarket": random.choice(["Tesco", "Sainsbury's", "Aldi", "Lidl"]),
+            "store_location": "London",
+            "purchase_date": created.date().isoformat(),
+            "total_amount": round(random.uniform(5, 150), 2),
+            "items": [
+                {
+                    "name": f"ITEM {j}",
+                    "canonical_name": f"item {j}",
+                    "category": "Other",
+                    "quantity": 1.0,
+                    "unit_price": 1.5,
+                    "total_price": 1.5,
+                    "approval_state": "approved",
+                    "approved_at": created
+                }
+                for j in range(items)
+            ],
+            "receipt_image_urls": [f"https://example.com/{i}.jpg"],
+            "currency": "GBP",
+            "validation_status": "validated",
+            "receipt_insights": {"summary": "Weekly shop", "highlights": ["Milk up 5%"]},
+            "household_id": "household",
+            "user_email": "user@example.com",
+            "created_date": created,
+            "updated_date": created
+        })
+    return receipts
+
+def synthetic_credit_logs(count: int) -> List[Dict[str, Any]]:
+    now = datetime.utcnow()
+    return [
+        CreditLog(
+            user_id="user", user_email="user@example.com", household_id="household",
+            event_type="ocr_textract", credits_consumed=1, reference_id=str(uuid.uuid4()),
+            timestamp=now - timedelta(minutes=i)
+        ).model_dump()
+        for i in range(count)
+    ]
+
+def best_ms(fn: Callable[[], bytes], repeat: int) -> float:
+    fn()
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings) * 1000
+
+def main(receipt_count: int, items: int, repeat: int) -> None:
+    receipt_page = {"items": synthetic_receipts(receipt_count, items), "next_cursor": None}
+    log_page = {"items": synthetic_credit_logs(receipt_count), "next_cursor": None}
+    receipt_field = create_response_field(name="Response_get_receipts", type_=Page[Receipt])
+    loop = asyncio.new_event_loop()
+
+    def default_receipts() -> bytes:
+        content = loop.run_until_complete(
+            serialize_response(field=receipt_field, response_content=Page[Receipt](**receipt_page))
+        )
+        return JSONResponse(content).body
+
+    def default_logs() -> bytes:
+        return JSONResponse(jsonable_encoder(log_page)).body
+
+    assert len(default_receipts()) == len(fast_json_response(receipt_page, RECEIPT_PAGE).body)
+
+    per_thousand = 1000 / receipt_count
+    for label, default, fast in (
+        (f"receipts ({items} items each)", default_receipts, lambda: fast_json_response(receipt_page, RECEIPT_PAGE).body),
+        ("credit logs", default_logs, lambda: fast_json_response(log_page).body)
+    ):
+        before = best_ms(default, repeat) * per_thousand
+        after = best_ms(fast, repeat) * per_thousand
+        print(f"{label}: {before:.1f} ms -> {after:.1f} ms per 1,000 ({before / after:.1f}x)")
+    loop.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark list response serialization")
+    parser.add_argument("--receipts", type=int, default=1000)
+    parser.add_argument("--items", type=int, default=25)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    main(args.receipts, args.items, args.repeat)
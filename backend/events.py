@@ -0,0 +1,201 @@
+import os
+import asyncio
+import logging
+from typing import Dict, Any, Optional, Set
+from datetime import datetime
+from bson import ObjectId
+from pymongo.errors import PyMongoError
+
+from job_queue import WORKER_MODE
+
+logger = logging.getLogger(__name__)
+
+# ==================== CONFIGURATION ====================
+
+# 'memory' fans out inside this process only; 'mongo' writes events to a
+# collection so API processes see stages emitted by external workers, and
+# is the default whenever workers run outside the API process
+RECEIPT_EVENTS_BACKEND = os.environ.get(
+    'RECEIPT_EVENTS_BACKEND', 'mongo' if WORKER_MODE == 'external' else 'memory'
+)
+RECEIPT_EVENTS_COLLECTION = 'receipt_events'
+RECEIPT_EVENTS_RETENTION_SECONDS = int(os.environ.get('RECEIPT_EVENTS_RETENTION_SECONDS', '86400'))
+RECEIPT_EVENTS_POLL_SECONDS = float(os.environ.get('RECEIPT_EVENTS_POLL_SECONDS', '1.0'))
+SUBSCRIBER_QUEUE_SIZE = 100
+
+STAGE_OCR_STARTED = 'ocr_started'
+STAGE_OCR_DONE = 'ocr_done'
+STAGE_LLM_DONE = 'llm_done'
+STAGE_SAVED = 'saved'
+STAGE_ERROR = 'error'
+# An attempt failed and the job queue will try again
+STAGE_RETRYING = 'retrying'
+
+TERMINAL_STAGES = {STAGE_SAVED, STAGE_ERROR}
+
+# ==================== SUBSCRIPTIONS ====================
+
+class Subscription:
+    """
+    A subscriber's view of one receipt's events
+    """
+
+    def __init__(self, receipt_id: str, on_close=None):
+        self.receipt_id = receipt_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self._on_close = on_close
+
+    def deliver(self, event: Dict[str, Any]) -> None:
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Slow consumer: drop the oldest event rather than block publishers
+            self.queue.get_nowait()
+            self.queue.put_nowait(event)
+
+    async def next(self, timeout: float) -> Optional[Dict[str, Any]]:
+        """Next event, or None if nothing arrived within timeout"""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def close(self) -> None:
+        if self._on_close:
+            await self._on_close(self)
+
+# ==================== BROKERS ====================
+
+class InMemoryEventBroker:
+    """
+    In-process pub/sub keyed by receipt id
+    """
+
+    def __init__(self):
+        self._subscribers: Dict[str, Set[Subscription]] = {}
+
+    async def start(self) -> None:
+        pass
+
+    async def stop(self) -> None:
+        pass
+
+    async def publish(self, event: Dict[str, Any]) -> None:
+        for subscription in list(self._subscribers.get(event["receipt_id"], ())):
+            subscription.deliver(event)
+
+    async def subscribe(self, receipt_id: str) -> Subscription:
+        subscription = Subscription(receipt_id, self._unsubscribe)
+        self._subscribers.setdefault(receipt_id, set()).add(subscription)
+        return subscription
+
+    async def _unsubscribe(self, subscription: Subscription) -> None:
+        subscribers = self._subscribers.get(subscription.receipt_id)
+        if subscribers is not None:
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._subscribers[subscription.receipt_id]
+
+    def subscriber_count(self) -> int:
+        return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+class MongoEventBroker(InMemoryEventBroker):
+    """
+    Persists events to receipt_events and tails them with a change stream
+    (replica sets) or by polling (standalone servers), so subscribers in any
+    API process see events published by any worker process.
+    """
+
+    def __init__(self, db):
+        super().__init__()
+        self.db = db
+        self._tail_task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        collection = self.db[RECEIPT_EVENTS_COLLECTION]
+        await collection.create_index([("receipt_id", 1), ("_id", 1)])
+        await collection.create_index("created_date", expireAfterSeconds=RECEIPT_EVENTS_RETENTION_SECONDS)
+        self._tail_task = asyncio.create_task(self._tail())
+
+    async def stop(self) -> None:
+        if self._tail_task:
+            self._tail_task.cancel()
+            await asyncio.gather(self._tail_task, return_exceptions=True)
+            self._tail_task = None
+
+    async def publish(self, event: Dict[str, Any]) -> None:
+        await self.db[RECEIPT_EVENTS_COLLECTION].insert_one({**event, "created_date": datetime.utcnow()})
+
+    async def _dispatch(self, doc: Dict[str, Any]) -> None:
+        doc.pop("_id", None)
+        doc.pop("created_date", None)
+        await super().publish(doc)
+
+    async def _tail(self) -> None:
+        try:
+            async with self.db[RECEIPT_EVENTS_COLLECTION].watch(
+                [{"$match": {"operationType": "insert"}}]
+            ) as stream:
+                async for change in stream:
+                    await self._dispatch(change["fullDocument"])
+        except asyncio.CancelledError:
+            raise
+        except PyMongoError as e:
+            logger.info(f"Change streams unavailable ({str(e)}), polling receipt events instead")
+            await self._poll()
+
+    async def _latest_id(self) -> ObjectId:
+        """_id of the newest stored event, so polling starts after it"""
+        doc = await self.db[RECEIPT_EVENTS_COLLECTION].find_one({}, {"_id": 1}, sort=[("_id", -1)])
+        return doc["_id"] if doc else ObjectId()
+
+    async def _poll(self) -> None:
+        # ObjectIds are unique and ordered by insert, unlike created_date,
+        # which ties within a millisecond and depends on the publisher's clock
+        last_id = None
+        while True:
+            try:
+                if last_id is None or not self._subscribers:
+                    last_id = await self._latest_id()
+                else:
+                    cursor = self.db[RECEIPT_EVENTS_COLLECTION].find({
+                        "receipt_id": {"$in": list(self._subscribers.keys())},
+                        "_id": {"$gt": last_id}
+                    }).sort("_id", 1)
+                    async for doc in cursor:
+                        last_id = doc["_id"]
+                        await self._dispatch(doc)
+            except PyMongoError as e:
+                logger.warning(f"Error polling receipt events: {str(e)}")
+            await asyncio.sleep(RECEIPT_EVENTS_POLL_SECONDS)
+
+_broker: InMemoryEventBroker = InMemoryEventBroker()
+
+async def configure_event_broker(db, backend: str = RECEIPT_EVENTS_BACKEND) -> InMemoryEventBroker:
+    """
+    Selects and starts the event broker; call once on process startup
+    """
+    global _broker
+    _broker = MongoEventBroker(db) if backend == 'mongo' else InMemoryEventBroker()
+    await _broker.start()
+    logger.info(f"Receipt event broker: {backend}")
+    return _broker
+
+def get_event_broker() -> InMemoryEventBroker:
+    return _broker
+
+async def publish_receipt_event(receipt_id: str, stage: str, **details) -> None:
+    """
+    Publishes a pipeline stage transition. Never raises: status streaming
+    must not break receipt processing.
+    """
+    event = {
+        "receipt_id": receipt_id,
+        "stage": stage,
+        "details": details,
+        "timestamp": datetime.utcnow().isoformat()
+    }
+    try:
+        await _broker.publish(event)
+    except Exception as e:
+        logger.warning(f"Could not publish {stage} event for receipt {receipt_id}: {str(e)}")
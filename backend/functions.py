@@ -1,73 +1,150 @@
 import os
+import asyncio
 import logging
-from typing import Dict, Any, List, Optional
+import threading
+from typing import Dict, Any, List, Optional, Set
 from datetime import datetime, timedelta
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 import random
 import string
+import time
+import json
+import copy
+import hashlib
 import boto3
+import httpx
 import requests
 from botocore.exceptions import ClientError
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from cache import TTLCache
+from read_cache import invalidate_receipt, invalidate_budgets, clear_read_cache
+from job_queue import (
+    JOB_TYPE_PROCESS_RECEIPT, JOB_TYPE_NUTRITION_PREFETCH, JOB_TYPE_PERSONAL_INFLATION,
+    JOB_TYPE_RECONCILE_CREDIT_BALANCES,
+    JOBS_COLLECTION, JOB_STATUS_QUEUED, enqueue_job
+)
+from receipt_parser import try_fast_path, get_store_profile
+from metrics import stage_timer, record_stage
+from http_client import http_request
+from price_series import build_bucket_merge_stages, pull_receipt_observations, PRICE_BUCKETS_COLLECTION
+from inflation import materialize_household_inflation
+from indexes import ensure_indexes
+from credits import build_credit_report, reconcile_household_balances, CREDIT_ROLLUPS_COLLECTION
+from events import (
+    publish_receipt_event,
+    STAGE_OCR_STARTED, STAGE_OCR_DONE, STAGE_LLM_DONE, STAGE_SAVED, STAGE_ERROR, STAGE_RETRYING
+)
 
 logger = logging.getLogger(__name__)
 
 # ==================== PLACEHOLDER INTEGRATIONS ====================
 
+# Shared Textract client and OCR thread pool, created once per process
+TEXTRACT_MAX_CONCURRENCY = int(os.environ.get('TEXTRACT_MAX_CONCURRENCY', '4'))
+UPLOAD_DIR = Path(os.environ.get('UPLOAD_DIR', '/app/uploads'))
+
+_textract_client = None
+_textract_client_lock = threading.Lock()
+_textract_executor: Optional[ThreadPoolExecutor] = None
+
+def get_textract_client():
+    """
+    Returns the process-wide Textract client (boto3 clients are thread-safe)
+    """
+    global _textract_client
+    if _textract_client is None:
+        with _textract_client_lock:
+            if _textract_client is None:
+                _textract_client = boto3.client(
+                    'textract',
+                    aws_access_key_id=os.environ['AWS_ACCESS_KEY_ID'],
+                    aws_secret_access_key=os.environ['AWS_SECRET_ACCESS_KEY'],
+                    region_name=os.environ['AWS_REGION']
+                )
+    return _textract_client
+
+def set_textract_client(textract_client) -> None:
+    """
+    Overrides the shared Textract client, e.g. with a moto or stub client in tests
+    """
+    global _textract_client
+    _textract_client = textract_client
+
+def _get_textract_executor() -> ThreadPoolExecutor:
+    global _textract_executor
+    if _textract_executor is None:
+        _textract_executor = ThreadPoolExecutor(
+            max_workers=TEXTRACT_MAX_CONCURRENCY,
+            thread_name_prefix='textract'
+        )
+    return _textract_executor
+
+def _load_image_bytes(image_url: str) -> bytes:
+    """
+    Reads an uploaded image from local storage or downloads it over HTTP
+    """
+    if image_url.startswith('/uploads/'):
+        return (UPLOAD_DIR / Path(image_url).name).read_bytes()
+    response = requests.get(image_url, timeout=30)
+    response.raise_for_status()
+    return response.content
+
+def _textract_ocr_image(textract_client, image_url: str, page: int) -> Dict[str, Any]:
+    """
+    OCRs a single receipt image. Runs on the Textract thread pool.
+    """
+    logger.info(f"Processing image {page + 1}: {image_url}")
+    try:
+        response = textract_client.detect_document_text(
+            Document={'Bytes': _load_image_bytes(image_url)}
+        )
+        lines = [
+            block for block in response.get('Blocks', [])
+            if block.get('BlockType') == 'LINE'
+        ]
+        confidence = (
+            sum(block.get('Confidence', 0) for block in lines) / len(lines)
+            if lines else 0.0
+        )
+        return {
+            "status": "success",
+            "page": page,
+            "image_url": image_url,
+            "detected_lines": [block.get('Text', '') for block in lines],
+            "confidence": round(confidence, 2)
+        }
+    except ClientError as e:
+        logger.error(f"AWS Textract error for {image_url}: {str(e)}")
+        return {"status": "error", "page": page, "error": str(e), "image_url": image_url}
+    except (OSError, requests.exceptions.RequestException) as e:
+        logger.error(f"Could not load image {image_url}: {str(e)}")
+        return {"status": "error", "page": page, "error": str(e), "image_url": image_url}
+
 async def textract_ocr_real(image_urls: List[str]) -> Dict[str, Any]:
     """
     Real AWS Textract OCR implementation
+    Images are OCR'd concurrently on a bounded thread pool so the event loop
+    stays free; results are returned in page order.
     """
     logger.info(f"Processing {len(image_urls)} images with AWS Textract")
     
     try:
-        # Initialize AWS Textract client
-        textract_client = boto3.client(
-            'textract',
-            aws_access_key_id=os.environ['AWS_ACCESS_KEY_ID'],
-            aws_secret_access_key=os.environ['AWS_SECRET_ACCESS_KEY'],
-            region_name=os.environ['AWS_REGION']
-        )
+        textract_client = get_textract_client()
+        loop = asyncio.get_running_loop()
+        executor = _get_textract_executor()
         
-        all_extracted_data = []
-        
-        for image_url in image_urls:
-            try:
-                # For now, we'll use placeholder since we need to handle S3 upload first
-                # In production, images would be uploaded to S3 first
-                logger.info(f"Processing image: {image_url}")
-                
-                # This is a simplified version - in production you'd:
-                # 1. Download image from URL
-                # 2. Upload to S3 
-                # 3. Call Textract with S3 reference
-                
-                # For now, return structured placeholder data
-                extracted_data = {
-                    "status": "textract_ready",
-                    "message": "AWS Textract configured and ready",
-                    "image_url": image_url,
-                    "detected_lines": [
-                        "TESCO SUPERSTORE",
-                        "Leicester City Centre",
-                        "Milk 2L              £2.50",
-                        "Bread Wholemeal      £1.20", 
-                        "Total:               £3.70"
-                    ],
-                    "confidence": 95.5
-                }
-                all_extracted_data.append(extracted_data)
-                
-            except ClientError as e:
-                logger.error(f"AWS Textract error for {image_url}: {str(e)}")
-                all_extracted_data.append({
-                    "status": "error",
-                    "error": str(e),
-                    "image_url": image_url
-                })
+        all_extracted_data = await asyncio.gather(*[
+            loop.run_in_executor(executor, _textract_ocr_image, textract_client, image_url, page)
+            for page, image_url in enumerate(image_urls)
+        ])
         
         return {
             "status": "success",
             "total_images": len(image_urls),
-            "results": all_extracted_data
+            "results": list(all_extracted_data)
         }
         
     except Exception as e:
@@ -78,6 +155,34 @@ async def textract_ocr_real(image_urls: List[str]) -> Dict[str, Any]:
             "error": str(e)
         }
 
+CALORIE_NINJAS_URL = "https://api.calorieninjas.com/v1/nutrition"
+
+def _nutrition_result_from_item(canonical_name: str, nutrition_info: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "status": "success",
+        "canonical_name": canonical_name,
+        "source": "CalorieNinjas",
+        "calories": nutrition_info.get('calories', 0),
+        "protein_g": nutrition_info.get('protein_g', 0),
+        "carbohydrate_g": nutrition_info.get('carbohydrates_total_g', 0),
+        "fat_g": nutrition_info.get('fat_total_g', 0),
+        "fiber_g": nutrition_info.get('fiber_g', 0),
+        "sugar_g": nutrition_info.get('sugar_g', 0),
+        "sodium_mg": nutrition_info.get('sodium_mg', 0),
+        "serving_size_g": nutrition_info.get('serving_size_g', 100),
+        "cached": False
+    }
+
+def _nutrition_error(canonical_name: str, message: str, error: Optional[str] = None) -> Dict[str, Any]:
+    result = {
+        "status": "error",
+        "message": message,
+        "canonical_name": canonical_name
+    }
+    if error is not None:
+        result["error"] = error
+    return result
+
 async def calorie_ninjas_nutrition_real(canonical_name: str, household_id: str) -> Dict[str, Any]:
     """
     Real CalorieNinjas API implementation
@@ -86,34 +191,18 @@ async def calorie_ninjas_nutrition_real(canonical_name: str, household_id: str)
     
     try:
         api_key = os.environ['CALORIE_NINJAS_API_KEY']
-        api_url = f"https://api.calorieninjas.com/v1/nutrition?query={canonical_name}"
         
         headers = {
             'X-Api-Key': api_key
         }
         
-        response = requests.get(api_url, headers=headers, timeout=10)
+        response = await http_request('GET', CALORIE_NINJAS_URL, params={'query': canonical_name}, headers=headers)
         
         if response.status_code == 200:
             data = response.json()
             
             if data and 'items' in data and len(data['items']) > 0:
-                nutrition_info = data['items'][0]
-                
-                return {
-                    "status": "success",
-                    "canonical_name": canonical_name,
-                    "source": "CalorieNinjas",
-                    "calories": nutrition_info.get('calories', 0),
-                    "protein_g": nutrition_info.get('protein_g', 0),
-                    "carbohydrate_g": nutrition_info.get('carbohydrates_total_g', 0),
-                    "fat_g": nutrition_info.get('fat_total_g', 0),
-                    "fiber_g": nutrition_info.get('fiber_g', 0),
-                    "sugar_g": nutrition_info.get('sugar_g', 0),
-                    "sodium_mg": nutrition_info.get('sodium_mg', 0),
-                    "serving_size_g": nutrition_info.get('serving_size_g', 100),
-                    "cached": False
-                }
+                return _nutrition_result_from_item(canonical_name, data['items'][0])
             else:
                 return {
                     "status": "not_found",
@@ -121,166 +210,1065 @@ async def calorie_ninjas_nutrition_real(canonical_name: str, household_id: str)
                     "canonical_name": canonical_name
                 }
         else:
+            logger.error(f"CalorieNinjas API error: {response.status_code} - {response.text}")
+            return _nutrition_error(canonical_name, f"API request failed: {response.status_code}")
+            
+    except httpx.HTTPError as e:
+        logger.error(f"Network error calling CalorieNinjas: {str(e)}")
+        return _nutrition_error(canonical_name, "Network error accessing nutrition API", str(e))
+    except Exception as e:
+        logger.error(f"Unexpected error in nutrition lookup: {str(e)}")
+        return _nutrition_error(canonical_name, "Unexpected error in nutrition lookup", str(e))
+
+def _match_nutrition_items(canonical_names: List[str], items: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """
+    Pairs API items with the requested names: exact normalized match first,
+    then containment either way. Each item is used at most once.
+    """
+    remaining = list(items)
+    matched: Dict[str, Dict[str, Any]] = {}
+    for exact in (True, False):
+        for canonical_name in canonical_names:
+            normalized = normalize_canonical_name(canonical_name)
+            if normalized in matched:
+                continue
+            for item in remaining:
+                item_name = normalize_canonical_name(item.get('name', ''))
+                if item_name == normalized or (not exact and item_name and (item_name in normalized or normalized in item_name)):
+                    matched[normalized] = _nutrition_result_from_item(canonical_name, item)
+                    remaining.remove(item)
+                    break
+    return matched
+
+async def calorie_ninjas_nutrition_batch_real(canonical_names: List[str]) -> Dict[str, Dict[str, Any]]:
+    """
+    Looks up several foods in one CalorieNinjas query. Names the API response
+    can't be matched back to are retried individually. Keyed by normalized name.
+    """
+    if len(canonical_names) == 1:
+        result = await calorie_ninjas_nutrition_real(canonical_names[0], "")
+        return {normalize_canonical_name(canonical_names[0]): result}
+    
+    logger.info(f"Fetching nutrition for {len(canonical_names)} items in one query")
+    nutrition_batch_stats["upstream_calls"] += 1
+    try:
+        response = await http_request(
+            'GET',
+            CALORIE_NINJAS_URL,
+            params={'query': ", ".join(canonical_names)},
+            headers={'X-Api-Key': os.environ['CALORIE_NINJAS_API_KEY']}
+        )
+        if response.status_code != 200:
             logger.error(f"CalorieNinjas API error: {response.status_code} - {response.text}")
             return {
-                "status": "error",
-                "message": f"API request failed: {response.status_code}",
-                "canonical_name": canonical_name
+                normalize_canonical_name(name): _nutrition_error(name, f"API request failed: {response.status_code}")
+                for name in canonical_names
             }
-            
-    except requests.exceptions.RequestException as e:
+        matched = _match_nutrition_items(canonical_names, response.json().get('items', []))
+    except httpx.HTTPError as e:
         logger.error(f"Network error calling CalorieNinjas: {str(e)}")
         return {
-            "status": "error",
-            "message": "Network error accessing nutrition API",
-            "error": str(e),
-            "canonical_name": canonical_name
+            normalize_canonical_name(name): _nutrition_error(name, "Network error accessing nutrition API", str(e))
+            for name in canonical_names
         }
+    
+    unmatched = [name for name in canonical_names if normalize_canonical_name(name) not in matched]
+    if unmatched:
+        nutrition_batch_stats["unmatched_retries"] += len(unmatched)
+        nutrition_batch_stats["upstream_calls"] += len(unmatched)
+        retries = await asyncio.gather(*[calorie_ninjas_nutrition_real(name, "") for name in unmatched])
+        for name, result in zip(unmatched, retries):
+            matched[normalize_canonical_name(name)] = result
+    return matched
+
+# Shared async OpenAI client; calls are capped by a semaphore so a scan spike
+# queues here instead of opening hundreds of concurrent requests
+LLM_MODEL = os.environ.get('OPENAI_MODEL', 'gpt-4o-mini')
+LLM_MAX_CONCURRENCY = int(os.environ.get('LLM_MAX_CONCURRENCY', '4'))
+LLM_TIMEOUT_SECONDS = float(os.environ.get('LLM_TIMEOUT_SECONDS', '60'))
+
+_openai_client = None
+_llm_semaphore: Optional[asyncio.Semaphore] = None
+
+llm_stats = {
+    "calls": 0,
+    "errors": 0,
+    "timeouts": 0,
+    "waiting": 0,
+    "in_flight": 0,
+    "queue_wait_seconds_total": 0.0,
+    "queue_wait_seconds_max": 0.0,
+    "call_seconds_total": 0.0,
+    "call_seconds_max": 0.0,
+    "prompt_tokens": 0,
+    "completion_tokens": 0
+}
+
+def get_openai_client():
+    """
+    Returns the process-wide AsyncOpenAI client
+    """
+    global _openai_client
+    if _openai_client is None:
+        from openai import AsyncOpenAI
+        _openai_client = AsyncOpenAI(
+            api_key=os.environ['OPENAI_API_KEY'],
+            timeout=LLM_TIMEOUT_SECONDS
+        )
+    return _openai_client
+
+def _get_llm_semaphore() -> asyncio.Semaphore:
+    global _llm_semaphore
+    if _llm_semaphore is None:
+        _llm_semaphore = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+    return _llm_semaphore
+
+async def create_chat_completion(messages: List[Dict[str, str]], **kwargs):
+    """
+    Runs a chat completion through the shared client, bounded by
+    LLM_MAX_CONCURRENCY and LLM_TIMEOUT_SECONDS. Records queue wait vs call time.
+    """
+    client = get_openai_client()
+    
+    llm_stats["waiting"] += 1
+    wait_started = time.perf_counter()
+    async with _get_llm_semaphore():
+        waited = time.perf_counter() - wait_started
+        llm_stats["waiting"] -= 1
+        llm_stats["in_flight"] += 1
+        llm_stats["queue_wait_seconds_total"] += waited
+        llm_stats["queue_wait_seconds_max"] = max(llm_stats["queue_wait_seconds_max"], waited)
+        
+        call_started = time.perf_counter()
+        try:
+            return await asyncio.wait_for(
+                client.chat.completions.create(
+                    model=kwargs.pop("model", LLM_MODEL),
+                    messages=messages,
+                    **kwargs
+                ),
+                timeout=LLM_TIMEOUT_SECONDS
+            )
+        except asyncio.TimeoutError:
+            llm_stats["timeouts"] += 1
+            raise
+        except Exception:
+            llm_stats["errors"] += 1
+            raise
+        finally:
+            elapsed = time.perf_counter() - call_started
+            llm_stats["calls"] += 1
+            llm_stats["in_flight"] -= 1
+            llm_stats["call_seconds_total"] += elapsed
+            llm_stats["call_seconds_max"] = max(llm_stats["call_seconds_max"], elapsed)
+
+def get_llm_stats() -> Dict[str, Any]:
+    """
+    Snapshot of LLM call counters with average queue wait and call time
+    """
+    calls = llm_stats["calls"]
+    return {
+        **llm_stats,
+        "max_concurrency": LLM_MAX_CONCURRENCY,
+        "timeout_seconds": LLM_TIMEOUT_SECONDS,
+        "avg_queue_wait_seconds": round(llm_stats["queue_wait_seconds_total"] / calls, 4) if calls else None,
+        "avg_call_seconds": round(llm_stats["call_seconds_total"] / calls, 4) if calls else None,
+        "cache": get_llm_cache_stats()
+    }
+
+# ==================== LLM RESULT CACHE ====================
+
+# Bump when the enhancement prompt or output format changes; older cache
+# entries stop matching and are purged on startup
+LLM_PROMPT_VERSION = '2'
+LLM_CACHE_COLLECTION = 'llm_enhancement_cache'
+LLM_CACHE_TTL_SECONDS = int(os.environ.get('LLM_CACHE_TTL_SECONDS', str(30 * 24 * 3600)))
+LLM_CACHE_MEMORY_SIZE = int(os.environ.get('LLM_CACHE_MEMORY_SIZE', '512'))
+
+_llm_memory_cache = TTLCache(max_size=LLM_CACHE_MEMORY_SIZE, ttl_seconds=LLM_CACHE_TTL_SECONDS)
+
+llm_cache_stats = {
+    "memory_hits": 0,
+    "mongo_hits": 0,
+    "misses": 0,
+    "stores": 0
+}
+
+def extract_ocr_lines(textract_data: Dict[str, Any]) -> List[str]:
+    """
+    Flattens detected lines across all OCR'd pages, in page order
+    """
+    lines = []
+    for result in textract_data.get("results", []):
+        lines.extend(result.get("detected_lines", []))
+    return lines
+
+def llm_cache_key(ocr_lines: List[str], store_name: str, total_amount: float, currency: str) -> str:
+    """
+    Content hash of the normalized OCR lines, store, total and prompt version
+    """
+    normalized_lines = [" ".join(line.lower().split()) for line in ocr_lines]
+    payload = {
+        "lines": [line for line in normalized_lines if line],
+        "store": " ".join((store_name or "").lower().split()),
+        "total": round(float(total_amount or 0), 2),
+        "currency": currency,
+        "prompt_version": LLM_PROMPT_VERSION
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode('utf-8')).hexdigest()
+
+async def get_cached_enhancement(db, key: str) -> Optional[Dict[str, Any]]:
+    cached = _llm_memory_cache.get(key, None)
+    if cached is not None:
+        llm_cache_stats["memory_hits"] += 1
+        return copy.deepcopy(cached)
+    
+    if db is not None:
+        doc = await db[LLM_CACHE_COLLECTION].find_one(
+            {"key": key, "prompt_version": LLM_PROMPT_VERSION, "expires_at": {"$gt": datetime.utcnow()}},
+            {"_id": 0, "result": 1}
+        )
+        if doc:
+            llm_cache_stats["mongo_hits"] += 1
+            _llm_memory_cache.set(key, doc["result"])
+            return copy.deepcopy(doc["result"])
+    
+    llm_cache_stats["misses"] += 1
+    return None
+
+async def store_cached_enhancement(db, key: str, result: Dict[str, Any]) -> None:
+    _llm_memory_cache.set(key, copy.deepcopy(result))
+    llm_cache_stats["stores"] += 1
+    
+    if db is None:
+        return
+    now = datetime.utcnow()
+    try:
+        await db[LLM_CACHE_COLLECTION].update_one(
+            {"key": key},
+            {"$set": {
+                "key": key,
+                "prompt_version": LLM_PROMPT_VERSION,
+                "result": result,
+                "created_date": now,
+                "expires_at": now + timedelta(seconds=LLM_CACHE_TTL_SECONDS)
+            }},
+            upsert=True
+        )
     except Exception as e:
-        logger.error(f"Unexpected error in nutrition lookup: {str(e)}")
-        return {
-            "status": "error", 
-            "message": "Unexpected error in nutrition lookup",
-            "error": str(e),
-            "canonical_name": canonical_name
+        logger.warning(f"Could not persist LLM cache entry: {str(e)}")
+
+async def ensure_llm_cache(db) -> Dict[str, Any]:
+    """
+    Drops entries written by older prompt versions (indexes, including the
+    TTL on expires_at, come from the index registry)
+    """
+    result = await db[LLM_CACHE_COLLECTION].delete_many({"prompt_version": {"$ne": LLM_PROMPT_VERSION}})
+    return {"purged": result.deleted_count}
+
+def get_llm_cache_stats() -> Dict[str, Any]:
+    hits = llm_cache_stats["memory_hits"] + llm_cache_stats["mongo_hits"]
+    lookups = hits + llm_cache_stats["misses"]
+    return {
+        **llm_cache_stats,
+        "hit_ratio": round(hits / lookups, 4) if lookups else None,
+        "prompt_version": LLM_PROMPT_VERSION,
+        "memory": _llm_memory_cache.stats()
+    }
+
+# ==================== LLM PROMPTING ====================
+
+# Long receipts are split into chunks of at most this many OCR lines and
+# enhanced in parallel, so no single response hits the output token cap
+LLM_CHUNK_MAX_LINES = int(os.environ.get('LLM_CHUNK_MAX_LINES', '40'))
+LLM_BASE_OUTPUT_TOKENS = 300
+LLM_OUTPUT_TOKENS_PER_LINE = 80
+LLM_MAX_OUTPUT_TOKENS = 4096
+
+LLM_CATEGORIES = "Vegetables, Fruits, Dairy, Meat & Fish, Grains & Bakery, Snacks, Beverages, Household, Other"
+
+def split_ocr_lines(ocr_lines: List[str], max_lines: int = LLM_CHUNK_MAX_LINES) -> List[List[str]]:
+    """
+    Drops blank lines, collapses whitespace and splits into prompt-sized chunks
+    """
+    lines = [" ".join(line.split()) for line in ocr_lines]
+    lines = [line for line in lines if line]
+    return [lines[i:i + max_lines] for i in range(0, len(lines), max_lines)]
+
+def build_enhancement_prompt(
+    lines: List[str],
+    store_name: str,
+    total_amount: float,
+    currency: str,
+    chunk_index: int = 0,
+    chunk_count: int = 1
+) -> str:
+    """
+    Compact line-oriented prompt built only from the detected OCR lines
+    """
+    part = f" (part {chunk_index + 1} of {chunk_count}, only extract items from these lines)" if chunk_count > 1 else ""
+    body = "\n".join(lines)
+    return (
+        f"Receipt from {store_name}, total {currency} {total_amount}{part}.\n"
+        f"OCR lines:\n{body}\n\n"
+        "Return JSON: {\"items\": [{\"name\", \"canonical_name\", \"category\", \"quantity\", "
+        "\"unit_price\", \"total_price\", \"pack_size\", \"price_per_unit\", \"discount_applied\", "
+        "\"offer_description\"}], \"receipt_insights\": {\"summary\", \"highlights\": [max 3]}}.\n"
+        f"category is one of: {LLM_CATEGORIES}. Skip totals, payments and loyalty point lines; "
+        "apply discount lines to the item above them."
+    )
+
+def _fallback_enhancement(store_name: str, total_amount: float, currency: str, summary: str, highlight: str) -> Dict[str, Any]:
+    return {
+        "items": [
+            {
+                "name": f"Receipt from {store_name}",
+                "canonical_name": f"Groceries from {store_name}",
+                "category": "Other",
+                "quantity": 1,
+                "unit_price": total_amount,
+                "total_price": total_amount,
+                "pack_size": "Receipt total",
+                "price_per_unit": total_amount,
+                "discount_applied": False,
+                "offer_description": None,
+                "approval_state": "pending"
+            }
+        ],
+        "receipt_insights": {
+            "summary": summary,
+            "highlights": [
+                f"Total: {currency} {total_amount}",
+                highlight
+            ]
         }
+    }
+
+async def _enhance_chunk(
+    lines: List[str],
+    store_name: str,
+    total_amount: float,
+    currency: str,
+    chunk_index: int,
+    chunk_count: int
+) -> Dict[str, Any]:
+    """
+    Runs one chunk through the LLM and returns its parsed JSON with usage
+    """
+    started = time.perf_counter()
+    response = await create_chat_completion(
+        messages=[
+            {"role": "system", "content": "You are a grocery receipt analysis expert. Extract and categorize items accurately. Reply with JSON only."},
+            {"role": "user", "content": build_enhancement_prompt(lines, store_name, total_amount, currency, chunk_index, chunk_count)}
+        ],
+        max_tokens=min(LLM_MAX_OUTPUT_TOKENS, LLM_BASE_OUTPUT_TOKENS + LLM_OUTPUT_TOKENS_PER_LINE * len(lines)),
+        temperature=0.1,
+        response_format={"type": "json_object"}
+    )
+    choice = response.choices[0]
+    if choice.finish_reason == "length":
+        logger.warning(f"LLM output truncated for chunk {chunk_index + 1}/{chunk_count} of {store_name} receipt")
+    
+    result = json.loads(choice.message.content.strip())
+    usage = getattr(response, "usage", None)
+    result["_usage"] = {
+        "prompt_tokens": getattr(usage, "prompt_tokens", 0) or 0,
+        "completion_tokens": getattr(usage, "completion_tokens", 0) or 0,
+        "latency_seconds": time.perf_counter() - started
+    }
+    llm_stats["prompt_tokens"] += result["_usage"]["prompt_tokens"]
+    llm_stats["completion_tokens"] += result["_usage"]["completion_tokens"]
+    return result
+
+def merge_chunk_results(chunk_results: List[Dict[str, Any]], store_name: str, currency: str) -> Dict[str, Any]:
+    """
+    Rebuilds a single items list and receipt_insights from per-chunk results
+    """
+    items: List[Dict[str, Any]] = []
+    for result in chunk_results:
+        items.extend(result.get("items", []))
+    for item in items:
+        item.setdefault("approval_state", "pending")
+    
+    if len(chunk_results) == 1:
+        return {"items": items, "receipt_insights": chunk_results[0].get("receipt_insights", {})}
+    
+    highlights: List[str] = []
+    for result in chunk_results:
+        for highlight in (result.get("receipt_insights") or {}).get("highlights", []):
+            if highlight not in highlights:
+                highlights.append(highlight)
+    
+    spent = sum(float(item.get("total_price") or 0) for item in items)
+    return {
+        "items": items,
+        "receipt_insights": {
+            "summary": f"Shopping trip at {store_name} with {len(items)} items totalling {currency} {spent:.2f}",
+            "highlights": highlights[:5]
+        }
+    }
 
 async def enhance_receipt_with_llm_real(
     textract_data: Dict[str, Any],
     store_name: str,
     total_amount: float,
-    currency: str
+    currency: str,
+    db=None
 ) -> Dict[str, Any]:
     """
     Real OpenAI GPT-4 Vision LLM enhancement
     Now uses real OpenAI API with user's key
+    Results are cached by receipt content, so re-uploads and reprocessing
+    skip the LLM call entirely. Long receipts are enhanced in parallel chunks
+    and merged; token and latency accounting is returned under llm_usage.
     """
-    logger.info(f"LLM Enhancement called for store: {store_name} using OpenAI GPT-4")
+    ocr_lines = extract_ocr_lines(textract_data)
+    chunks = split_ocr_lines(ocr_lines)
+    if not chunks:
+        logger.warning(f"No OCR lines to enhance for store: {store_name}")
+        return _fallback_enhancement(
+            store_name, total_amount, currency,
+            f"Receipt from {store_name} - no text could be read from the images",
+            "Please review and add items manually"
+        )
     
+    cache_key = llm_cache_key(ocr_lines, store_name, total_amount, currency)
+    cached = await get_cached_enhancement(db, cache_key)
+    if cached is not None:
+        logger.info(f"LLM Enhancement cache hit for store: {store_name}")
+        cached["llm_usage"] = {"cached": True, "chunks": 0, "prompt_tokens": 0, "completion_tokens": 0}
+        return cached
+    
+    logger.info(f"LLM Enhancement called for store: {store_name} using OpenAI GPT-4 ({len(chunks)} chunks)")
+    
+    started = time.perf_counter()
     try:
-        import openai
-        
-        openai.api_key = os.environ['OPENAI_API_KEY']
-        
-        # Create a prompt for GPT-4 to analyze the receipt data
-        prompt = f"""
-        You are a grocery receipt analysis expert. Analyze this receipt from {store_name} with total amount {currency} {total_amount}.
-
-        OCR Data: {str(textract_data)}
-
-        Extract and standardize the items. Return ONLY valid JSON in this exact format:
-
-        {{
-            "items": [
-                {{
-                    "name": "original item name from receipt",
-                    "canonical_name": "standardized product name",
-                    "category": "one of: Vegetables, Fruits, Dairy, Meat & Fish, Grains & Bakery, Snacks, Beverages, Household, Other",
-                    "quantity": 1,
-                    "unit_price": 0.00,
-                    "total_price": 0.00,
-                    "pack_size": "size info if available",
-                    "price_per_unit": 0.00,
-                    "discount_applied": false,
-                    "offer_description": null,
-                    "approval_state": "pending"
-                }}
-            ],
-            "receipt_insights": {{
-                "summary": "Brief analysis of this shopping trip",
-                "highlights": ["key insight about spending", "category breakdown", "any deals or savings"]
-            }}
-        }}
+        chunk_results = await asyncio.gather(*[
+            _enhance_chunk(lines, store_name, total_amount, currency, index, len(chunks))
+            for index, lines in enumerate(chunks)
+        ])
+    except json.JSONDecodeError:
+        logger.warning("OpenAI response was not valid JSON, using fallback")
+        return _fallback_enhancement(
+            store_name, total_amount, currency,
+            f"Receipt from {store_name} processed with OpenAI GPT-4",
+            "Items analyzed by AI"
+        )
+    except Exception as e:
+        logger.error(f"Error with OpenAI GPT-4 enhancement: {str(e)}")
+        return _fallback_enhancement(
+            store_name, total_amount, currency,
+            f"Receipt from {store_name} - OpenAI integration pending setup",
+            "AI analysis will be available once OpenAI is configured"
+        )
+    
+    result = merge_chunk_results(chunk_results, store_name, currency)
+    logger.info(f"OpenAI GPT-4 successfully analyzed receipt with {len(result['items'])} items")
+    await store_cached_enhancement(db, cache_key, result)
+    
+    usages = [chunk["_usage"] for chunk in chunk_results]
+    result["llm_usage"] = {
+        "cached": False,
+        "chunks": len(chunks),
+        "ocr_lines": sum(len(lines) for lines in chunks),
+        "prompt_tokens": sum(usage["prompt_tokens"] for usage in usages),
+        "completion_tokens": sum(usage["completion_tokens"] for usage in usages),
+        "slowest_chunk_seconds": round(max(usage["latency_seconds"] for usage in usages), 3),
+        "latency_seconds": round(time.perf_counter() - started, 3)
+    }
+    return result
 
-        Focus on accuracy. Return only the JSON, no other text.
-        """
+# ==================== NUTRITION CACHE ====================
+
+# Read-through cache: in-process LRU -> global nutrition_facts collection
+# (keyed by normalized canonical name) -> CalorieNinjas API. Names the API
+# doesn't know are recorded in failed_nutrition_lookups and retried with
+# exponential backoff on attempt_count.
+NUTRITION_MEMORY_CACHE_SIZE = int(os.environ.get('NUTRITION_MEMORY_CACHE_SIZE', '5000'))
+NUTRITION_MEMORY_TTL_SECONDS = int(os.environ.get('NUTRITION_MEMORY_TTL_SECONDS', str(6 * 3600)))
+NUTRITION_FACT_MAX_AGE_DAYS = int(os.environ.get('NUTRITION_FACT_MAX_AGE_DAYS', '90'))
+NUTRITION_NEGATIVE_BASE_SECONDS = int(os.environ.get('NUTRITION_NEGATIVE_BASE_SECONDS', '3600'))
+NUTRITION_NEGATIVE_MAX_SECONDS = int(os.environ.get('NUTRITION_NEGATIVE_MAX_SECONDS', str(30 * 24 * 3600)))
+
+NUTRITION_FIELDS = (
+    "calories", "protein_g", "carbohydrate_g", "fat_g",
+    "fiber_g", "sugar_g", "sodium_mg", "serving_size_g"
+)
+
+_nutrition_memory_cache = TTLCache(
+    max_size=NUTRITION_MEMORY_CACHE_SIZE,
+    ttl_seconds=NUTRITION_MEMORY_TTL_SECONDS
+)
+
+nutrition_cache_stats = {
+    "memory_hits": 0,
+    "mongo_hits": 0,
+    "negative_hits": 0,
+    "api_calls": 0,
+    "api_errors": 0
+}
+
+def normalize_canonical_name(canonical_name: str) -> str:
+    return " ".join((canonical_name or "").lower().split())
+
+def negative_backoff_seconds(attempt_count: int) -> int:
+    """How long to wait before retrying a name the API didn't recognise"""
+    return min(NUTRITION_NEGATIVE_MAX_SECONDS, NUTRITION_NEGATIVE_BASE_SECONDS * (2 ** max(attempt_count - 1, 0)))
+
+def _nutrition_from_fact(fact: Dict[str, Any], canonical_name: str) -> Dict[str, Any]:
+    result = {
+        "status": "success",
+        "canonical_name": canonical_name,
+        "source": fact.get("source", "CalorieNinjas")
+    }
+    for field in NUTRITION_FIELDS:
+        result[field] = fact.get(field, 0)
+    return result
+
+def _mark_cached(result: Dict[str, Any], tier: str) -> Dict[str, Any]:
+    return {**result, "cached": True, "cache_tier": tier}
+
+async def _lookup_negative_cache(db, normalized: str) -> Optional[Dict[str, Any]]:
+    failed = await db.failed_nutrition_lookups.find_one({"normalized_name": normalized}, {"_id": 0})
+    if not failed:
+        return None
+    return _negative_result(failed, normalized)
+
+def _negative_result(failed: Dict[str, Any], normalized: str) -> Optional[Dict[str, Any]]:
+    """not_found result for a failed lookup still inside its backoff window"""
+    last_attempt = failed.get("last_attempt_date")
+    if not isinstance(last_attempt, datetime):
+        # Missing, or an ISO string from before native dates: treat as
+        # expired so the name is looked up again and the entry rewritten
+        return None
+    retry_at = last_attempt + timedelta(seconds=negative_backoff_seconds(failed.get("attempt_count", 1)))
+    if retry_at <= datetime.utcnow():
+        return None
+    return {
+        "status": "not_found",
+        "message": f"No nutrition data found for '{failed.get('canonical_name', normalized)}'",
+        "canonical_name": failed.get("canonical_name", normalized),
+        "retry_after": retry_at.isoformat()
+    }
+
+async def _store_nutrition_fact(db, normalized: str, result: Dict[str, Any], household_id: str, user_email: str) -> None:
+    now = datetime.utcnow()
+    fact = {field: result.get(field) for field in NUTRITION_FIELDS}
+    await db.nutrition_facts.update_one(
+        {"normalized_name": normalized},
+        {
+            "$set": {
+                **fact,
+                "canonical_name": result["canonical_name"],
+                "normalized_name": normalized,
+                "source": result.get("source", "CalorieNinjas"),
+                "updated_date": now
+            },
+            "$setOnInsert": {
+                "id": generate_uuid(),
+                "household_id": household_id,
+                "user_email": user_email,
+                "created_date": now
+            }
+        },
+        upsert=True
+    )
+    await db.failed_nutrition_lookups.delete_one({"normalized_name": normalized})
+
+async def _store_failed_lookup(db, normalized: str, canonical_name: str, household_id: str, user_email: str) -> None:
+    now = datetime.utcnow()
+    await db.failed_nutrition_lookups.update_one(
+        {"normalized_name": normalized},
+        {
+            "$set": {
+                "canonical_name": canonical_name,
+                "normalized_name": normalized,
+                "source": "CalorieNinjas",
+                "last_attempt_date": now,
+                "updated_date": now
+            },
+            "$inc": {"attempt_count": 1},
+            "$setOnInsert": {
+                "id": generate_uuid(),
+                "household_id": household_id,
+                "user_email": user_email,
+                "created_date": now
+            }
+        },
+        upsert=True
+    )
+
+# Concurrent misses for distinct names are packed into one multi-item API
+# query if they arrive within the batch window
+NUTRITION_BATCH_WINDOW_SECONDS = float(os.environ.get('NUTRITION_BATCH_WINDOW_MS', '25')) / 1000
+NUTRITION_BATCH_MAX_NAMES = int(os.environ.get('NUTRITION_BATCH_MAX_NAMES', '10'))
+NUTRITION_BATCH_ENDPOINT_MAX_NAMES = 200
+
+nutrition_batch_stats = {
+    "coalesced": 0,
+    "batches": 0,
+    "names_batched": 0,
+    "upstream_calls": 0,
+    "unmatched_retries": 0
+}
+
+class NutritionBatcher:
+    """
+    Collects distinct names looked up within a short window and resolves them
+    with a single calorie_ninjas_nutrition_batch_real call
+    """
+    
+    def __init__(self, window_seconds: float, max_names: int):
+        self.window_seconds = window_seconds
+        self.max_names = max_names
+        self._pending: Dict[str, Any] = {}
+        self._timer: Optional[asyncio.TimerHandle] = None
+        # Running batches, referenced until done so they aren't collected
+        self._tasks: Set[asyncio.Task] = set()
+    
+    async def fetch(self, canonical_name: str) -> Dict[str, Any]:
+        loop = asyncio.get_running_loop()
+        normalized = normalize_canonical_name(canonical_name)
+        if normalized in self._pending:
+            return await asyncio.shield(self._pending[normalized][1])
         
-        response = openai.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": "You are a grocery receipt analysis expert. Extract and categorize items accurately."},
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=1500,
-            temperature=0.1
+        future = loop.create_future()
+        self._pending[normalized] = (canonical_name, future)
+        if len(self._pending) >= self.max_names:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window_seconds, self._flush)
+        return await asyncio.shield(future)
+    
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, {}
+        if batch:
+            task = asyncio.create_task(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+    
+    async def _run(self, batch: Dict[str, Any]) -> None:
+        nutrition_batch_stats["batches"] += 1
+        nutrition_batch_stats["names_batched"] += len(batch)
+        if len(batch) == 1:
+            nutrition_batch_stats["upstream_calls"] += 1
+        results: Dict[str, Any] = {}
+        try:
+            results = await calorie_ninjas_nutrition_batch_real([name for name, _ in batch.values()])
+        except Exception as e:
+            logger.error(f"Error in batched nutrition lookup: {str(e)}")
+        finally:
+            # Also runs on cancellation, so no waiter is left pending
+            for normalized, (name, future) in batch.items():
+                if not future.done():
+                    future.set_result(results.get(normalized) or _nutrition_error(name, "Unexpected error in nutrition lookup"))
+    
+    async def stop(self) -> None:
+        """Sends any pending names and waits for running batches"""
+        self._flush()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+_nutrition_batcher = NutritionBatcher(NUTRITION_BATCH_WINDOW_SECONDS, NUTRITION_BATCH_MAX_NAMES)
+_nutrition_inflight: Dict[str, asyncio.Future] = {}
+
+async def stop_nutrition_batcher() -> None:
+    await _nutrition_batcher.stop()
+
+async def _resolve_nutrition(
+    canonical_name: str,
+    normalized: str,
+    household_id: str,
+    db,
+    user_email: str
+) -> Dict[str, Any]:
+    """
+    Mongo tiers, then the (batched) API; records the outcome in both tiers
+    """
+    if db is not None:
+        fact = await db.nutrition_facts.find_one(
+            {
+                "normalized_name": normalized,
+                "updated_date": {"$gte": datetime.utcnow() - timedelta(days=NUTRITION_FACT_MAX_AGE_DAYS)}
+            },
+            {"_id": 0}
         )
+        if fact:
+            nutrition_cache_stats["mongo_hits"] += 1
+            result = _nutrition_from_fact(fact, fact.get("canonical_name", canonical_name))
+            _nutrition_memory_cache.set(normalized, result)
+            return _mark_cached(result, "mongo")
         
-        # Parse the response
-        result_text = response.choices[0].message.content.strip()
-        
-        # Try to parse JSON response
+        negative = await _lookup_negative_cache(db, normalized)
+        if negative:
+            nutrition_cache_stats["negative_hits"] += 1
+            _nutrition_memory_cache.set(normalized, negative, ttl_seconds=NUTRITION_NEGATIVE_BASE_SECONDS)
+            return _mark_cached(negative, "mongo")
+    
+    nutrition_cache_stats["api_calls"] += 1
+    result = await _nutrition_batcher.fetch(canonical_name)
+    
+    if result["status"] == "success":
+        _nutrition_memory_cache.set(normalized, result)
+        if db is not None:
+            await _store_nutrition_fact(db, normalized, result, household_id, user_email)
+    elif result["status"] == "not_found":
+        _nutrition_memory_cache.set(normalized, result, ttl_seconds=NUTRITION_NEGATIVE_BASE_SECONDS)
+        if db is not None:
+            await _store_failed_lookup(db, normalized, canonical_name, household_id, user_email)
+    else:
+        # Transient API/network errors are not cached
+        nutrition_cache_stats["api_errors"] += 1
+    
+    return result
+
+async def get_nutrition_cached(
+    canonical_name: str,
+    household_id: str,
+    db=None,
+    user_email: str = ""
+) -> Dict[str, Any]:
+    """
+    Nutrition lookup through the memory and Mongo cache tiers, falling back
+    to the CalorieNinjas API and recording the outcome in both tiers.
+    Identical lookups already in flight share one resolution.
+    """
+    normalized = normalize_canonical_name(canonical_name)
+    
+    cached = _nutrition_memory_cache.get(normalized, None)
+    if cached is not None:
+        if cached["status"] == "success":
+            nutrition_cache_stats["memory_hits"] += 1
+        else:
+            nutrition_cache_stats["negative_hits"] += 1
+        return _mark_cached(cached, "memory")
+    
+    while (inflight := _nutrition_inflight.get(normalized)) is not None:
+        nutrition_batch_stats["coalesced"] += 1
         try:
-            import json
-            result = json.loads(result_text)
-            logger.info(f"OpenAI GPT-4 successfully analyzed receipt with {len(result.get('items', []))} items")
-            return result
-        except json.JSONDecodeError:
-            logger.warning("OpenAI response was not valid JSON, using fallback")
-            return {
-                "items": [
-                    {
-                        "name": "GPT-4 Analysis Item",
-                        "canonical_name": "AI Processed Item",
-                        "category": "Other",
-                        "quantity": 1,
-                        "unit_price": total_amount,
-                        "total_price": total_amount,
-                        "pack_size": "1 unit",
-                        "price_per_unit": total_amount,
-                        "discount_applied": False,
-                        "offer_description": None,
-                        "approval_state": "pending"
-                    }
-                ],
-                "receipt_insights": {
-                    "summary": f"Receipt from {store_name} processed with OpenAI GPT-4",
-                    "highlights": [
-                        f"Total amount: {currency} {total_amount}",
-                        "Items analyzed by AI"
-                    ]
-                }
-            }
-        
+            # Shielded: cancelling this follower must not cancel the shared lookup
+            return dict(await asyncio.shield(inflight))
+        except asyncio.CancelledError:
+            if not inflight.cancelled() or asyncio.current_task().cancelling():
+                raise
+            # The leader was cancelled; the next waiter takes over the lookup
+    
+    future = asyncio.get_running_loop().create_future()
+    _nutrition_inflight[normalized] = future
+    try:
+        result = await _resolve_nutrition(canonical_name, normalized, household_id, db, user_email)
+        future.set_result(result)
+        return result
     except Exception as e:
-        logger.error(f"Error with OpenAI GPT-4 enhancement: {str(e)}")
-        
-        # Fallback response
-        return {
-            "items": [
-                {
-                    "name": f"Receipt from {store_name}",
-                    "canonical_name": f"Groceries from {store_name}",
-                    "category": "Other",
-                    "quantity": 1,
-                    "unit_price": total_amount,
-                    "total_price": total_amount,
-                    "pack_size": "Receipt total",
-                    "price_per_unit": total_amount,
-                    "discount_applied": False,
-                    "offer_description": None,
-                    "approval_state": "pending"
-                }
-            ],
-            "receipt_insights": {
-                "summary": f"Receipt from {store_name} - OpenAI integration pending setup",
-                "highlights": [
-                    f"Total: {currency} {total_amount}",
-                    "AI analysis will be available once OpenAI is configured"
-                ]
-            }
-        }
+        future.set_exception(e)
+        # Mark retrieved so an unawaited failure doesn't log a warning
+        future.exception()
+        raise
+    finally:
+        # Cancelled leaders (client disconnect, timeout, shutdown) release
+        # their followers too
+        if not future.done():
+            future.cancel()
+        if _nutrition_inflight.get(normalized) is future:
+            del _nutrition_inflight[normalized]
 
-async def calorie_ninjas_nutrition_placeholder(canonical_name: str, household_id: str) -> Dict[str, Any]:
+async def get_nutrition_batch(
+    canonical_names: List[str],
+    household_id: str,
+    db=None,
+    user_email: str = ""
+) -> List[Dict[str, Any]]:
     """
-    This now calls the real CalorieNinjas API
+    Resolves many names concurrently; cache misses are packed into
+    multi-item API queries by the batcher. Results follow input order.
     """
-    return await calorie_ninjas_nutrition_real(canonical_name, household_id)
+    unique: Dict[str, str] = {}
+    for name in canonical_names:
+        unique.setdefault(normalize_canonical_name(name), name)
+    
+    resolved = await asyncio.gather(*[
+        get_nutrition_cached(name, household_id, db, user_email) for name in unique.values()
+    ])
+    by_name = dict(zip(unique.keys(), resolved))
+    return [
+        {**by_name[normalize_canonical_name(name)], "canonical_name": name}
+        for name in canonical_names
+    ]
+
+def get_nutrition_cache_stats() -> Dict[str, Any]:
+    hits = nutrition_cache_stats["memory_hits"] + nutrition_cache_stats["mongo_hits"] + nutrition_cache_stats["negative_hits"]
+    lookups = hits + nutrition_cache_stats["api_calls"]
+    return {
+        **nutrition_cache_stats,
+        "hit_ratio": round(hits / lookups, 4) if lookups else None,
+        "memory": _nutrition_memory_cache.stats(),
+        "batching": dict(nutrition_batch_stats),
+        "prefetch": dict(nutrition_prefetch_stats)
+    }
+
+async def calorie_ninjas_nutrition_placeholder(
+    canonical_name: str,
+    household_id: str,
+    db=None,
+    user_email: str = ""
+) -> Dict[str, Any]:
+    """
+    This now calls the real CalorieNinjas API, through the nutrition cache
+    """
+    return await get_nutrition_cached(canonical_name, household_id, db, user_email)
+
+# Nutrition prefetch: after a receipt is processed, names missing from the
+# cache are resolved by a low-priority job and the receipt's nutrition totals
+# are stored on it, so detail pages never wait on CalorieNinjas
+NUTRITION_PREFETCH_ENABLED = os.environ.get('NUTRITION_PREFETCH_ENABLED', 'true').lower() == 'true'
+# Claimed after receipt processing (0) and bulk imports (10)
+NUTRITION_PREFETCH_PRIORITY = int(os.environ.get('NUTRITION_PREFETCH_PRIORITY', '100'))
+NUTRITION_PREFETCH_NAMES_PER_SECOND = float(os.environ.get('NUTRITION_PREFETCH_NAMES_PER_SECOND', '5'))
+
+nutrition_prefetch_stats = {
+    "receipts_scheduled": 0,
+    "jobs_enqueued": 0,
+    "rollups_inline": 0,
+    "rollups_stored": 0,
+    "names_already_cached": 0,
+    "names_prefetched": 0,
+    "rate_limit_wait_seconds": 0.0
+}
+
+class RateLimiter:
+    """
+    Token bucket shared by the prefetch jobs in this process
+    """
+
+    def __init__(self, rate_per_second: float, burst: Optional[float] = None):
+        self.rate = rate_per_second
+        self.capacity = burst or max(rate_per_second, 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, tokens: float = 1.0) -> float:
+        """
+        Waits until `tokens` are available; returns seconds spent waiting.
+        Requests larger than the burst are paid for a burst at a time.
+        """
+        if self.rate <= 0:
+            return 0.0
+        started = time.monotonic()
+        remaining = tokens
+        async with self._lock:
+            while remaining > 0:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                chunk = min(remaining, self.capacity)
+                if self._tokens >= chunk:
+                    self._tokens -= chunk
+                    remaining -= chunk
+                    continue
+                await asyncio.sleep((chunk - self._tokens) / self.rate)
+        return time.monotonic() - started
+
+_nutrition_prefetch_limiter = RateLimiter(NUTRITION_PREFETCH_NAMES_PER_SECOND)
+
+def receipt_canonical_names(items: List[Dict[str, Any]]) -> List[str]:
+    """Distinct canonical names on a receipt, in first-seen order"""
+    unique: Dict[str, str] = {}
+    for item in items:
+        name = item.get("canonical_name")
+        if name and normalize_canonical_name(name):
+            unique.setdefault(normalize_canonical_name(name), name)
+    return list(unique.values())
+
+async def find_uncached_nutrition_names(canonical_names: List[str], db) -> List[str]:
+    """
+    Names with no fresh fact and no active negative entry in either cache
+    tier, checked with one query per Mongo collection
+    """
+    pending = {
+        normalize_canonical_name(name): name
+        for name in canonical_names
+        if _nutrition_memory_cache.get(normalize_canonical_name(name), None) is None
+    }
+    if not pending:
+        return []
+
+    fresh_since = datetime.utcnow() - timedelta(days=NUTRITION_FACT_MAX_AGE_DAYS)
+    async for fact in db.nutrition_facts.find(
+        {"normalized_name": {"$in": list(pending)}, "updated_date": {"$gte": fresh_since}},
+        {"_id": 0, "normalized_name": 1}
+    ):
+        pending.pop(fact["normalized_name"], None)
+
+    if pending:
+        async for failed in db.failed_nutrition_lookups.find(
+            {"normalized_name": {"$in": list(pending)}}, {"_id": 0}
+        ):
+            if _negative_result(failed, failed["normalized_name"]):
+                pending.pop(failed["normalized_name"], None)
+
+    return list(pending.values())
+
+def build_nutrition_rollup(items: List[Dict[str, Any]], nutrition: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Receipt totals: each item's per-serving facts times its quantity.
+    `nutrition` maps normalized canonical name to a lookup result.
+    """
+    totals = {field: 0.0 for field in NUTRITION_FIELDS if field != "serving_size_g"}
+    matched = 0
+    unmatched: List[str] = []
+    pending: List[str] = []
+
+    for item in items:
+        name = item.get("canonical_name")
+        result = nutrition.get(normalize_canonical_name(name)) if name else None
+        if not result or result.get("status") != "success":
+            if result and result.get("status") == "error":
+                pending.append(name)
+            else:
+                unmatched.append(name or item.get("name"))
+            continue
+        quantity = item.get("quantity") or 1
+        for field in totals:
+            totals[field] += (result.get(field) or 0) * quantity
+        matched += 1
+
+    return {
+        "totals": {field: round(value, 1) for field, value in totals.items()},
+        "items_matched": matched,
+        "items_unmatched": len(unmatched),
+        "unmatched_names": unmatched,
+        "pending_names": pending,
+        "basis": "per_serving_x_quantity",
+        "source": "CalorieNinjas",
+        "computed_date": datetime.utcnow()
+    }
+
+async def store_nutrition_rollup(
+    receipt_id: str,
+    items: List[Dict[str, Any]],
+    household_id: str,
+    user_email: str,
+    db
+) -> Dict[str, Any]:
+    """
+    Computes the receipt's rollup from the nutrition cache and stores it
+    """
+    names = receipt_canonical_names(items)
+    results = await get_nutrition_batch(names, household_id, db, user_email) if names else []
+    rollup = build_nutrition_rollup(
+        items, {normalize_canonical_name(r["canonical_name"]): r for r in results}
+    )
+    await db.receipts.update_one({"id": receipt_id}, {"$set": {"nutrition_rollup": rollup}})
+    invalidate_receipt(receipt_id)
+    nutrition_prefetch_stats["rollups_stored"] += 1
+    return rollup
+
+async def schedule_nutrition_prefetch(
+    receipt_id: str,
+    items: List[Dict[str, Any]],
+    household_id: str,
+    user_email: str,
+    db
+) -> Optional[Dict[str, Any]]:
+    """
+    Stores the rollup straight away when every name is already cached,
+    otherwise queues a low-priority prefetch job that fetches the missing
+    names and then stores the rollup. Returns the queued job, if any.
+    """
+    if not NUTRITION_PREFETCH_ENABLED:
+        return None
+    nutrition_prefetch_stats["receipts_scheduled"] += 1
+    names = receipt_canonical_names(items)
+    missing = await find_uncached_nutrition_names(names, db) if names else []
+    nutrition_prefetch_stats["names_already_cached"] += len(names) - len(missing)
+
+    if not missing:
+        await store_nutrition_rollup(receipt_id, items, household_id, user_email, db)
+        nutrition_prefetch_stats["rollups_inline"] += 1
+        return None
+
+    job = await enqueue_job(
+        db,
+        JOB_TYPE_NUTRITION_PREFETCH,
+        {
+            "receipt_id": receipt_id,
+            "canonical_names": missing,
+            "household_id": household_id,
+            "user_email": user_email
+        },
+        priority=NUTRITION_PREFETCH_PRIORITY
+    )
+    nutrition_prefetch_stats["jobs_enqueued"] += 1
+    return job
+
+async def run_nutrition_prefetch_job(payload: Dict[str, Any], db) -> Dict[str, Any]:
+    """
+    Job queue handler for nutrition_prefetch jobs. Names are fetched in
+    batcher-sized groups under the prefetch rate limit; the job fails (and is
+    retried with backoff) if the API errored for any of them.
+    """
+    household_id = payload['household_id']
+    user_email = payload.get('user_email', "")
+    # Re-check: another receipt's prefetch may have fetched these meanwhile
+    missing = await find_uncached_nutrition_names(payload.get('canonical_names', []), db)
+
+    for start in range(0, len(missing), NUTRITION_BATCH_MAX_NAMES):
+        group = missing[start:start + NUTRITION_BATCH_MAX_NAMES]
+        nutrition_prefetch_stats["rate_limit_wait_seconds"] += await _nutrition_prefetch_limiter.acquire(len(group))
+        await get_nutrition_batch(group, household_id, db, user_email)
+        nutrition_prefetch_stats["names_prefetched"] += len(group)
+
+    receipt = await db.receipts.find_one({"id": payload['receipt_id']}, {"_id": 0, "items": 1})
+    if not receipt:
+        return {"status": "skipped", "reason": "receipt not found"}
+
+    rollup = await store_nutrition_rollup(payload['receipt_id'], receipt.get("items", []), household_id, user_email, db)
+    if rollup["pending_names"]:
+        raise RuntimeError(f"Nutrition lookup failed for {len(rollup['pending_names'])} items")
+    return {"status": "success", "receipt_id": payload['receipt_id'], "prefetched": len(missing)}
+
+BREVO_EMAIL_URL = "https://api.brevo.com/v3/smtp/email"
 
 async def send_email_placeholder(to: str, subject: str, body: str) -> Dict[str, Any]:
     """
-    Placeholder for Email Service (Brevo)
-    Replace with actual email integration when configured
+    Email Service (Brevo)
+    Sends through the Brevo API when BREVO_API_KEY is configured,
+    otherwise logs and reports the placeholder status
     """
+    api_key = os.environ.get('BREVO_API_KEY')
+    if api_key:
+        try:
+            response = await http_request(
+                'POST',
+                BREVO_EMAIL_URL,
+                headers={'api-key': api_key},
+                json={
+                    "sender": {
+                        "name": os.environ.get('EMAIL_SENDER_NAME', 'GroceryTrack'),
+                        "email": os.environ.get('EMAIL_SENDER_ADDRESS', 'no-reply@grocerytrack.app')
+                    },
+                    "to": [{"email": to}],
+                    "subject": subject,
+                    "textContent": body
+                }
+            )
+            sent = response.status_code < 300
+            if not sent:
+                logger.error(f"Brevo API error: {response.status_code} - {response.text}")
+            return {
+                "status": "success" if sent else "error",
+                "to": to,
+                "subject": subject,
+                "sent": sent
+            }
+        except httpx.HTTPError as e:
+            logger.error(f"Network error sending email: {str(e)}")
+            return {"status": "error", "error": str(e), "to": to, "subject": subject, "sent": False}
+    
     logger.info(f"[PLACEHOLDER] Email send called to: {to}, subject: {subject}")
     
     return {
@@ -315,36 +1303,86 @@ async def process_receipt_in_background(
     total_amount: float,
     household_id: str,
     user_email: str,
-    db
+    db,
+    final_attempt: bool = True
 ) -> Dict[str, Any]:
     """
     Orchestrates the receipt processing pipeline
     Now calls real AWS Textract and enhanced LLM processing
+    A failure marks the receipt as errored only on the final attempt;
+    earlier ones leave it processing for the job queue's retry.
     """
+    timings: Dict[str, float] = {}
+    store_label = get_store_profile(store_name)
+    started = time.perf_counter()
     try:
         logger.info(f"Processing receipt {receipt_id} with real integrations")
         
         # Step 1: Real OCR with AWS Textract
-        textract_data = await textract_ocr_real(image_urls)
+        await publish_receipt_event(receipt_id, STAGE_OCR_STARTED, images=len(image_urls))
+        with stage_timer(timings, "ocr", store_label):
+            textract_data = await textract_ocr_real(image_urls)
+        await publish_receipt_event(
+            receipt_id, STAGE_OCR_DONE,
+            lines=len(extract_ocr_lines(textract_data)),
+            status=textract_data.get("status")
+        )
         
-        # Step 2: LLM Enhancement with real OpenAI
-        enhanced_data = await enhance_receipt_with_llm_real(
-            textract_data, store_name, total_amount, 'GBP'
+        # Step 2: Local parser fast path, falling back to LLM Enhancement with real OpenAI
+        with stage_timer(timings, "parse", store_label):
+            enhanced_data = try_fast_path(
+                extract_ocr_lines(textract_data), store_name, total_amount, 'GBP'
+            )
+        extraction_method = "local_parser"
+        if enhanced_data is None:
+            extraction_method = "llm"
+            with stage_timer(timings, "llm", store_label):
+                enhanced_data = await enhance_receipt_with_llm_real(
+                    textract_data, store_name, total_amount, 'GBP', db
+                )
+        await publish_receipt_event(
+            receipt_id, STAGE_LLM_DONE,
+            extraction_method=extraction_method,
+            items=len(enhanced_data["items"])
         )
         
         # Step 3: Update receipt in database
+        # processing_timings covers everything before this write; the write
+        # itself is only recorded in the db_update histogram
+        timings["pipeline_ms"] = round((time.perf_counter() - started) * 1000, 1)
         update_data = {
             "items": enhanced_data["items"],
             "receipt_insights": enhanced_data["receipt_insights"],
+            "extraction_method": extraction_method,
+            "llm_usage": enhanced_data.get("llm_usage"),
+            "processing_timings": timings,
             "validation_status": "review_insights",
-            "updated_date": datetime.utcnow().isoformat(),
+            "updated_date": datetime.utcnow(),
             "textract_data": textract_data  # Store OCR results
         }
         
-        await db.receipts.update_one(
-            {"id": receipt_id},
-            {"$set": update_data}
-        )
+        with stage_timer({}, "db_update", store_label):
+            await db.receipts.update_one(
+                {"id": receipt_id},
+                {"$set": update_data}
+            )
+        invalidate_receipt(receipt_id)
+        record_stage("total", time.perf_counter() - started, store_label)
+        await publish_receipt_event(receipt_id, STAGE_SAVED, validation_status="review_insights")
+        
+        # Step 4: Warm nutrition facts and refresh the household's inflation
+        # index; the receipt is already saved, so a failure here must not
+        # mark it as errored
+        try:
+            await schedule_nutrition_prefetch(
+                receipt_id, enhanced_data["items"], household_id, user_email, db
+            )
+        except Exception as e:
+            logger.warning(f"Could not schedule nutrition prefetch for receipt {receipt_id}: {str(e)}")
+        try:
+            await schedule_personal_inflation(household_id, db)
+        except Exception as e:
+            logger.warning(f"Could not schedule personal inflation for household {household_id}: {str(e)}")
         
         logger.info(f"Receipt {receipt_id} processed with real Textract")
         return {"status": "success", "receipt_id": receipt_id}
@@ -352,17 +1390,65 @@ async def process_receipt_in_background(
     except Exception as e:
         logger.error(f"Error processing receipt {receipt_id}: {str(e)}")
         
-        # Update receipt status to error
-        await db.receipts.update_one(
-            {"id": receipt_id},
-            {"$set": {
-                "validation_status": "error",
-                "processing_error": str(e)
-            }}
-        )
+        if final_attempt:
+            await mark_receipt_processing_failed(receipt_id, str(e), db)
+        else:
+            await db.receipts.update_one(
+                {"id": receipt_id},
+                {"$set": {"processing_error": str(e)}}
+            )
+            invalidate_receipt(receipt_id)
+            await publish_receipt_event(receipt_id, STAGE_RETRYING, error=str(e))
         
         raise
 
+async def mark_receipt_processing_failed(receipt_id: str, error: str, db) -> None:
+    """
+    Update receipt status to error and end its event stream
+    """
+    await db.receipts.update_one(
+        {"id": receipt_id},
+        {"$set": {
+            "validation_status": "error",
+            "processing_error": error
+        }}
+    )
+    invalidate_receipt(receipt_id)
+    await publish_receipt_event(receipt_id, STAGE_ERROR, error=error)
+
+async def run_process_receipt_job(payload: Dict[str, Any], db) -> Dict[str, Any]:
+    """
+    Job queue handler for process_receipt jobs; failed attempts are retried
+    by the queue, and fail_process_receipt_job runs after the last one
+    """
+    return await process_receipt_in_background(
+        payload['receipt_id'],
+        payload['image_urls'],
+        payload['store_name'],
+        payload['total_amount'],
+        payload['household_id'],
+        payload['user_email'],
+        db,
+        final_attempt=False
+    )
+
+async def fail_process_receipt_job(payload: Dict[str, Any], db, error: str) -> None:
+    """
+    Job queue failure handler for process_receipt jobs out of attempts
+    """
+    await mark_receipt_processing_failed(payload['receipt_id'], error, db)
+
+async def run_reconcile_credit_balances_job(payload: Dict[str, Any], db) -> Dict[str, Any]:
+    """
+    Job queue handler for reconcile_credit_balances jobs
+    """
+    return await reconcile_household_balances(
+        db,
+        period=payload.get('period'),
+        household_id=payload.get('household_id'),
+        fix=payload.get('fix', True)
+    )
+
 async def generate_receipt_insights_in_background(
     receipt_id: str,
     image_urls: List[str],
@@ -379,19 +1465,136 @@ async def generate_receipt_insights_in_background(
         receipt_id, image_urls, store_name, total_amount, household_id, user_email, db
     )
 
-async def ons_data_fetcher() -> List[Dict[str, Any]]:
+# CPI annual rate (D7G7) from the ONS MM23 dataset
+ONS_CPI_SERIES_URL = os.environ.get(
+    'ONS_CPI_SERIES_URL',
+    'https://www.ons.gov.uk/economy/inflationandpriceindices/timeseries/d7g7/mm23/data'
+)
+ONS_MONTHS = {
+    "JAN": "01", "FEB": "02", "MAR": "03", "APR": "04", "MAY": "05", "JUN": "06",
+    "JUL": "07", "AUG": "08", "SEP": "09", "OCT": "10", "NOV": "11", "DEC": "12"
+}
+ONS_FALLBACK_SERIES = [
+    {"date": "2024-01", "inflation_rate": 4.0},
+    {"date": "2024-02", "inflation_rate": 3.8},
+    {"date": "2024-03", "inflation_rate": 3.5}
+]
+
+def parse_ons_months(data: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Converts ONS timeseries 'months' rows ("2024 JAN") to YYYY-MM rows"""
+    rows = []
+    for month in data.get("months", []):
+        parts = month.get("date", "").split()
+        if len(parts) != 2 or parts[1][:3].upper() not in ONS_MONTHS:
+            continue
+        try:
+            rate = float(month.get("value"))
+        except (TypeError, ValueError):
+            continue
+        rows.append({"date": f"{parts[0]}-{ONS_MONTHS[parts[1][:3].upper()]}", "inflation_rate": rate})
+    return rows
+
+# Served from memory; refreshed from ONS by a background task and shared
+# between processes through the ons_series collection
+ONS_SERIES_COLLECTION = 'ons_series'
+ONS_SERIES_ID = 'D7G7'
+ONS_REFRESH_INTERVAL_SECONDS = int(os.environ.get('ONS_REFRESH_INTERVAL_SECONDS', str(6 * 3600)))
+ONS_MAX_AGE_SECONDS = int(os.environ.get('ONS_MAX_AGE_SECONDS', str(24 * 3600)))
+
+_ons_series: Dict[str, Any] = {"rows": None, "fetched_date": None}
+_ons_refresh_task: Optional[asyncio.Task] = None
+
+async def fetch_ons_series() -> Optional[List[Dict[str, Any]]]:
+    """Live fetch of the CPI series; None if ONS is unavailable"""
+    logger.info("Fetching ONS inflation data")
+    try:
+        response = await http_request('GET', ONS_CPI_SERIES_URL)
+        if response.status_code == 200:
+            rows = parse_ons_months(response.json())
+            if rows:
+                return rows
+        logger.error(f"ONS API error: {response.status_code}")
+    except (httpx.HTTPError, ValueError) as e:
+        logger.error(f"Error fetching ONS data: {str(e)}")
+    return None
+
+async def refresh_ons_series(db, force: bool = False) -> Dict[str, Any]:
     """
-    Fetches UK inflation data from ONS API
-    This is a real API with no auth required
+    Loads the stored series into memory, fetching from ONS first if the
+    stored copy is missing or older than ONS_MAX_AGE_SECONDS
     """
-    logger.info("Fetching ONS inflation data")
-    
-    # Placeholder - implement actual ONS API call
-    return [
-        {"date": "2024-01", "inflation_rate": 4.0},
-        {"date": "2024-02", "inflation_rate": 3.8},
-        {"date": "2024-03", "inflation_rate": 3.5}
-    ]
+    stored = await db[ONS_SERIES_COLLECTION].find_one({"_id": ONS_SERIES_ID})
+    stale = not stored or (datetime.utcnow() - stored["fetched_date"]).total_seconds() > ONS_MAX_AGE_SECONDS
+    if force or stale:
+        rows = await fetch_ons_series()
+        if rows:
+            stored = {"_id": ONS_SERIES_ID, "rows": rows, "fetched_date": datetime.utcnow()}
+            await db[ONS_SERIES_COLLECTION].replace_one({"_id": ONS_SERIES_ID}, stored, upsert=True)
+    if stored:
+        _ons_series["rows"] = stored["rows"]
+        _ons_series["fetched_date"] = stored["fetched_date"]
+    return {"rows": len(_ons_series["rows"] or []), "fetched_date": _ons_series["fetched_date"]}
+
+async def _run_ons_refresh(db) -> None:
+    while True:
+        try:
+            await refresh_ons_series(db)
+        except Exception as e:
+            logger.error(f"Error refreshing ONS series: {str(e)}")
+        await asyncio.sleep(ONS_REFRESH_INTERVAL_SECONDS)
+
+def start_ons_refresher(db) -> None:
+    """Starts the scheduled ONS refresh; call once on app startup"""
+    global _ons_refresh_task
+    if _ons_refresh_task is None:
+        _ons_refresh_task = asyncio.create_task(_run_ons_refresh(db))
+
+def stop_ons_refresher() -> None:
+    global _ons_refresh_task
+    if _ons_refresh_task is not None:
+        _ons_refresh_task.cancel()
+        _ons_refresh_task = None
+
+async def ons_data_fetcher(db=None) -> List[Dict[str, Any]]:
+    """
+    UK CPI inflation (ONS D7G7), served from the in-memory copy. Falls back
+    to a direct load when the refresher hasn't run yet in this process.
+    """
+    if _ons_series["rows"] is None and db is not None:
+        await refresh_ons_series(db)
+    return _ons_series["rows"] or ONS_FALLBACK_SERIES
+
+async def get_ons_rates(db=None) -> Dict[str, float]:
+    """Month (YYYY-MM) -> CPI annual rate"""
+    return {row["date"]: row["inflation_rate"] for row in await ons_data_fetcher(db)}
+
+# Personal inflation is materialized per household per month by a queued
+# job; at most one job per household waits in the queue at a time
+PERSONAL_INFLATION_PRIORITY = int(os.environ.get('PERSONAL_INFLATION_PRIORITY', '50'))
+
+async def schedule_personal_inflation(household_id: str, db) -> Optional[Dict[str, Any]]:
+    """Queues a recompute unless one is already waiting for the household"""
+    if not household_id:
+        return None
+    pending = await db[JOBS_COLLECTION].find_one({
+        "job_type": JOB_TYPE_PERSONAL_INFLATION,
+        "status": JOB_STATUS_QUEUED,
+        "payload.household_id": household_id
+    }, {"_id": 0, "id": 1})
+    if pending:
+        return None
+    return await enqueue_job(
+        db,
+        JOB_TYPE_PERSONAL_INFLATION,
+        {"household_id": household_id},
+        priority=PERSONAL_INFLATION_PRIORITY
+    )
+
+async def run_personal_inflation_job(payload: Dict[str, Any], db) -> Dict[str, Any]:
+    """
+    Job queue handler for personal_inflation jobs
+    """
+    return await materialize_household_inflation(db, payload['household_id'], await get_ons_rates(db))
 
 def generate_invitation_token() -> str:
     """Generate a random invitation token"""
@@ -419,8 +1622,8 @@ async def send_invitation(
             "inviter_name": inviter_name,
             "token": token,
             "status": "pending",
-            "expires_at": expires_at.isoformat(),
-            "created_date": datetime.utcnow().isoformat()
+            "expires_at": expires_at,
+            "created_date": datetime.utcnow()
         }
         
         await db.household_invitations.insert_one(invitation)
@@ -471,6 +1674,8 @@ async def delete_user_account(user_id: str, user_email: str, db) -> Dict[str, An
         
         result = await db.credit_logs.delete_many({"user_email": user_email})
         deleted_summary["credit_logs"] = result.deleted_count
+        await db[CREDIT_ROLLUPS_COLLECTION].delete_many({"user_email": user_email})
+        clear_read_cache()
         
         # Send confirmation email (placeholder)
         await send_email_placeholder(
@@ -509,6 +1714,7 @@ async def assign_household_to_old_receipts(user_email: str, household_id: str, d
         )
         
         budgets_updated = result.modified_count
+        clear_read_cache()
         
         return {
             "status": "success",
@@ -540,7 +1746,8 @@ async def generate_modeled_data(action: str, user_email: str, household_id: str,
                     "is_test_data": True,
                     "validation_status": "review_insights",
                     "currency": "GBP",
-                    "created_date": datetime.utcnow().isoformat()
+                    "created_date": datetime.utcnow(),
+                    "updated_date": datetime.utcnow()
                 }
                 mock_receipts.append(receipt)
             
@@ -556,6 +1763,7 @@ async def generate_modeled_data(action: str, user_email: str, household_id: str,
                 "user_email": user_email,
                 "is_test_data": True
             })
+            clear_read_cache()
             
             return {
                 "status": "success",
@@ -568,46 +1776,30 @@ async def generate_modeled_data(action: str, user_email: str, household_id: str,
         logger.error(f"Error with modeled data: {str(e)}")
         raise
 
+def parse_report_bound(value: Optional[str], end: bool = False) -> Optional[datetime]:
+    """
+    Parses a report date filter. A bare end date includes that whole day;
+    the returned end bound is exclusive.
+    """
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value)
+    if end:
+        parsed += timedelta(days=1) if len(value) == 10 else timedelta(microseconds=1)
+    return parsed
+
 async def get_comprehensive_credit_report(start_date: Optional[str], end_date: Optional[str], db) -> Dict[str, Any]:
     """
     Admin function: comprehensive credit usage report
+    Computed in MongoDB from the daily credit rollups, with raw logs only
+    for partial days at the range edges
     """
     try:
-        filter_query = {}
-        if start_date:
-            filter_query["timestamp"] = {"$gte": datetime.fromisoformat(start_date)}
-        if end_date:
-            if "timestamp" not in filter_query:
-                filter_query["timestamp"] = {}
-            filter_query["timestamp"]["$lte"] = datetime.fromisoformat(end_date)
-        
-        credit_logs = await db.credit_logs.find(filter_query).to_list(10000)
-        
-        report = {
-            "total_credits_consumed": sum(log.get("credits_consumed", 0) for log in credit_logs),
-            "total_events": len(credit_logs),
-            "by_event_type": {},
-            "by_user": {}
-        }
-        
-        for log in credit_logs:
-            event_type = log.get("event_type", "unknown")
-            user_email = log.get("user_email", "unknown")
-            credits = log.get("credits_consumed", 0)
-            
-            # Aggregate by event type
-            if event_type not in report["by_event_type"]:
-                report["by_event_type"][event_type] = {"count": 0, "credits": 0}
-            report["by_event_type"][event_type]["count"] += 1
-            report["by_event_type"][event_type]["credits"] += credits
-            
-            # Aggregate by user
-            if user_email not in report["by_user"]:
-                report["by_user"][user_email] = {"events": 0, "credits": 0}
-            report["by_user"][user_email]["events"] += 1
-            report["by_user"][user_email]["credits"] += credits
-        
-        return report
+        return await build_credit_report(
+            db,
+            parse_report_bound(start_date),
+            parse_report_bound(end_date, end=True)
+        )
         
     except Exception as e:
         logger.error(f"Error generating credit report: {str(e)}")
@@ -628,7 +1820,7 @@ async def create_test_run(name: str, description: str, created_by_email: str, db
             "total_receipts": 0,
             "reviewed_receipts": 0,
             "created_by_email": created_by_email,
-            "created_date": datetime.utcnow().isoformat()
+            "created_date": datetime.utcnow()
         }
         
         await db.test_runs.insert_one(test_run)
@@ -671,7 +1863,7 @@ async def submit_ocr_quality_feedback(
                 "store_name": store_name,
                 "reviewer_id": reviewer_id,
                 "reviewer_email": reviewer_email,
-                "timestamp": datetime.utcnow().isoformat()
+                "timestamp": datetime.utcnow()
             }
             
             await db.ocr_quality_logs.insert_one(quality_log)
@@ -749,6 +1941,7 @@ async def rollover_budget(household_id: str, user_email: str, db) -> Dict[str, A
             {"id": active_budget["id"]},
             {"$set": {"is_active": False}}
         )
+        invalidate_budgets(household_id)
         
         # Create new budget for next period
         # Logic depends on budget type (monthly/weekly)
@@ -758,27 +1951,212 @@ async def rollover_budget(household_id: str, user_email: str, db) -> Dict[str, A
         logger.error(f"Error rolling over budget: {str(e)}")
         raise
 
+# Incremental market aggregation: validated receipts updated since the
+# persisted watermark are folded into monthly price buckets and the
+# aggregated_grocery_data summary by $merge pipelines, one time slice at a
+# time, advancing the watermark after each slice so a crashed run resumes
+# where it stopped
+AGGREGATION_STATE_COLLECTION = 'aggregation_state'
+AGGREGATION_STATE_ID = 'aggregated_grocery_data'
+AGGREGATION_SLICE_HOURS = float(os.environ.get('AGGREGATION_SLICE_HOURS', '24'))
+# Receipts updated in the last few seconds are left for the next run, so a
+# write that commits late (or from a skewed clock) is not skipped
+AGGREGATION_LAG_SECONDS = int(os.environ.get('AGGREGATION_LAG_SECONDS', '30'))
+AGGREGATION_LOCK_SECONDS = int(os.environ.get('AGGREGATION_LOCK_SECONDS', '900'))
+AGGREGATED_RECEIPT_FILTER = {"validation_status": "validated", "is_test_data": {"$ne": True}}
+
+def _updated_between(lower: datetime, upper: datetime) -> Dict[str, Any]:
+    return {"updated_date": {"$gt": lower, "$lte": upper}}
+
+async def _next_receipt_update(db, lower: datetime, upper: datetime) -> Optional[datetime]:
+    """Earliest aggregated receipt update in (lower, upper]"""
+    doc = await db.receipts.find_one(
+        {**AGGREGATED_RECEIPT_FILTER, **_updated_between(lower, upper)},
+        {"_id": 0, "updated_date": 1},
+        sort=[("updated_date", 1)]
+    )
+    return doc["updated_date"] if doc else None
+
+def build_grocery_aggregation_pipeline(lower: datetime, upper: datetime) -> List[Dict[str, Any]]:
+    """
+    Latest price per store and canonical item from the receipts updated in
+    (lower, upper], merged into aggregated_grocery_data. The observations
+    themselves go to monthly buckets (see price_series).
+    """
+    return [
+        {"$match": {**AGGREGATED_RECEIPT_FILTER, **_updated_between(lower, upper)}},
+        {"$unwind": "$items"},
+        {"$match": {"items.canonical_name": {"$nin": [None, ""]}}},
+        {"$project": {
+            "_id": 0,
+            "store_name": "$supermarket",
+            "location_city": "$store_location",
+            "item_canonical_name": "$items.canonical_name",
+            "category": {"$ifNull": ["$items.category", "Other"]},
+            "date": "$purchase_date",
+            "price": {"$ifNull": [
+                "$items.unit_price",
+                {"$cond": [
+                    {"$gt": [{"$ifNull": ["$items.quantity", 0]}, 0]},
+                    {"$divide": ["$items.total_price", "$items.quantity"]},
+                    "$items.total_price"
+                ]}
+            ]}
+        }},
+        {"$match": {"price": {"$gt": 0}}},
+        {"$sort": {"date": 1}},
+        {"$group": {
+            "_id": {"store_name": "$store_name", "item_canonical_name": "$item_canonical_name"},
+            "category": {"$last": "$category"},
+            "location_city": {"$last": "$location_city"},
+            "latest_price": {"$last": "$price"},
+            "latest_observation_date": {"$last": "$date"}
+        }},
+        {"$project": {
+            "_id": 0,
+            "store_name": "$_id.store_name",
+            "item_canonical_name": "$_id.item_canonical_name",
+            "category": 1,
+            "location_city": 1,
+            "latest_price": 1,
+            "latest_observation_date": 1,
+            "last_updated_date": "$$NOW",
+            "created_date": "$$NOW",
+            "updated_date": "$$NOW"
+        }},
+        {"$merge": {
+            "into": "aggregated_grocery_data",
+            "on": ["store_name", "item_canonical_name"],
+            "whenMatched": [
+                {"$set": {
+                    "latest_price": {"$cond": [
+                        {"$gte": ["$$new.latest_observation_date", {"$ifNull": ["$latest_observation_date", ""]}]},
+                        "$$new.latest_price",
+                        "$latest_price"
+                    ]},
+                    "latest_observation_date": {"$max": ["$$new.latest_observation_date", "$latest_observation_date"]},
+                    "category": "$$new.category",
+                    "location_city": {"$ifNull": ["$$new.location_city", "$location_city"]},
+                    "last_updated_date": "$$NOW",
+                    "updated_date": "$$NOW"
+                }},
+                # Observation arrays now live in price_observation_buckets
+                {"$unset": "price_observations"}
+            ],
+            "whenNotMatched": "insert"
+        }}
+    ]
+
 async def aggregate_grocery_data(db) -> Dict[str, Any]:
     """
     Aggregates validated receipt data for market insights
-    Background job - processes all receipts
+    Background job - processes receipts updated since the last run
     """
+    state = db[AGGREGATION_STATE_COLLECTION]
+    run_id = generate_uuid()
+    now = datetime.utcnow()
+    
+    # Single runner: take a lease on the state document. A crashed run's
+    # lease expires and the next run continues from its last watermark.
+    try:
+        lock = await state.find_one_and_update(
+            {"_id": AGGREGATION_STATE_ID, "$or": [
+                {"locked_until": {"$lt": now}},
+                {"locked_until": None}
+            ]},
+            {"$set": {"locked_until": now + timedelta(seconds=AGGREGATION_LOCK_SECONDS), "run_id": run_id}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+    except DuplicateKeyError:
+        return {"status": "skipped", "message": "Aggregation already running", "items_processed": 0}
+    
     try:
-        # This would be a scheduled job
         logger.info("Aggregating grocery data from validated receipts")
+        # The $merge targets must have their unique indexes before merging
+        await ensure_indexes(db, ["receipts", "aggregated_grocery_data", PRICE_BUCKETS_COLLECTION])
+        started = time.perf_counter()
+        upper = now - timedelta(seconds=AGGREGATION_LAG_SECONDS)
+        watermark = lock.get("watermark") or datetime(1970, 1, 1)
+        receipts_processed = 0
+        slices = 0
         
-        # Placeholder implementation
-        return {
+        while watermark < upper:
+            # Skip empty stretches straight to the next updated receipt
+            next_update = await _next_receipt_update(db, watermark, upper)
+            if next_update is None:
+                watermark = upper
+                break
+            lower = max(watermark, next_update - timedelta(microseconds=1))
+            slice_end = min(lower + timedelta(hours=AGGREGATION_SLICE_HOURS), upper)
+            
+            receipts_processed += await db.receipts.count_documents(
+                {**AGGREGATED_RECEIPT_FILTER, **_updated_between(lower, slice_end)}
+            )
+            # Every updated receipt, including ones no longer validated,
+            # leaves the buckets before the validated ones are merged back
+            await pull_receipt_observations(db, await db.receipts.distinct("id", _updated_between(lower, slice_end)))
+            async for _ in db.receipts.aggregate(
+                build_bucket_merge_stages({**AGGREGATED_RECEIPT_FILTER, **_updated_between(lower, slice_end)})
+            ):
+                pass
+            async for _ in db.receipts.aggregate(build_grocery_aggregation_pipeline(lower, slice_end)):
+                pass
+            slices += 1
+            watermark = slice_end
+            await state.update_one(
+                {"_id": AGGREGATION_STATE_ID, "run_id": run_id},
+                {"$set": {
+                    "watermark": watermark,
+                    "locked_until": datetime.utcnow() + timedelta(seconds=AGGREGATION_LOCK_SECONDS)
+                }}
+            )
+        
+        # $merge inserts cannot generate ids; derive them for new documents
+        await db.aggregated_grocery_data.update_many(
+            {"id": {"$exists": False}},
+            [{"$set": {"id": {"$toString": "$_id"}}}]
+        )
+        
+        elapsed = time.perf_counter() - started
+        result = {
             "status": "success",
             "message": "Aggregation completed",
-            "items_processed": 0
+            "items_processed": receipts_processed,
+            "slices": slices,
+            "watermark": watermark.isoformat(),
+            "elapsed_seconds": round(elapsed, 3),
+            "receipts_per_second": round(receipts_processed / elapsed, 1) if elapsed > 0 else None
         }
+        record_stage("grocery_aggregation", elapsed)
+        await state.update_one(
+            {"_id": AGGREGATION_STATE_ID, "run_id": run_id},
+            {"$set": {"watermark": watermark, "locked_until": None, "last_run": {**result, "finished_date": datetime.utcnow()}}}
+        )
+        logger.info(f"Aggregated {receipts_processed} receipts ({result['receipts_per_second']} receipts/sec)")
+        return result
         
     except Exception as e:
         logger.error(f"Error aggregating data: {str(e)}")
+        await state.update_one({"_id": AGGREGATION_STATE_ID, "run_id": run_id}, {"$set": {"locked_until": None}})
         raise
 
 # Helper function for UUID
 def generate_uuid():
     import uuid
     return str(uuid.uuid4())
+
+# ==================== JOB HANDLERS ====================
+
+# Handlers run by ReceiptWorkerPool, keyed by job_type. Defined last so every handler above exists
+JOB_HANDLERS = {
+    JOB_TYPE_PROCESS_RECEIPT: run_process_receipt_job,
+    JOB_TYPE_NUTRITION_PREFETCH: run_nutrition_prefetch_job,
+    JOB_TYPE_PERSONAL_INFLATION: run_personal_inflation_job,
+    JOB_TYPE_RECONCILE_CREDIT_BALANCES: run_reconcile_credit_balances_job
+}
+
+# Run once a job has failed its last attempt, keyed by job_type
+JOB_FAILURE_HANDLERS = {
+    JOB_TYPE_PROCESS_RECEIPT: fail_process_receipt_job
+}
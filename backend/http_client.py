@@ -0,0 +1,108 @@
+import os
+import time
+import logging
+from typing import Dict, Any, Optional
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# ==================== CONFIGURATION ====================
+
+HTTP_MAX_CONNECTIONS = int(os.environ.get('HTTP_MAX_CONNECTIONS', '100'))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.environ.get('HTTP_MAX_KEEPALIVE_CONNECTIONS', '20'))
+HTTP_KEEPALIVE_EXPIRY_SECONDS = float(os.environ.get('HTTP_KEEPALIVE_EXPIRY_SECONDS', '30'))
+HTTP_TIMEOUT_SECONDS = float(os.environ.get('HTTP_TIMEOUT_SECONDS', '10'))
+HTTP_CONNECT_TIMEOUT_SECONDS = float(os.environ.get('HTTP_CONNECT_TIMEOUT_SECONDS', '5'))
+HTTP_POOL_TIMEOUT_SECONDS = float(os.environ.get('HTTP_POOL_TIMEOUT_SECONDS', '5'))
+
+_client: Optional[httpx.AsyncClient] = None
+
+http_stats = {
+    "requests": 0,
+    "errors": 0,
+    "in_flight": 0,
+    "max_in_flight": 0,
+    "request_seconds_total": 0.0
+}
+
+# ==================== SHARED CLIENT ====================
+
+def _build_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY_SECONDS
+        ),
+        timeout=httpx.Timeout(
+            HTTP_TIMEOUT_SECONDS,
+            connect=HTTP_CONNECT_TIMEOUT_SECONDS,
+            pool=HTTP_POOL_TIMEOUT_SECONDS
+        )
+    )
+
+async def start_http_client() -> None:
+    """Creates the shared client; called on app/worker startup"""
+    global _client
+    if _client is None:
+        _client = _build_client()
+
+async def close_http_client() -> None:
+    """Closes pooled connections; called on shutdown"""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Returns the shared keep-alive client, creating it on first use for
+    processes that skip startup (scripts, one-off jobs)
+    """
+    global _client
+    if _client is None:
+        _client = _build_client()
+    return _client
+
+async def http_request(method: str, url: str, **kwargs) -> httpx.Response:
+    """
+    Sends a request through the shared pool, tracking concurrency and latency
+    """
+    client = get_http_client()
+    http_stats["requests"] += 1
+    http_stats["in_flight"] += 1
+    http_stats["max_in_flight"] = max(http_stats["max_in_flight"], http_stats["in_flight"])
+    started = time.perf_counter()
+    try:
+        return await client.request(method, url, **kwargs)
+    except httpx.HTTPError:
+        http_stats["errors"] += 1
+        raise
+    finally:
+        http_stats["in_flight"] -= 1
+        http_stats["request_seconds_total"] += time.perf_counter() - started
+
+def get_http_stats() -> Dict[str, Any]:
+    """
+    Request counters plus connection pool utilisation
+    """
+    connections = None
+    idle = None
+    # httpx does not expose its pool publicly; read httpcore's view if present
+    pool = getattr(getattr(_client, "_transport", None), "_pool", None)
+    if pool is not None and hasattr(pool, "connections"):
+        connections = len(pool.connections)
+        idle = sum(1 for connection in pool.connections if connection.is_idle())
+
+    requests_made = http_stats["requests"]
+    return {
+        **http_stats,
+        "avg_request_seconds": round(http_stats["request_seconds_total"] / requests_made, 4) if requests_made else None,
+        "pool": {
+            "max_connections": HTTP_MAX_CONNECTIONS,
+            "max_keepalive_connections": HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            "open_connections": connections,
+            "idle_connections": idle,
+            "utilisation": round(http_stats["in_flight"] / HTTP_MAX_CONNECTIONS, 4)
+        }
+    }
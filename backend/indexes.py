@@ -0,0 +1,287 @@
+import os
+import logging
+from typing import Dict, Any, List, Optional, Iterable
+from pymongo import IndexModel, ASCENDING, DESCENDING
+from pymongo.errors import OperationFailure, PyMongoError
+
+from job_queue import JOBS_COLLECTION, JOB_INDEXES
+from credits import CREDIT_ROLLUPS_COLLECTION, HOUSEHOLD_BALANCES_COLLECTION
+from price_series import PRICE_BUCKETS_COLLECTION
+from inflation import PERSONAL_INFLATION_COLLECTION
+
+logger = logging.getLogger(__name__)
+
+# ==================== INDEX REGISTRY ====================
+
+# Every index the API and workers rely on, by collection. Applied on
+# startup with create_indexes, which is a no-op for indexes that exist.
+# Names are left to MongoDB's defaults so indexes created before the
+# registry are recognised rather than duplicated.
+INDEX_REGISTRY: Dict[str, List[IndexModel]] = {
+    "receipts": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        # Keyset pages walk (created_date, id) newest first
+        IndexModel([("created_date", DESCENDING), ("id", DESCENDING)]),
+        IndexModel([("household_id", ASCENDING), ("created_date", DESCENDING), ("id", DESCENDING)]),
+        IndexModel([("user_email", ASCENDING), ("created_date", DESCENDING)]),
+        # Incremental grocery aggregation watermark scan
+        IndexModel([("validation_status", ASCENDING), ("updated_date", ASCENDING)])
+    ],
+    "budgets": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("household_id", ASCENDING), ("is_active", ASCENDING)]),
+        IndexModel([("household_id", ASCENDING), ("created_date", DESCENDING), ("id", DESCENDING)]),
+        IndexModel([("created_date", DESCENDING), ("id", DESCENDING)]),
+        IndexModel([("user_email", ASCENDING)])
+    ],
+    "households": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("created_date", DESCENDING), ("id", DESCENDING)])
+    ],
+    "household_invitations": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("token", ASCENDING)], unique=True),
+        IndexModel([("invitee_email", ASCENDING)])
+    ],
+    "credit_logs": [
+        # Lets a retried buffered flush skip logs already written
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("timestamp", ASCENDING)]),
+        IndexModel([("timestamp", DESCENDING), ("id", DESCENDING)]),
+        IndexModel([("household_id", ASCENDING), ("timestamp", DESCENDING), ("id", DESCENDING)]),
+        IndexModel([("user_email", ASCENDING), ("timestamp", DESCENDING), ("id", DESCENDING)])
+    ],
+    CREDIT_ROLLUPS_COLLECTION: [
+        IndexModel(
+            [("day", ASCENDING), ("event_type", ASCENDING), ("user_email", ASCENDING), ("household_id", ASCENDING)],
+            unique=True
+        ),
+        IndexModel([("user_email", ASCENDING)])
+    ],
+    HOUSEHOLD_BALANCES_COLLECTION: [
+        IndexModel([("household_id", ASCENDING), ("period", ASCENDING)], unique=True),
+        IndexModel([("period", ASCENDING)])
+    ],
+    "nutrition_facts": [
+        IndexModel([("normalized_name", ASCENDING)]),
+        IndexModel([("household_id", ASCENDING), ("created_date", DESCENDING), ("id", DESCENDING)]),
+        IndexModel([("created_date", DESCENDING), ("id", DESCENDING)]),
+        IndexModel([("user_email", ASCENDING)])
+    ],
+    "failed_nutrition_lookups": [
+        IndexModel([("normalized_name", ASCENDING)], unique=True)
+    ],
+    "llm_enhancement_cache": [
+        IndexModel([("key", ASCENDING)], unique=True),
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0)
+    ],
+    "test_runs": [
+        IndexModel([("id", ASCENDING)], unique=True)
+    ],
+    "ocr_quality_logs": [
+        IndexModel([("test_run_id", ASCENDING)])
+    ],
+    "recipes": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("created_date", DESCENDING), ("id", DESCENDING)])
+    ],
+    # $merge targets need a unique index on their `on` fields
+    "aggregated_grocery_data": [
+        IndexModel([("store_name", ASCENDING), ("item_canonical_name", ASCENDING)], unique=True),
+        IndexModel([("id", ASCENDING)])
+    ],
+    PRICE_BUCKETS_COLLECTION: [
+        IndexModel(
+            [("store_name", ASCENDING), ("item_canonical_name", ASCENDING), ("month", ASCENDING)],
+            unique=True
+        ),
+        IndexModel([("item_canonical_name", ASCENDING), ("month", ASCENDING), ("store_name", ASCENDING)]),
+        # Finds a re-processed receipt's observations in every bucket
+        IndexModel([("receipt_ids", ASCENDING)])
+    ],
+    PERSONAL_INFLATION_COLLECTION: [
+        IndexModel([("household_id", ASCENDING), ("month", ASCENDING)], unique=True)
+    ],
+    JOBS_COLLECTION: JOB_INDEXES + [
+        # Per-household dedupe of queued jobs
+        IndexModel([("job_type", ASCENDING), ("status", ASCENDING), ("payload.household_id", ASCENDING)])
+    ]
+}
+
+# Unique indexes registered over collections written without one, whose
+# existing duplicates are removed before the index is first built: the
+# unique field and the sort ranking the document to keep first
+DEDUPE_BEFORE_UNIQUE: Dict[str, Dict[str, Any]] = {
+    "failed_nutrition_lookups": {"field": "normalized_name", "keep": {"last_attempt_date": -1, "_id": -1}}
+}
+
+# Refuse to start the API when a registered index cannot be created. Off by
+# default: deployments with hand-made indexes whose options conflict with
+# the registry keep starting, logging the failure and reporting it on
+# /api/health and /api/admin/indexes
+REQUIRE_INDEXES = os.environ.get('REQUIRE_INDEXES', 'false').lower() == 'true'
+
+# Failures from the last ensure_indexes run, by collection
+_index_errors: Dict[str, str] = {}
+
+class IndexCreationError(RuntimeError):
+    """Registered indexes are missing and REQUIRE_INDEXES is set"""
+
+async def dedupe_unique_field(db, name: str, field: str, keep: Dict[str, int]) -> int:
+    """
+    Deletes all but the first document (in `keep` order) for each value of
+    `field`, unless a unique index on it already exists. Returns the number
+    of documents deleted.
+    """
+    collection = db[name]
+    for index in (await collection.index_information()).values():
+        if index.get("unique") and [key for key, _ in index["key"]] == [field]:
+            return 0
+    deleted = 0
+    async for group in collection.aggregate([
+        {"$sort": keep},
+        {"$group": {"_id": f"${field}", "ids": {"$push": "$_id"}, "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}}
+    ], allowDiskUse=True):
+        result = await collection.delete_many({"_id": {"$in": group["ids"][1:]}})
+        deleted += result.deleted_count
+    if deleted:
+        logger.warning(f"Deleted {deleted} duplicate {field} documents from {name} before indexing")
+    return deleted
+
+async def ensure_indexes(db, collections: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+    """
+    Creates registered indexes, optionally for some collections only.
+    A failing collection (conflicting options, duplicate keys under a new
+    unique index) is logged and reported without stopping the rest; see
+    check_index_errors for failing startup on them.
+    """
+    created: Dict[str, List[str]] = {}
+    errors: Dict[str, str] = {}
+    for name in collections or INDEX_REGISTRY.keys():
+        try:
+            if name in DEDUPE_BEFORE_UNIQUE:
+                await dedupe_unique_field(db, name, **DEDUPE_BEFORE_UNIQUE[name])
+            created[name] = await db[name].create_indexes(INDEX_REGISTRY[name])
+            _index_errors.pop(name, None)
+        except OperationFailure as e:
+            errors[name] = str(e)
+            _index_errors[name] = str(e)
+            logger.error(f"Could not create indexes on {name}: {str(e)}")
+    return {"collections": len(created), "indexes": sum(len(names) for names in created.values()), "errors": errors}
+
+def get_index_errors() -> Dict[str, str]:
+    return dict(_index_errors)
+
+def check_index_errors(required: bool = REQUIRE_INDEXES) -> None:
+    """
+    Logs collections whose registered indexes could not be created and,
+    when required, raises so startup fails instead of serving without them
+    """
+    if not _index_errors:
+        return
+    message = f"Registered indexes missing on {', '.join(sorted(_index_errors))}; see /api/admin/indexes"
+    if required:
+        raise IndexCreationError(message)
+    logger.error(message)
+
+# ==================== USAGE REPORT ====================
+
+# Representative shapes of the app's hot queries, explained to catch any
+# that would fall back to a collection scan
+QUERY_SHAPES: List[Dict[str, Any]] = [
+    {"collection": "receipts", "filter": {"id": "x"}},
+    {"collection": "receipts", "filter": {"household_id": "x"}, "sort": {"created_date": -1, "id": -1}},
+    {"collection": "receipts", "filter": {}, "sort": {"created_date": -1, "id": -1}},
+    {"collection": "receipts", "filter": {"user_email": "x"}},
+    {"collection": "receipts", "filter": {"validation_status": "validated", "updated_date": {"$gt": "x"}}},
+    {"collection": "budgets", "filter": {"id": "x"}},
+    {"collection": "budgets", "filter": {"household_id": "x", "is_active": True}},
+    {"collection": "households", "filter": {"id": "x"}},
+    {"collection": "credit_logs", "filter": {"user_email": "x"}, "sort": {"timestamp": -1, "id": -1}},
+    {"collection": "credit_logs", "filter": {"household_id": "x"}, "sort": {"timestamp": -1, "id": -1}},
+    {"collection": "credit_logs", "filter": {"timestamp": {"$gte": "x"}}},
+    {"collection": HOUSEHOLD_BALANCES_COLLECTION, "filter": {"household_id": "x", "period": "x"}},
+    {"collection": "nutrition_facts", "filter": {"normalized_name": "x"}},
+    {"collection": "nutrition_facts", "filter": {"household_id": "x"}, "sort": {"created_date": -1, "id": -1}},
+    {"collection": "recipes", "filter": {}, "sort": {"created_date": -1, "id": -1}},
+    {"collection": "ocr_quality_logs", "filter": {"test_run_id": "x"}},
+    {"collection": "test_runs", "filter": {"id": "x"}},
+    {"collection": PRICE_BUCKETS_COLLECTION, "filter": {"item_canonical_name": "x", "month": {"$gte": "x"}}},
+    {"collection": PRICE_BUCKETS_COLLECTION, "filter": {"receipt_ids": {"$in": ["x"]}}},
+    {"collection": PERSONAL_INFLATION_COLLECTION, "filter": {"household_id": "x"}, "sort": {"month": 1}},
+    {"collection": JOBS_COLLECTION, "filter": {"status": "queued", "available_at": {"$lte": "x"}}, "sort": {"priority": 1}}
+]
+
+def _plan_stages(plan: Dict[str, Any]) -> List[str]:
+    """All stage names in an explain plan tree"""
+    stages = [plan.get("stage")]
+    for child in [plan.get("inputStage")] + plan.get("inputStages", []):
+        if child:
+            stages.extend(_plan_stages(child))
+    return [stage for stage in stages if stage]
+
+async def explain_query_shape(db, shape: Dict[str, Any]) -> Dict[str, Any]:
+    find = {"find": shape["collection"], "filter": shape["filter"]}
+    if shape.get("sort"):
+        find["sort"] = shape["sort"]
+    explain = await db.command({"explain": find, "verbosity": "queryPlanner"})
+    winning = explain.get("queryPlanner", {}).get("winningPlan", {})
+    # Slot-based engine plans nest the classic tree under queryPlan
+    stages = _plan_stages(winning.get("queryPlan", winning))
+    return {
+        "collection": shape["collection"],
+        "filter": list(shape["filter"].keys()),
+        "sort": list((shape.get("sort") or {}).keys()),
+        "stages": stages,
+        "collscan": "COLLSCAN" in stages
+    }
+
+async def get_index_report(db, profile_limit: int = 20) -> Dict[str, Any]:
+    """
+    $indexStats usage per registered collection, registered query shapes
+    whose winning plan is a COLLSCAN, and recent profiled COLLSCANs when
+    the database profiler is enabled
+    """
+    usage: Dict[str, List[Dict[str, Any]]] = {}
+    for name in INDEX_REGISTRY:
+        try:
+            usage[name] = [
+                {
+                    "name": stats["name"],
+                    "ops": stats["accesses"]["ops"],
+                    "since": stats["accesses"]["since"],
+                    "unused": stats["accesses"]["ops"] == 0 and stats["name"] != "_id_"
+                }
+                async for stats in db[name].aggregate([{"$indexStats": {}}])
+            ]
+        except PyMongoError as e:
+            usage[name] = [{"error": str(e)}]
+
+    shapes = []
+    for shape in QUERY_SHAPES:
+        try:
+            shapes.append(await explain_query_shape(db, shape))
+        except PyMongoError as e:
+            shapes.append({"collection": shape["collection"], "filter": list(shape["filter"].keys()), "error": str(e)})
+
+    profiled: List[Dict[str, Any]] = []
+    try:
+        profiled = await db["system.profile"].find(
+            {"planSummary": "COLLSCAN"},
+            {"_id": 0, "ns": 1, "op": 1, "command": 1, "millis": 1, "docsExamined": 1, "ts": 1}
+        ).sort("ts", -1).limit(profile_limit).to_list(profile_limit)
+    except PyMongoError:
+        pass
+
+    return {
+        "creation_errors": get_index_errors(),
+        "index_usage": usage,
+        "unused_indexes": [
+            f"{name}.{index['name']}" for name, indexes in usage.items()
+            for index in indexes if index.get("unused")
+        ],
+        "query_shapes": shapes,
+        "collscan_queries": [shape for shape in shapes if shape.get("collscan")],
+        "profiled_collscans": profiled
+    }
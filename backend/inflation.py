@@ -0,0 +1,138 @@
+import os
+import logging
+from typing import Dict, Any, List, Optional
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from pymongo import UpdateOne
+
+logger = logging.getLogger(__name__)
+
+# ==================== CONFIGURATION ====================
+
+PERSONAL_INFLATION_COLLECTION = 'household_inflation'
+# Receipts still processing or failed have no trustworthy items
+EXCLUDED_RECEIPT_STATUSES = ['processing_background', 'error']
+# A month's change needs at least this many items bought in both months
+MIN_ITEMS_COMPARED = int(os.environ.get('INFLATION_MIN_ITEMS_COMPARED', '3'))
+# How many months an item's last price is carried forward for comparison
+PRICE_CARRY_MONTHS = int(os.environ.get('INFLATION_PRICE_CARRY_MONTHS', '3'))
+
+# ==================== ENGINE ====================
+
+def receipts_to_frame(receipts: List[Dict[str, Any]]) -> pd.DataFrame:
+    """
+    One row per purchased item: month, canonical item, unit price and spend
+    """
+    rows = []
+    for receipt in receipts:
+        month = str(receipt.get("purchase_date") or "")[:7]
+        if len(month) != 7:
+            continue
+        for item in receipt.get("items") or []:
+            name = item.get("canonical_name")
+            quantity = item.get("quantity") or 1
+            total = item.get("total_price")
+            unit = item.get("unit_price") or (total / quantity if total else None)
+            if not name or not unit or unit <= 0:
+                continue
+            rows.append((month, name.lower().strip(), float(unit), float(total or unit * quantity)))
+    return pd.DataFrame(rows, columns=["month", "item", "unit_price", "spend"])
+
+def compute_personal_inflation(frame: pd.DataFrame, ons_rates: Dict[str, float]) -> List[Dict[str, Any]]:
+    """
+    Chained Jevons index over the household's own basket. Each month's change
+    is the geometric mean of price relatives for items bought that month and
+    within the previous PRICE_CARRY_MONTHS. The annual rate compares the
+    index with twelve months earlier, matching the ONS CPI 12-month rate.
+    """
+    if frame.empty:
+        return []
+
+    months = pd.period_range(frame["month"].min(), frame["month"].max(), freq="M").astype(str)
+    # month x item matrix of median log unit prices
+    log_prices = (
+        frame.assign(log_price=np.log(frame["unit_price"]))
+        .pivot_table(index="month", columns="item", values="log_price", aggfunc="median")
+        .reindex(months)
+    )
+    previous = log_prices.ffill(limit=PRICE_CARRY_MONTHS).shift(1)
+    relatives = log_prices - previous
+
+    items_compared = relatives.notna().sum(axis=1)
+    monthly_log_change = relatives.mean(axis=1).where(items_compared >= MIN_ITEMS_COMPARED, 0.0)
+    log_index = monthly_log_change.fillna(0.0).cumsum()
+
+    annual = np.expm1(log_index - log_index.shift(12)) * 100
+    # The first twelve months have no year-ago index to compare against
+    annual.iloc[:12] = np.nan
+    monthly = np.expm1(monthly_log_change) * 100
+    spend = frame.groupby("month")["spend"].sum().reindex(months, fill_value=0.0)
+    items_bought = frame.groupby("month")["item"].nunique().reindex(months, fill_value=0)
+
+    results = []
+    for month in months:
+        personal = None if pd.isna(annual[month]) else round(float(annual[month]), 2)
+        ons = ons_rates.get(month)
+        results.append({
+            "month": month,
+            "personal_inflation_rate": personal,
+            "monthly_change_pct": round(float(monthly[month]), 2) if items_compared[month] >= MIN_ITEMS_COMPARED else None,
+            "index": round(float(np.exp(log_index[month]) * 100), 2),
+            "items_compared": int(items_compared[month]),
+            "items_bought": int(items_bought[month]),
+            "spend": round(float(spend[month]), 2),
+            "ons_inflation_rate": ons,
+            "difference_vs_ons": round(personal - ons, 2) if personal is not None and ons is not None else None
+        })
+    return results
+
+# ==================== MATERIALIZATION ====================
+
+async def materialize_household_inflation(db, household_id: str, ons_rates: Dict[str, float]) -> Dict[str, Any]:
+    """
+    Recomputes a household's monthly inflation rows from its receipts and
+    upserts one document per household per month
+    """
+    receipts = await db.receipts.find(
+        {
+            "household_id": household_id,
+            "validation_status": {"$nin": EXCLUDED_RECEIPT_STATUSES},
+            "is_test_data": {"$ne": True}
+        },
+        {
+            "_id": 0,
+            "purchase_date": 1,
+            "items.canonical_name": 1,
+            "items.unit_price": 1,
+            "items.total_price": 1,
+            "items.quantity": 1
+        }
+    ).to_list(None)
+
+    rows = compute_personal_inflation(receipts_to_frame(receipts), ons_rates)
+    now = datetime.utcnow()
+    if rows:
+        await db[PERSONAL_INFLATION_COLLECTION].bulk_write([
+            UpdateOne(
+                {"household_id": household_id, "month": row["month"]},
+                {"$set": {**row, "household_id": household_id, "computed_date": now}},
+                upsert=True
+            )
+            for row in rows
+        ], ordered=False)
+    logger.info(f"Materialized {len(rows)} inflation months for household {household_id}")
+    return {"status": "success", "household_id": household_id, "months": len(rows), "receipts": len(receipts)}
+
+async def get_household_inflation(
+    db,
+    household_id: str,
+    month: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    """Materialized rows for a household, optionally a single month"""
+    query: Dict[str, Any] = {"household_id": household_id}
+    if month:
+        query["month"] = month
+    return await db[PERSONAL_INFLATION_COLLECTION].find(
+        query, {"_id": 0}
+    ).sort("month", 1).to_list(None)
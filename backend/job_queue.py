@@ -0,0 +1,450 @@
+import os
+import asyncio
+import logging
+import random
+import socket
+from typing import Dict, Any, List, Optional, Callable, Awaitable
+from datetime import datetime, timedelta
+from pymongo import ReturnDocument, IndexModel, ASCENDING, DESCENDING
+
+from metrics import record_stage
+
+logger = logging.getLogger(__name__)
+
+# ==================== CONFIGURATION ====================
+
+JOBS_COLLECTION = 'receipt_jobs'
+
+JOB_TYPE_PROCESS_RECEIPT = 'process_receipt'
+JOB_TYPE_NUTRITION_PREFETCH = 'nutrition_prefetch'
+JOB_TYPE_PERSONAL_INFLATION = 'personal_inflation'
+JOB_TYPE_RECONCILE_CREDIT_BALANCES = 'reconcile_credit_balances'
+
+JOB_STATUS_QUEUED = 'queued'
+JOB_STATUS_RUNNING = 'running'
+JOB_STATUS_SUCCEEDED = 'succeeded'
+JOB_STATUS_FAILED = 'failed'
+
+# 'inprocess' runs the worker pool inside the API process, 'external' leaves
+# the queue to separate `python worker.py` processes
+WORKER_MODE = os.environ.get('RECEIPT_WORKER_MODE', 'inprocess')
+WORKER_CONCURRENCY = int(os.environ.get('RECEIPT_WORKER_CONCURRENCY', '4'))
+JOB_LEASE_SECONDS = int(os.environ.get('RECEIPT_JOB_LEASE_SECONDS', '300'))
+JOB_MAX_ATTEMPTS = int(os.environ.get('RECEIPT_JOB_MAX_ATTEMPTS', '5'))
+JOB_RETRY_BASE_SECONDS = float(os.environ.get('RECEIPT_JOB_RETRY_BASE_SECONDS', '5'))
+JOB_RETRY_MAX_SECONDS = float(os.environ.get('RECEIPT_JOB_RETRY_MAX_SECONDS', '600'))
+JOB_POLL_INTERVAL_SECONDS = float(os.environ.get('RECEIPT_JOB_POLL_INTERVAL_SECONDS', '1.0'))
+
+JobHandler = Callable[[Dict[str, Any], Any], Awaitable[Any]]
+# Called with (payload, db, error) once a job has failed its last attempt
+JobFailureHandler = Callable[[Dict[str, Any], Any, str], Awaitable[None]]
+
+# ==================== QUEUE OPERATIONS ====================
+
+def _build_job(job_type: str, payload: Dict[str, Any], priority: int, max_attempts: Optional[int]) -> Dict[str, Any]:
+    """Build a new job document ready for insertion"""
+    now = datetime.utcnow()
+    return {
+        "id": generate_uuid(),
+        "job_type": job_type,
+        "payload": payload,
+        "status": JOB_STATUS_QUEUED,
+        "priority": priority,
+        "attempts": 0,
+        "max_attempts": max_attempts or JOB_MAX_ATTEMPTS,
+        "available_at": now,
+        "lease_expires_at": None,
+        "worker_id": None,
+        "last_error": None,
+        "created_date": now,
+        "updated_date": now,
+        "started_date": None,
+        "finished_date": None
+    }
+
+async def enqueue_job(
+    db,
+    job_type: str,
+    payload: Dict[str, Any],
+    priority: int = 0,
+    max_attempts: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Adds a job to the queue. Lower priority values are claimed first.
+    """
+    job = _build_job(job_type, payload, priority, max_attempts)
+    await db[JOBS_COLLECTION].insert_one(job)
+    job.pop("_id", None)
+    logger.info(f"Enqueued {job_type} job {job['id']}")
+    return job
+
+async def enqueue_jobs(
+    db,
+    job_type: str,
+    payloads: List[Dict[str, Any]],
+    priority: int = 0,
+    batch_size: int = 500
+) -> int:
+    """
+    Adds many jobs with unordered batched inserts. Returns the number queued.
+    """
+    queued = 0
+    for start in range(0, len(payloads), batch_size):
+        jobs = [_build_job(job_type, payload, priority, None) for payload in payloads[start:start + batch_size]]
+        result = await db[JOBS_COLLECTION].insert_many(jobs, ordered=False)
+        queued += len(result.inserted_ids)
+    logger.info(f"Enqueued {queued} {job_type} jobs")
+    return queued
+
+async def claim_next_job(db, worker_id: str, job_types: Optional[List[str]] = None) -> Optional[Dict[str, Any]]:
+    """
+    Atomically claims the next runnable job, taking a lease on it.
+    Jobs whose lease expired (crashed worker) are claimable again.
+    """
+    now = datetime.utcnow()
+    query: Dict[str, Any] = {
+        "$or": [
+            {"status": JOB_STATUS_QUEUED, "available_at": {"$lte": now}},
+            {"status": JOB_STATUS_RUNNING, "lease_expires_at": {"$lt": now}}
+        ]
+    }
+    if job_types:
+        query["job_type"] = {"$in": job_types}
+
+    return await db[JOBS_COLLECTION].find_one_and_update(
+        query,
+        {
+            "$set": {
+                "status": JOB_STATUS_RUNNING,
+                "worker_id": worker_id,
+                "lease_expires_at": now + timedelta(seconds=JOB_LEASE_SECONDS),
+                "started_date": now,
+                "updated_date": now
+            },
+            "$inc": {"attempts": 1}
+        },
+        sort=[("priority", 1), ("available_at", 1)],
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER
+    )
+
+async def renew_job_lease(db, job_id: str, worker_id: str) -> bool:
+    """Extends the lease on a job this worker still owns"""
+    now = datetime.utcnow()
+    result = await db[JOBS_COLLECTION].update_one(
+        {"id": job_id, "worker_id": worker_id, "status": JOB_STATUS_RUNNING},
+        {"$set": {
+            "lease_expires_at": now + timedelta(seconds=JOB_LEASE_SECONDS),
+            "updated_date": now
+        }}
+    )
+    return result.matched_count == 1
+
+async def complete_job(db, job: Dict[str, Any], worker_id: str) -> None:
+    """Marks a claimed job as succeeded"""
+    now = datetime.utcnow()
+    await db[JOBS_COLLECTION].update_one(
+        {"id": job["id"], "worker_id": worker_id},
+        {"$set": {
+            "status": JOB_STATUS_SUCCEEDED,
+            "lease_expires_at": None,
+            "finished_date": now,
+            "updated_date": now,
+            "last_error": None
+        }}
+    )
+
+def retry_delay_seconds(attempts: int) -> float:
+    """Exponential backoff with full jitter"""
+    ceiling = min(JOB_RETRY_MAX_SECONDS, JOB_RETRY_BASE_SECONDS * (2 ** max(attempts - 1, 0)))
+    return random.uniform(ceiling / 2, ceiling)
+
+async def fail_job(db, job: Dict[str, Any], worker_id: str, error: str) -> bool:
+    """
+    Records a failed attempt. Requeues with backoff while attempts remain,
+    otherwise marks the job as permanently failed. Returns True if requeued.
+    """
+    now = datetime.utcnow()
+    update: Dict[str, Any] = {
+        "lease_expires_at": None,
+        "last_error": error,
+        "updated_date": now
+    }
+    will_retry = job.get("attempts", 0) < job.get("max_attempts", JOB_MAX_ATTEMPTS)
+    if will_retry:
+        update["status"] = JOB_STATUS_QUEUED
+        update["available_at"] = now + timedelta(seconds=retry_delay_seconds(job.get("attempts", 1)))
+        update["worker_id"] = None
+    else:
+        update["status"] = JOB_STATUS_FAILED
+        update["finished_date"] = now
+
+    await db[JOBS_COLLECTION].update_one(
+        {"id": job["id"], "worker_id": worker_id},
+        {"$set": update}
+    )
+    return will_retry
+
+async def release_job(db, job: Dict[str, Any], worker_id: str) -> None:
+    """Returns an interrupted job to the queue without counting the attempt"""
+    now = datetime.utcnow()
+    await db[JOBS_COLLECTION].update_one(
+        {"id": job["id"], "worker_id": worker_id, "status": JOB_STATUS_RUNNING},
+        {
+            "$set": {
+                "status": JOB_STATUS_QUEUED,
+                "available_at": now,
+                "lease_expires_at": None,
+                "worker_id": None,
+                "updated_date": now
+            },
+            "$inc": {"attempts": -1}
+        }
+    )
+
+# Indexes backing the claim and stats queries; also part of the index
+# registry, applied here so standalone workers don't depend on the API
+JOB_INDEXES = [
+    IndexModel([("id", ASCENDING)], unique=True),
+    IndexModel([("status", ASCENDING), ("priority", ASCENDING), ("available_at", ASCENDING)]),
+    IndexModel([("status", ASCENDING), ("lease_expires_at", ASCENDING)]),
+    IndexModel([("status", ASCENDING), ("finished_date", DESCENDING)])
+]
+
+async def ensure_job_indexes(db) -> None:
+    await db[JOBS_COLLECTION].create_indexes(JOB_INDEXES)
+
+# ==================== STATS ====================
+
+async def get_queue_stats(db, window_minutes: int = 60) -> Dict[str, Any]:
+    """
+    Queue depth by status plus wait/run latency for jobs finished in the window
+    """
+    now = datetime.utcnow()
+    collection = db[JOBS_COLLECTION]
+
+    by_status = {
+        JOB_STATUS_QUEUED: 0,
+        JOB_STATUS_RUNNING: 0,
+        JOB_STATUS_SUCCEEDED: 0,
+        JOB_STATUS_FAILED: 0
+    }
+    async for row in collection.aggregate([{"$group": {"_id": "$status", "count": {"$sum": 1}}}]):
+        by_status[row["_id"]] = row["count"]
+
+    ready = await collection.count_documents({
+        "status": JOB_STATUS_QUEUED,
+        "available_at": {"$lte": now}
+    })
+
+    oldest = await collection.find_one(
+        {"status": JOB_STATUS_QUEUED},
+        {"_id": 0, "created_date": 1},
+        sort=[("created_date", 1)]
+    )
+    oldest_age = (now - oldest["created_date"]).total_seconds() if oldest else 0.0
+
+    latency = {
+        "finished": 0,
+        "avg_wait_seconds": None,
+        "max_wait_seconds": None,
+        "avg_run_seconds": None,
+        "max_run_seconds": None
+    }
+    pipeline = [
+        {"$match": {
+            "status": {"$in": [JOB_STATUS_SUCCEEDED, JOB_STATUS_FAILED]},
+            "finished_date": {"$gte": now - timedelta(minutes=window_minutes)}
+        }},
+        {"$project": {
+            "wait_ms": {"$subtract": ["$started_date", "$created_date"]},
+            "run_ms": {"$subtract": ["$finished_date", "$started_date"]}
+        }},
+        {"$group": {
+            "_id": None,
+            "finished": {"$sum": 1},
+            "avg_wait_ms": {"$avg": "$wait_ms"},
+            "max_wait_ms": {"$max": "$wait_ms"},
+            "avg_run_ms": {"$avg": "$run_ms"},
+            "max_run_ms": {"$max": "$run_ms"}
+        }}
+    ]
+    async for row in collection.aggregate(pipeline):
+        latency = {
+            "finished": row["finished"],
+            "avg_wait_seconds": round(row["avg_wait_ms"] / 1000, 3),
+            "max_wait_seconds": round(row["max_wait_ms"] / 1000, 3),
+            "avg_run_seconds": round(row["avg_run_ms"] / 1000, 3),
+            "max_run_seconds": round(row["max_run_ms"] / 1000, 3)
+        }
+
+    return {
+        "by_status": by_status,
+        "queue_depth": ready,
+        "delayed": by_status[JOB_STATUS_QUEUED] - ready,
+        "oldest_queued_seconds": round(oldest_age, 3),
+        "window_minutes": window_minutes,
+        "latency": latency
+    }
+
+# ==================== WORKER POOL ====================
+
+class ReceiptWorkerPool:
+    """
+    Fixed-size pool of asyncio workers draining the job queue.
+    Concurrency is capped by the number of workers; throughput scales by
+    running more pools (API processes or `worker.py` instances).
+    """
+
+    def __init__(
+        self,
+        db,
+        handlers: Dict[str, JobHandler],
+        concurrency: int = WORKER_CONCURRENCY,
+        poll_interval: float = JOB_POLL_INTERVAL_SECONDS,
+        name: Optional[str] = None,
+        failure_handlers: Optional[Dict[str, JobFailureHandler]] = None
+    ):
+        self.db = db
+        self.handlers = handlers
+        self.failure_handlers = failure_handlers or {}
+        self.concurrency = max(1, concurrency)
+        self.poll_interval = poll_interval
+        self.name = name or f"{socket.gethostname()}-{os.getpid()}"
+        self._tasks: List[asyncio.Task] = []
+        self._stopping = asyncio.Event()
+        self.stats = {
+            "claimed": 0,
+            "succeeded": 0,
+            "retried": 0,
+            "failed": 0,
+            "lease_lost": 0,
+            "worker_errors": 0,
+            "in_flight": 0
+        }
+
+    async def start(self) -> None:
+        await ensure_job_indexes(self.db)
+        self._stopping.clear()
+        for index in range(self.concurrency):
+            worker_id = f"{self.name}-{index}"
+            self._tasks.append(asyncio.create_task(self._run_worker(worker_id)))
+        logger.info(f"Started receipt worker pool {self.name} with {self.concurrency} workers")
+
+    async def stop(self, timeout: float = 30.0) -> None:
+        self._stopping.set()
+        if not self._tasks:
+            return
+        done, pending = await asyncio.wait(self._tasks, timeout=timeout)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        self._tasks = []
+        logger.info(f"Stopped receipt worker pool {self.name}")
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"name": self.name, "concurrency": self.concurrency, **self.stats}
+
+    async def _run_worker(self, worker_id: str) -> None:
+        job_types = list(self.handlers.keys())
+        while not self._stopping.is_set():
+            try:
+                job = await claim_next_job(self.db, worker_id, job_types)
+            except Exception as e:
+                logger.error(f"Worker {worker_id} failed to claim job: {str(e)}")
+                job = None
+
+            if job is not None:
+                try:
+                    await self._run_job(job, worker_id)
+                    continue
+                except Exception as e:
+                    # Recording the outcome failed (e.g. a transient Mongo
+                    # error); the lease expires and the job is claimed again
+                    self.stats["worker_errors"] += 1
+                    logger.error(f"Worker {worker_id} failed to record job {job.get('id')}: {str(e)}")
+
+            try:
+                await asyncio.wait_for(self._stopping.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _keep_lease(self, job_id: str, worker_id: str, handler_task: asyncio.Task, lease_lost: asyncio.Event) -> None:
+        """
+        Renews the lease while the handler runs. If another worker has taken
+        the job over (our lease expired), the handler is cancelled so the
+        job doesn't run twice at once.
+        """
+        interval = max(JOB_LEASE_SECONDS / 3, 1)
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                renewed = await renew_job_lease(self.db, job_id, worker_id)
+            except Exception as e:
+                logger.warning(f"Could not renew lease on job {job_id}: {str(e)}")
+                continue
+            if not renewed:
+                logger.warning(f"Lost lease on job {job_id}, abandoning it")
+                lease_lost.set()
+                handler_task.cancel()
+                return
+
+    async def _job_failed(self, job: Dict[str, Any], error: str) -> None:
+        """Runs the job type's failure handler after its last attempt"""
+        failure_handler = self.failure_handlers.get(job["job_type"])
+        if failure_handler is None:
+            return
+        try:
+            await failure_handler(job["payload"], self.db, error)
+        except Exception as e:
+            logger.error(f"Failure handler for job {job['id']} ({job['job_type']}) raised: {str(e)}")
+
+    async def _run_job(self, job: Dict[str, Any], worker_id: str) -> None:
+        self.stats["claimed"] += 1
+        if job.get("available_at"):
+            # Time spent runnable but waiting for a free worker
+            record_stage("queue_wait", max((datetime.utcnow() - job["available_at"]).total_seconds(), 0.0))
+
+        if job["attempts"] > job.get("max_attempts", JOB_MAX_ATTEMPTS):
+            # Lease expired on the final attempt (worker crashed mid-job)
+            error = job.get("last_error") or "lease expired"
+            await fail_job(self.db, job, worker_id, error)
+            self.stats["failed"] += 1
+            await self._job_failed(job, error)
+            return
+
+        handler = self.handlers[job["job_type"]]
+        handler_task = asyncio.create_task(handler(job["payload"], self.db))
+        lease_lost = asyncio.Event()
+        lease_task = asyncio.create_task(self._keep_lease(job["id"], worker_id, handler_task, lease_lost))
+        self.stats["in_flight"] += 1
+        try:
+            await handler_task
+        except asyncio.CancelledError:
+            if lease_lost.is_set() and not asyncio.current_task().cancelling():
+                # The job belongs to another worker now; record nothing
+                self.stats["lease_lost"] += 1
+                return
+            try:
+                await release_job(self.db, job, worker_id)
+            except Exception as e:
+                logger.error(f"Could not release job {job['id']}: {str(e)}")
+            raise
+        except Exception as e:
+            logger.error(f"Job {job['id']} ({job['job_type']}) attempt {job['attempts']} failed: {str(e)}")
+            if await fail_job(self.db, job, worker_id, str(e)):
+                self.stats["retried"] += 1
+            else:
+                self.stats["failed"] += 1
+                await self._job_failed(job, str(e))
+        else:
+            await complete_job(self.db, job, worker_id)
+            self.stats["succeeded"] += 1
+        finally:
+            self.stats["in_flight"] -= 1
+            lease_task.cancel()
+
+# Helper function for UUID
+def generate_uuid():
+    import uuid
+    return str(uuid.uuid4())
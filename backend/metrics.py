@@ -0,0 +1,149 @@
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional, Tuple
+
+# ==================== STAGE HISTOGRAMS ====================
+
+# Bucket upper bounds in seconds, sized for OCR/LLM calls up to a minute
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+# Recent observations kept per series for p50/p95/p99
+RESERVOIR_SIZE = 2048
+QUANTILES = (0.5, 0.95, 0.99)
+ALL_STORES = "all"
+
+class StageHistogram:
+    """
+    Cumulative Prometheus-style histogram plus a bounded window of recent
+    observations for percentile reporting
+    """
+
+    def __init__(self):
+        self.bucket_counts = [0] * len(STAGE_BUCKETS)
+        self.count = 0
+        self.total = 0.0
+        self.recent: deque = deque(maxlen=RESERVOIR_SIZE)
+
+    def observe(self, seconds: float) -> None:
+        for index, bound in enumerate(STAGE_BUCKETS):
+            if seconds <= bound:
+                self.bucket_counts[index] += 1
+        self.count += 1
+        self.total += seconds
+        self.recent.append(seconds)
+
+    def quantiles(self) -> Dict[float, Optional[float]]:
+        ordered = sorted(self.recent)
+        if not ordered:
+            return {q: None for q in QUANTILES}
+        return {q: ordered[min(len(ordered) - 1, int(q * len(ordered)))] for q in QUANTILES}
+
+_histograms: Dict[Tuple[str, str], StageHistogram] = {}
+_lock = threading.Lock()
+
+def record_stage(stage: str, seconds: float, store: Optional[str] = None) -> None:
+    """
+    Records one stage duration, both per store and across all stores
+    """
+    with _lock:
+        for key in {(stage, ALL_STORES), (stage, store or ALL_STORES)}:
+            histogram = _histograms.get(key)
+            if histogram is None:
+                histogram = _histograms[key] = StageHistogram()
+            histogram.observe(seconds)
+
+@contextmanager
+def stage_timer(timings: Dict[str, float], stage: str, store: Optional[str] = None):
+    """
+    Times a block, storing milliseconds in `timings[stage + '_ms']` and
+    recording the duration in the stage histogram
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        timings[f"{stage}_ms"] = round(elapsed * 1000, 1)
+        record_stage(stage, elapsed, store)
+
+def get_stage_summary() -> List[Dict[str, Any]]:
+    """
+    Count, mean and p50/p95/p99 (recent window) per stage and store
+    """
+    with _lock:
+        rows = []
+        for (stage, store), histogram in sorted(_histograms.items()):
+            quantiles = histogram.quantiles()
+            rows.append({
+                "stage": stage,
+                "store": store,
+                "count": histogram.count,
+                "mean_seconds": round(histogram.total / histogram.count, 4) if histogram.count else None,
+                "p50_seconds": quantiles[0.5],
+                "p95_seconds": quantiles[0.95],
+                "p99_seconds": quantiles[0.99]
+            })
+        return rows
+
+# ==================== PROMETHEUS EXPOSITION ====================
+
+def _escape(value: Any) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _labels(**labels) -> str:
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+def flatten_stats(prefix: str, stats: Dict[str, Any]) -> Dict[str, float]:
+    """
+    Turns a nested stats dict into flat gauge names, keeping numeric values only
+    """
+    flat: Dict[str, float] = {}
+    for key, value in stats.items():
+        name = f"{prefix}_{key}".replace("-", "_").replace(".", "_")
+        if isinstance(value, bool):
+            flat[name] = float(value)
+        elif isinstance(value, (int, float)):
+            flat[name] = float(value)
+        elif isinstance(value, dict):
+            flat.update(flatten_stats(name, value))
+    return flat
+
+def render_prometheus(gauges: Optional[Dict[str, float]] = None) -> str:
+    """
+    Prometheus text exposition of stage histograms, recent-window quantiles
+    and any extra gauges
+    """
+    lines = [
+        "# HELP grocerytrack_receipt_stage_seconds Receipt pipeline stage duration",
+        "# TYPE grocerytrack_receipt_stage_seconds histogram"
+    ]
+    with _lock:
+        series = sorted(_histograms.items())
+        for (stage, store), histogram in series:
+            for bound, count in zip(STAGE_BUCKETS, histogram.bucket_counts):
+                lines.append(
+                    f"grocerytrack_receipt_stage_seconds_bucket{_labels(stage=stage, store=store, le=bound)} {count}"
+                )
+            lines.append(
+                f"grocerytrack_receipt_stage_seconds_bucket{_labels(stage=stage, store=store, le='+Inf')} {histogram.count}"
+            )
+            lines.append(f"grocerytrack_receipt_stage_seconds_sum{_labels(stage=stage, store=store)} {histogram.total}")
+            lines.append(f"grocerytrack_receipt_stage_seconds_count{_labels(stage=stage, store=store)} {histogram.count}")
+
+        lines.append("# HELP grocerytrack_receipt_stage_recent_seconds Stage duration quantiles over recent receipts")
+        lines.append("# TYPE grocerytrack_receipt_stage_recent_seconds summary")
+        for (stage, store), histogram in series:
+            for quantile, value in histogram.quantiles().items():
+                if value is not None:
+                    lines.append(
+                        f"grocerytrack_receipt_stage_recent_seconds{_labels(stage=stage, store=store, quantile=quantile)} {value}"
+                    )
+            lines.append(f"grocerytrack_receipt_stage_recent_seconds_sum{_labels(stage=stage, store=store)} {histogram.total}")
+            lines.append(f"grocerytrack_receipt_stage_recent_seconds_count{_labels(stage=stage, store=store)} {histogram.count}")
+
+    for name, value in sorted((gauges or {}).items()):
+        lines.append(f"# TYPE {name} gauge")
+        lines.append(f"{name} {value}")
+
+    return "\n".join(lines) + "\n"
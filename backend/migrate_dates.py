@@ -0,0 +1,129 @@
+"""
+One-shot migration of ISO-string timestamps to native BSON datetimes.
+
+Documents written before the API stored native dates hold created_date,
+updated_date and similar fields as isoformat() strings. The API now
+compares and sorts these fields as dates only, so run this once before
+starting the new version (the old one may keep running meanwhile):
+
+    python migrate_dates.py --batch-size 1000
+
+Each collection is walked in _id order in batches. Progress is
+checkpointed in the migration_state collection, so an interrupted run
+resumes where it stopped; re-running a finished migration only scans
+for stragglers written by old processes. Values that do not parse are
+left as they are and counted.
+"""
+import os
+import asyncio
+import argparse
+import logging
+from pathlib import Path
+from typing import Dict, List, Optional
+from datetime import datetime, timezone
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+MIGRATION_STATE_COLLECTION = 'migration_state'
+MIGRATION_ID = 'native_dates'
+
+# Top-level fields written as ISO strings, by collection. purchase_date is
+# not here: it is a calendar date entered by the user, and its YYYY-MM-DD
+# strings already sort and range-match in date order.
+DATE_FIELDS: Dict[str, List[str]] = {
+    "receipts": ["created_date", "updated_date"],
+    "budgets": ["created_date", "updated_date"],
+    "households": ["created_date", "updated_date"],
+    "household_invitations": ["created_date", "expires_at"],
+    "credit_logs": ["timestamp"],
+    "nutrition_facts": ["created_date", "updated_date"],
+    "failed_nutrition_lookups": ["created_date", "updated_date", "last_attempt_date"],
+    "recipes": ["created_date", "updated_date"],
+    "test_runs": ["created_date"],
+    "ocr_quality_logs": ["timestamp"]
+}
+
+def parse_stored_date(value: str) -> Optional[datetime]:
+    """Naive UTC datetime from a stored ISO string, or None if it does not parse"""
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+async def migrate_collection(db, name: str, fields: List[str], batch_size: int) -> Dict[str, int]:
+    state = db[MIGRATION_STATE_COLLECTION]
+    state_id = f"{MIGRATION_ID}:{name}"
+    checkpoint = await state.find_one({"_id": state_id}) or {}
+    last_id = checkpoint.get("last_id")
+    totals = {"scanned": 0, "converted": 0, "unparseable": 0}
+
+    string_dates = {"$or": [{field: {"$type": "string"}} for field in fields]}
+    while True:
+        query = {"$and": [string_dates, {"_id": {"$gt": last_id}}]} if last_id is not None else string_dates
+        batch = await db[name].find(
+            query, {"_id": 1, **{field: 1 for field in fields}}
+        ).sort("_id", 1).limit(batch_size).to_list(batch_size)
+        if not batch:
+            break
+
+        updates = []
+        for doc in batch:
+            converted = {}
+            for field in fields:
+                if isinstance(doc.get(field), str):
+                    parsed = parse_stored_date(doc[field])
+                    if parsed is None:
+                        totals["unparseable"] += 1
+                    else:
+                        converted[field] = parsed
+            if converted:
+                updates.append(UpdateOne({"_id": doc["_id"]}, {"$set": converted}))
+        if updates:
+            await db[name].bulk_write(updates, ordered=False)
+
+        last_id = batch[-1]["_id"]
+        totals["scanned"] += len(batch)
+        totals["converted"] += len(updates)
+        await state.update_one(
+            {"_id": state_id},
+            {"$set": {"last_id": last_id, "updated_date": datetime.utcnow()}, "$inc": {"converted": len(updates)}},
+            upsert=True
+        )
+        logger.info(f"{name}: {totals['scanned']} scanned, {totals['converted']} converted")
+
+    await state.update_one(
+        {"_id": state_id},
+        {"$set": {"completed_date": datetime.utcnow()}, "$unset": {"last_id": ""}},
+        upsert=True
+    )
+    return totals
+
+async def main(batch_size: int, collections: Optional[List[str]]) -> None:
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = client[os.environ.get('DB_NAME', 'grocerytrack_db')]
+    try:
+        for name in collections or DATE_FIELDS.keys():
+            totals = await migrate_collection(db, name, DATE_FIELDS[name], batch_size)
+            logger.info(f"Migrated {name}: {totals}")
+    finally:
+        client.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert ISO-string timestamps to native dates")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--collection", action="append", choices=sorted(DATE_FIELDS), dest="collections")
+    args = parser.parse_args()
+    asyncio.run(main(args.batch_size, args.collections))
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, ConfigDict
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Generic, TypeVar
 from datetime import datetime
 import uuid
 
@@ -7,6 +7,8 @@ import uuid
 def generate_uuid():
     return str(uuid.uuid4())
 
+T = TypeVar("T")
+
 # ==================== RECEIPT ====================
 class ReceiptItem(BaseModel):
     name: str
@@ -37,11 +39,28 @@ class Receipt(BaseModel):
     is_test_data: bool = False
     validation_status: str = 'processing_background'
     receipt_insights: Optional[Dict[str, Any]] = None
+    nutrition_rollup: Optional[Dict[str, Any]] = None
     household_id: str
     user_email: str
     created_date: datetime = Field(default_factory=datetime.utcnow)
     updated_date: datetime = Field(default_factory=datetime.utcnow)
 
+class ReceiptSummary(BaseModel):
+    """List view of a receipt: no items, insights or OCR data"""
+    model_config = ConfigDict(extra="ignore")
+    
+    id: str
+    supermarket: str
+    store_location: Optional[str] = None
+    purchase_date: str
+    total_amount: float
+    currency: str = 'GBP'
+    item_count: int = 0
+    validation_status: str = 'processing_background'
+    household_id: str
+    user_email: str
+    created_date: datetime
+
 class ReceiptCreate(BaseModel):
     supermarket: str
     store_location: Optional[str] = None
@@ -252,6 +271,7 @@ class NutritionFact(BaseModel):
     
     id: str = Field(default_factory=generate_uuid)
     canonical_name: str
+    normalized_name: Optional[str] = None
     source: str = 'CalorieNinjas'
     calories: Optional[float] = None
     protein_g: Optional[float] = None
@@ -277,6 +297,7 @@ class FailedNutritionLookup(BaseModel):
     
     id: str = Field(default_factory=generate_uuid)
     canonical_name: str
+    normalized_name: Optional[str] = None
     last_attempt_date: datetime = Field(default_factory=datetime.utcnow)
     attempt_count: int = 1
     source: str = 'CalorieNinjas'
@@ -363,6 +384,8 @@ class AggregatedGroceryData(BaseModel):
     item_canonical_name: str
     category: str
     latest_price: float
+    latest_observation_date: Optional[str] = None
+    # Deprecated: observations are stored in price_observation_buckets
     price_observations: List[Dict[str, Any]] = []
     last_updated_date: datetime = Field(default_factory=datetime.utcnow)
     created_date: datetime = Field(default_factory=datetime.utcnow)
@@ -392,3 +415,8 @@ class FailedScanLogCreate(BaseModel):
     image_urls: List[str] = []
     error_message: str
     error_stage: str
+
+# ==================== PAGINATION ====================
+class Page(BaseModel, Generic[T]):
+    items: List[T]
+    next_cursor: Optional[str] = None
@@ -0,0 +1,98 @@
+import os
+import json
+import base64
+import binascii
+from typing import Dict, Any, List, Optional, Tuple
+from datetime import datetime
+
+# ==================== CONFIGURATION ====================
+
+DEFAULT_PAGE_SIZE = int(os.environ.get('DEFAULT_PAGE_SIZE', '100'))
+MAX_PAGE_SIZE = int(os.environ.get('MAX_PAGE_SIZE', '500'))
+
+# ==================== CURSORS ====================
+
+def encode_cursor(value: Any, doc_id: str) -> str:
+    """
+    Opaque cursor for the position after a document. The sort value is
+    type-tagged so a datetime comes back as a datetime, not a string.
+    """
+    if isinstance(value, datetime):
+        position = {"t": "date", "v": value.isoformat()}
+    elif value is None:
+        position = {"t": "null", "v": None}
+    else:
+        position = {"t": "str", "v": str(value)}
+    position["id"] = doc_id
+    raw = json.dumps(position, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[Any, str]:
+    """(sort value, id) from a cursor; ValueError if it was not issued by encode_cursor"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        position = json.loads(raw)
+        kind, value, doc_id = position["t"], position["v"], position["id"]
+        if kind == "date":
+            value = datetime.fromisoformat(value)
+    except (binascii.Error, UnicodeDecodeError, json.JSONDecodeError, KeyError, TypeError, ValueError):
+        raise ValueError("Invalid cursor")
+    if not isinstance(doc_id, str) or kind not in ("date", "str", "null"):
+        raise ValueError("Invalid cursor")
+    return (None if kind == "null" else value), doc_id
+
+def after_cursor(sort_field: str, value: Any, doc_id: str) -> Dict[str, Any]:
+    """
+    Filter for documents after (value, id) in (sort_field desc, id desc)
+    order. Until migrate_dates.py has run the field can hold
+    dates, ISO strings or nothing, and comparisons never cross BSON types,
+    so the lower-sorting types are matched explicitly (date > string > null).
+    """
+    if value is None:
+        return {sort_field: None, "id": {"$lt": doc_id}}
+    clauses: List[Dict[str, Any]] = [
+        {sort_field: {"$lt": value}},
+        {sort_field: value, "id": {"$lt": doc_id}}
+    ]
+    if isinstance(value, datetime):
+        clauses.append({sort_field: {"$type": "string"}})
+    clauses.append({sort_field: None})
+    return {"$or": clauses}
+
+# ==================== PAGES ====================
+
+def clamp_page_size(limit: Optional[int]) -> int:
+    if not limit or limit < 1:
+        return DEFAULT_PAGE_SIZE
+    return min(limit, MAX_PAGE_SIZE)
+
+async def fetch_page(
+    collection,
+    query: Dict[str, Any],
+    sort_field: str = "created_date",
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+    projection: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """
+    One page of a collection, newest first, keyed on (sort_field, id).
+    Each page is an index range scan from the cursor, so deep pages cost
+    the same as the first. A projection must keep sort_field and id,
+    which the next cursor is built from. Raises ValueError for a
+    malformed cursor.
+    """
+    page_size = clamp_page_size(limit)
+    if cursor:
+        query = {"$and": [query, after_cursor(sort_field, *decode_cursor(cursor))]}
+
+    # One extra document tells whether another page exists
+    docs = await collection.find(query, projection or {"_id": 0}).sort(
+        [(sort_field, -1), ("id", -1)]
+    ).limit(page_size + 1).to_list(page_size + 1)
+
+    next_cursor = None
+    if len(docs) > page_size:
+        docs = docs[:page_size]
+        last = docs[-1]
+        next_cursor = encode_cursor(last.get(sort_field), last.get("id"))
+    return {"items": docs, "next_cursor": next_cursor}
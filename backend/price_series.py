@@ -0,0 +1,216 @@
+import logging
+from typing import Dict, Any, List, Optional
+from datetime import datetime
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# ==================== CONFIGURATION ====================
+
+# One document per store/item/month holding parallel arrays of observations,
+# so a document's size is bounded by a month of receipts and an update only
+# rewrites that month
+PRICE_BUCKETS_COLLECTION = 'price_observation_buckets'
+BUCKET_ARRAY_FIELDS = ("receipt_ids", "timestamps", "prices", "quantities")
+DOWNSAMPLE_INTERVALS = ("daily", "weekly")
+
+# ==================== BUCKET WRITES ====================
+
+def _keep_observations(excluded_receipt_ids: Any) -> Dict[str, Any]:
+    """Indexes of the bucket's observations whose receipt is not excluded"""
+    return {"$filter": {
+        "input": {"$range": [0, {"$size": {"$ifNull": ["$receipt_ids", []]}}]},
+        "as": "i",
+        "cond": {"$not": [{"$in": [{"$arrayElemAt": ["$receipt_ids", "$$i"]}, excluded_receipt_ids]}]}
+    }}
+
+def _kept_observations(field: str) -> Dict[str, Any]:
+    """Entries of `field` at the indexes computed into _keep"""
+    return {"$map": {
+        "input": "$_keep",
+        "as": "i",
+        "in": {"$arrayElemAt": [f"${field}", "$$i"]}
+    }}
+
+def _replace_receipt_observations(field: str) -> Dict[str, Any]:
+    """
+    Existing entries of `field` whose receipt is not in the incoming batch,
+    followed by the incoming entries
+    """
+    return {"$concatArrays": [_kept_observations(field), f"$$new.{field}"]}
+
+# Bucket statistics recomputed from the observation arrays
+BUCKET_STATS = {
+    "count": {"$size": "$prices"},
+    "min_price": {"$min": "$prices"},
+    "max_price": {"$max": "$prices"},
+    "sum_price": {"$sum": "$prices"}
+}
+
+async def pull_receipt_observations(db, receipt_ids: List[str]) -> int:
+    """
+    Removes the receipts' observations from every bucket and deletes buckets
+    left empty. Run before merging the receipts again: a receipt whose date,
+    store or item names changed would otherwise keep its old observations
+    in buckets the merge no longer touches. Returns the buckets updated.
+    """
+    if not receipt_ids:
+        return 0
+    buckets = db[PRICE_BUCKETS_COLLECTION]
+    bucket_ids = [bucket["_id"] async for bucket in buckets.find({"receipt_ids": {"$in": receipt_ids}}, {"_id": 1})]
+    if not bucket_ids:
+        return 0
+    result = await buckets.update_many(
+        {"_id": {"$in": bucket_ids}},
+        [
+            {"$set": {"_keep": _keep_observations({"$literal": receipt_ids})}},
+            {"$set": {field: _kept_observations(field) for field in BUCKET_ARRAY_FIELDS}},
+            {"$set": {**BUCKET_STATS, "updated_date": "$$NOW"}},
+            {"$unset": "_keep"}
+        ]
+    )
+    await buckets.delete_many({"_id": {"$in": bucket_ids}, "count": 0})
+    return result.modified_count
+
+def build_bucket_merge_stages(receipt_match: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Aggregation stages turning matched receipts into monthly price buckets.
+    Observations are keyed by receipt_id, so re-processing a receipt
+    replaces its entries instead of duplicating them; entries in buckets
+    the receipt no longer maps to are removed by pull_receipt_observations.
+    """
+    return [
+        {"$match": receipt_match},
+        {"$unwind": "$items"},
+        {"$match": {"items.canonical_name": {"$nin": [None, ""]}}},
+        {"$project": {
+            "_id": 0,
+            "store_name": "$supermarket",
+            "item_canonical_name": "$items.canonical_name",
+            "category": {"$ifNull": ["$items.category", "Other"]},
+            "receipt_id": "$id",
+            "price": {"$ifNull": [
+                "$items.unit_price",
+                {"$cond": [
+                    {"$gt": [{"$ifNull": ["$items.quantity", 0]}, 0]},
+                    {"$divide": ["$items.total_price", "$items.quantity"]},
+                    "$items.total_price"
+                ]}
+            ]},
+            "quantity": {"$ifNull": ["$items.quantity", 1]},
+            "timestamp": {"$dateFromString": {
+                "dateString": "$purchase_date", "onError": None, "onNull": None
+            }}
+        }},
+        {"$match": {"price": {"$gt": 0}, "timestamp": {"$ne": None}}},
+        {"$sort": {"timestamp": 1}},
+        {"$group": {
+            "_id": {
+                "store_name": "$store_name",
+                "item_canonical_name": "$item_canonical_name",
+                "month": {"$dateToString": {"format": "%Y-%m", "date": "$timestamp"}}
+            },
+            "category": {"$last": "$category"},
+            "receipt_ids": {"$push": "$receipt_id"},
+            "timestamps": {"$push": "$timestamp"},
+            "prices": {"$push": "$price"},
+            "quantities": {"$push": "$quantity"}
+        }},
+        {"$project": {
+            "_id": 0,
+            "store_name": "$_id.store_name",
+            "item_canonical_name": "$_id.item_canonical_name",
+            "month": "$_id.month",
+            "category": 1,
+            "receipt_ids": 1,
+            "timestamps": 1,
+            "prices": 1,
+            "quantities": 1,
+            **BUCKET_STATS,
+            "created_date": "$$NOW",
+            "updated_date": "$$NOW"
+        }},
+        {"$merge": {
+            "into": PRICE_BUCKETS_COLLECTION,
+            "on": ["store_name", "item_canonical_name", "month"],
+            "whenMatched": [
+                {"$set": {"_keep": _keep_observations("$$new.receipt_ids")}},
+                {"$set": {field: _replace_receipt_observations(field) for field in BUCKET_ARRAY_FIELDS}},
+                {"$set": {**BUCKET_STATS, "category": "$$new.category", "updated_date": "$$NOW"}},
+                {"$unset": "_keep"}
+            ],
+            "whenNotMatched": "insert"
+        }}
+    ]
+
+# ==================== QUERIES ====================
+
+async def get_price_history(
+    db,
+    item_canonical_name: str,
+    start: datetime,
+    end: datetime,
+    store_name: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Observations for an item between start and end (inclusive), per store,
+    as time-sorted parallel arrays
+    """
+    query: Dict[str, Any] = {
+        "item_canonical_name": item_canonical_name,
+        "month": {"$gte": start.strftime("%Y-%m"), "$lte": end.strftime("%Y-%m")}
+    }
+    if store_name:
+        query["store_name"] = store_name
+
+    series: Dict[str, Dict[str, List[Any]]] = {}
+    async for bucket in db[PRICE_BUCKETS_COLLECTION].find(
+        query, {"_id": 0, "store_name": 1, "timestamps": 1, "prices": 1, "quantities": 1}
+    ):
+        store = series.setdefault(bucket["store_name"], {"timestamps": [], "prices": [], "quantities": []})
+        for timestamp, price, quantity in zip(bucket["timestamps"], bucket["prices"], bucket["quantities"]):
+            if start <= timestamp <= end:
+                store["timestamps"].append(timestamp)
+                store["prices"].append(price)
+                store["quantities"].append(quantity)
+
+    for store in series.values():
+        order = sorted(range(len(store["timestamps"])), key=store["timestamps"].__getitem__)
+        for field in ("timestamps", "prices", "quantities"):
+            store[field] = [store[field][i] for i in order]
+
+    return {"item_canonical_name": item_canonical_name, "stores": series}
+
+def downsample_prices(timestamps: List[datetime], prices: List[float], interval: str = "daily") -> List[Dict[str, Any]]:
+    """
+    Min/mean/max price per day, or per ISO week (starting Monday)
+    """
+    if interval not in DOWNSAMPLE_INTERVALS:
+        raise ValueError(f"interval must be one of {', '.join(DOWNSAMPLE_INTERVALS)}")
+    if not timestamps:
+        return []
+
+    days = np.array(timestamps, dtype="datetime64[D]")
+    values = np.asarray(prices, dtype=float)
+    if interval == "weekly":
+        # 1970-01-01 was a Thursday: shift each day back to its Monday
+        day_numbers = days.astype(np.int64)
+        days = (day_numbers - (day_numbers + 3) % 7).astype("datetime64[D]")
+
+    order = np.argsort(days, kind="stable")
+    days, values = days[order], values[order]
+    periods, starts, counts = np.unique(days, return_index=True, return_counts=True)
+    means = np.add.reduceat(values, starts) / counts
+    mins = np.minimum.reduceat(values, starts)
+    maxs = np.maximum.reduceat(values, starts)
+
+    return [
+        {
+            "period_start": str(period),
+            "count": int(count),
+            "min_price": round(float(low), 2),
+            "mean_price": round(float(mean), 2),
+            "max_price": round(float(high), 2)
+        }
+        for period, count, low, mean, high in zip(periods, counts, mins, means, maxs)
+    ]
@@ -0,0 +1,138 @@
+import os
+import logging
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+from cache import TTLCache, MISSING
+
+logger = logging.getLogger(__name__)
+
+# ==================== CONFIGURATION ====================
+
+READ_CACHE_ENABLED = os.environ.get('READ_CACHE_ENABLED', 'true').lower() == 'true'
+READ_CACHE_MAX_ENTRIES = int(os.environ.get('READ_CACHE_MAX_ENTRIES', '10000'))
+# Writers in other processes (external workers) cannot invalidate an
+# in-process backend, so entries also expire
+READ_CACHE_TTL_SECONDS = float(os.environ.get('READ_CACHE_TTL_SECONDS', '60'))
+
+# The API only creates households, so nothing invalidates them; changes
+# made outside the API show up once the entry expires
+ENTITY_HOUSEHOLD = 'household'
+ENTITY_RECEIPT = 'receipt'
+# First page of a household's budgets (None: all households)
+ENTITY_BUDGETS = 'budgets'
+
+# Receipts still being processed are updated by the job queue's workers,
+# which may run in another process whose invalidations never reach this
+# cache, so they are read from the database until processing settles
+UNCACHED_RECEIPT_STATUSES = {'processing_background'}
+
+# ==================== CACHE ====================
+
+class ReadCache:
+    """
+    Read-through cache of hot documents keyed by (entity, id), where the
+    id is a household id for household-scoped entries. Write paths
+    invalidate the keys they touch; a load that an invalidation overtakes
+    is returned but not cached, so it cannot restore the old value. The
+    backend is anything with
+    TTLCache's get/set/delete/clear/stats interface, so a store shared
+    between processes can replace the in-process default.
+    """
+
+    def __init__(self, backend=None, enabled: bool = READ_CACHE_ENABLED):
+        self.backend = backend if backend is not None else TTLCache(
+            max_size=READ_CACHE_MAX_ENTRIES, ttl_seconds=READ_CACHE_TTL_SECONDS
+        )
+        self.enabled = enabled
+        self.counters: Dict[str, Dict[str, int]] = {}
+        # Per-key generation and number of loads in flight, kept only while
+        # a load is running; invalidation bumps the generation
+        self._generations: Dict[Tuple[str, Hashable], int] = {}
+        self._loads: Dict[Tuple[str, Hashable], int] = {}
+
+    def _count(self, entity: str, outcome: str) -> None:
+        counters = self.counters.setdefault(entity, {"hits": 0, "misses": 0, "invalidations": 0, "stale_loads": 0})
+        counters[outcome] += 1
+
+    async def get_or_load(
+        self,
+        entity: str,
+        key: Hashable,
+        loader: Callable[[], Awaitable[Any]],
+        cacheable: Optional[Callable[[Any], bool]] = None
+    ) -> Any:
+        """Cached value, or the loader's result (cached unless None or not cacheable)"""
+        if not self.enabled:
+            return await loader()
+        value = self.backend.get((entity, key), MISSING)
+        if value is not MISSING:
+            self._count(entity, "hits")
+            return value
+        self._count(entity, "misses")
+        cache_key = (entity, key)
+        generation = self._generations.setdefault(cache_key, 0)
+        self._loads[cache_key] = self._loads.get(cache_key, 0) + 1
+        try:
+            value = await loader()
+            if value is None or (cacheable is not None and not cacheable(value)):
+                return value
+            if self._generations[cache_key] == generation:
+                self.backend.set(cache_key, value)
+            else:
+                self._count(entity, "stale_loads")
+            return value
+        finally:
+            self._loads[cache_key] -= 1
+            if not self._loads[cache_key]:
+                del self._loads[cache_key]
+                del self._generations[cache_key]
+
+    def invalidate(self, entity: str, *keys: Hashable) -> None:
+        for key in keys:
+            self.backend.delete((entity, key))
+            if (entity, key) in self._generations:
+                self._generations[(entity, key)] += 1
+            self._count(entity, "invalidations")
+
+    def clear(self) -> None:
+        """For bulk writes whose affected keys are not known"""
+        self.backend.clear()
+        for cache_key in self._generations:
+            self._generations[cache_key] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        entities = {}
+        for entity, counters in self.counters.items():
+            lookups = counters["hits"] + counters["misses"]
+            entities[entity] = {**counters, "hit_ratio": round(counters["hits"] / lookups, 4) if lookups else None}
+        return {"enabled": self.enabled, "backend": self.backend.stats(), "entities": entities}
+
+_read_cache = ReadCache()
+
+def configure_read_cache(backend=None, enabled: bool = READ_CACHE_ENABLED) -> ReadCache:
+    """Swaps the backend, e.g. for one shared between API and worker processes"""
+    global _read_cache
+    _read_cache = ReadCache(backend, enabled)
+    logger.info(f"Read cache: {type(_read_cache.backend).__name__}, enabled={enabled}")
+    return _read_cache
+
+def get_read_cache() -> ReadCache:
+    return _read_cache
+
+# ==================== INVALIDATION ====================
+
+def receipt_cacheable(receipt: Dict[str, Any]) -> bool:
+    return receipt.get("validation_status") not in UNCACHED_RECEIPT_STATUSES
+
+def invalidate_receipt(*receipt_ids: str) -> None:
+    _read_cache.invalidate(ENTITY_RECEIPT, *receipt_ids)
+
+def invalidate_budgets(*household_ids: Optional[str]) -> None:
+    """A household's budget page and the unfiltered page"""
+    _read_cache.invalidate(ENTITY_BUDGETS, *{*household_ids, None})
+
+def clear_read_cache() -> None:
+    _read_cache.clear()
+
+def get_read_cache_stats() -> Dict[str, Any]:
+    return _read_cache.stats()
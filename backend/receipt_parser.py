@@ -0,0 +1,289 @@
+import os
+import re
+import logging
+from typing import Dict, Any, List, Optional
+
+from models import ReceiptItem
+
+logger = logging.getLogger(__name__)
+
+# ==================== CONFIGURATION ====================
+
+# Minimum share of priced lines that must parse cleanly to skip the LLM
+FAST_PATH_MIN_CONFIDENCE = float(os.environ.get('FAST_PATH_MIN_CONFIDENCE', '0.9'))
+# Allowed gap between the summed items and the receipt total
+FAST_PATH_TOTAL_TOLERANCE = float(os.environ.get('FAST_PATH_TOTAL_TOLERANCE', '0.01'))
+
+PRICE_LINE = re.compile(
+    r'^(?P<name>.*?[A-Za-z].*?)\s+(?P<sign>-)?£?(?P<price>\d{1,4}\.\d{2})(?P<neg>-)?\s*(?:[A-Z*]{1,2})?$'
+)
+QUANTITY_PREFIX = re.compile(r'^(?P<qty>\d{1,3})\s*[xX@]\s+(?P<rest>.+)$')
+QUANTITY_AT_PRICE = re.compile(r'^(?P<qty>\d{1,3})\s*[xX@]\s*£?(?P<unit>\d{1,4}\.\d{2})$')
+PACK_SIZE = re.compile(
+    r'\b(?P<size>\d+(?:\.\d+)?\s?(?:kg|g|ml|cl|l|ltr|pk|pack)|\d+\s?x\s?\d+(?:\.\d+)?\s?(?:g|ml|l)?)\b',
+    re.IGNORECASE
+)
+
+# Lines that carry a price but are not purchased items
+COMMON_SKIP_PATTERNS = [
+    r'\bsub\s?-?total\b', r'\btotal\b', r'\bbalance\b', r'\bchange\b', r'\bcash\b',
+    r'\bcard\b', r'\bvisa\b', r'\bmastercard\b', r'\bamex\b', r'\bcontactless\b',
+    r'\bvat\b', r'\bamount due\b', r'\bpaid\b', r'\btendered\b', r'\bitems?\s+sold\b'
+]
+COMMON_TOTAL_PATTERNS = [r'^\s*total\b', r'\bbalance due\b', r'\bamount due\b', r'\bto pay\b']
+COMMON_DISCOUNT_PATTERNS = [r'\bsaving\b', r'\bdiscount\b', r'\boffer\b', r'\bprice cut\b', r'\bmulti-?buy\b']
+
+# Per-store layout profiles: aliases match the store name given at upload,
+# extra patterns extend the common ones for that chain's receipt layout
+STORE_PROFILES: Dict[str, Dict[str, Any]] = {
+    "tesco": {
+        "aliases": ["tesco"],
+        "discount_patterns": [r'\bclubcard\b', r'\bcc price\b'],
+        "skip_patterns": [r'\bclubcard points\b', r'\bpoints\b']
+    },
+    "sainsburys": {
+        "aliases": ["sainsbury"],
+        "discount_patterns": [r'\bnectar\b'],
+        "skip_patterns": [r'\bnectar points\b', r'\bpoints\b']
+    },
+    "asda": {
+        "aliases": ["asda"],
+        "discount_patterns": [r'\brollback\b', r'\basda price\b'],
+        "skip_patterns": []
+    },
+    "morrisons": {
+        "aliases": ["morrison"],
+        "discount_patterns": [r'\bmore card\b', r'\bmore price\b'],
+        "skip_patterns": [r'\bmore points\b']
+    },
+    "aldi": {
+        "aliases": ["aldi"],
+        "discount_patterns": [r'\bsuper six\b'],
+        "skip_patterns": []
+    },
+    "lidl": {
+        "aliases": ["lidl"],
+        "discount_patterns": [r'\blidl plus\b', r'\bcoupon\b'],
+        "skip_patterns": []
+    },
+    "waitrose": {
+        "aliases": ["waitrose"],
+        "discount_patterns": [r'\bmywaitrose\b'],
+        "skip_patterns": []
+    },
+    "coop": {
+        "aliases": ["co-op", "coop", "co op"],
+        "discount_patterns": [r'\bmember price\b', r'\bmember deal\b'],
+        "skip_patterns": [r'\bmembership\b']
+    }
+}
+DEFAULT_PROFILE = "generic"
+
+CATEGORY_KEYWORDS = {
+    "Dairy": ["milk", "cheese", "cheddar", "yogurt", "yoghurt", "butter", "cream", "egg"],
+    "Grains & Bakery": ["bread", "loaf", "roll", "bagel", "croissant", "pasta", "rice", "flour", "cereal", "oats", "wrap"],
+    "Meat & Fish": ["chicken", "beef", "pork", "lamb", "mince", "bacon", "ham", "sausage", "salmon", "tuna", "cod", "fish", "prawn", "turkey"],
+    "Fruits": ["apple", "banana", "orange", "grape", "berry", "berries", "lemon", "lime", "pear", "melon", "mango", "pineapple", "kiwi"],
+    "Vegetables": ["potato", "carrot", "onion", "tomato", "lettuce", "salad", "pepper", "broccoli", "cucumber", "mushroom", "spinach", "garlic", "cabbage", "courgette"],
+    "Snacks": ["crisps", "chocolate", "biscuit", "cookie", "sweets", "cake", "nuts", "popcorn"],
+    "Beverages": ["juice", "water", "cola", "coke", "tea", "coffee", "squash", "lemonade", "beer", "wine"],
+    "Household": ["toilet", "tissue", "detergent", "washing", "bleach", "soap", "shampoo", "foil", "bin bag", "kitchen roll"]
+}
+
+parser_stats = {
+    "attempts": 0,
+    "fast_path_hits": 0,
+    "fallback_no_items": 0,
+    "fallback_low_confidence": 0,
+    "fallback_unreconciled": 0
+}
+
+# ==================== PARSER ====================
+
+_compiled_profiles: Dict[str, Dict[str, List[re.Pattern]]] = {}
+
+def _compile(patterns: List[str]) -> List[re.Pattern]:
+    return [re.compile(pattern, re.IGNORECASE) for pattern in patterns]
+
+def get_store_profile(store_name: str) -> str:
+    """Matches a store name to a layout profile key"""
+    lowered = (store_name or "").lower()
+    for key, profile in STORE_PROFILES.items():
+        if any(alias in lowered for alias in profile["aliases"]):
+            return key
+    return DEFAULT_PROFILE
+
+def _profile_patterns(profile_key: str) -> Dict[str, List[re.Pattern]]:
+    if profile_key not in _compiled_profiles:
+        profile = STORE_PROFILES.get(profile_key, {})
+        _compiled_profiles[profile_key] = {
+            "skip": _compile(COMMON_SKIP_PATTERNS + profile.get("skip_patterns", [])),
+            "total": _compile(COMMON_TOTAL_PATTERNS),
+            "discount": _compile(COMMON_DISCOUNT_PATTERNS + profile.get("discount_patterns", []))
+        }
+    return _compiled_profiles[profile_key]
+
+def _matches(patterns: List[re.Pattern], text: str) -> bool:
+    return any(pattern.search(text) for pattern in patterns)
+
+def categorize_item(name: str) -> str:
+    lowered = name.lower()
+    for category, keywords in CATEGORY_KEYWORDS.items():
+        if any(keyword in lowered for keyword in keywords):
+            return category
+    return "Other"
+
+def _canonical_name(name: str) -> str:
+    stripped = PACK_SIZE.sub("", name)
+    return " ".join(stripped.split()).title() or name.title()
+
+def _build_item(name: str, quantity: float, line_total: float) -> Dict[str, Any]:
+    pack_match = PACK_SIZE.search(name)
+    unit_price = round(line_total / quantity, 2) if quantity else line_total
+    return ReceiptItem(
+        name=name,
+        canonical_name=_canonical_name(name),
+        category=categorize_item(name),
+        quantity=quantity,
+        unit_price=unit_price,
+        total_price=round(line_total, 2),
+        pack_size=pack_match.group("size") if pack_match else None,
+        price_per_unit=unit_price
+    ).model_dump()
+
+def parse_receipt_lines(ocr_lines: List[str], store_name: str, total_amount: float) -> Dict[str, Any]:
+    """
+    Rule-based extraction of items from OCR lines.
+    Returns the items plus a confidence score (share of priced lines that
+    parsed as items, discounts or known non-item lines) and whether the
+    item sum reconciles with the receipt total.
+    """
+    profile_key = get_store_profile(store_name)
+    patterns = _profile_patterns(profile_key)
+
+    items: List[Dict[str, Any]] = []
+    printed_total: Optional[float] = None
+    pending_quantity: Optional[float] = None
+    priced_lines = 0
+    understood_lines = 0
+    savings = 0.0
+
+    for raw_line in ocr_lines:
+        line = " ".join(raw_line.split())
+        if not line:
+            continue
+
+        quantity_line = QUANTITY_AT_PRICE.match(line)
+        if quantity_line:
+            # "2 x £1.00" on its own line describes the next item
+            pending_quantity = float(quantity_line.group("qty"))
+            continue
+
+        match = PRICE_LINE.match(line)
+        if not match:
+            continue
+        priced_lines += 1
+
+        name = match.group("name").strip(" :.-")
+        price = float(match.group("price"))
+        is_negative = bool(match.group("sign") or match.group("neg"))
+
+        if _matches(patterns["total"], name) and not _matches(patterns["discount"], name):
+            printed_total = price
+            understood_lines += 1
+            continue
+        if is_negative or _matches(patterns["discount"], name):
+            if items:
+                items[-1]["discount_applied"] = True
+                items[-1]["offer_description"] = name
+                items[-1]["total_price"] = round(items[-1]["total_price"] - price, 2)
+                savings += price
+                understood_lines += 1
+            continue
+        if _matches(patterns["skip"], name):
+            understood_lines += 1
+            continue
+
+        quantity = pending_quantity or 1.0
+        pending_quantity = None
+        prefix = QUANTITY_PREFIX.match(name)
+        if prefix:
+            quantity = float(prefix.group("qty"))
+            name = prefix.group("rest").strip()
+
+        items.append(_build_item(name, quantity, price))
+        understood_lines += 1
+
+    items_total = round(sum(item["total_price"] for item in items), 2)
+    confidence = understood_lines / priced_lines if priced_lines else 0.0
+    reconciled = bool(items) and abs(items_total - float(total_amount or 0)) <= FAST_PATH_TOTAL_TOLERANCE
+    if printed_total is not None and reconciled:
+        reconciled = abs(printed_total - float(total_amount or 0)) <= FAST_PATH_TOTAL_TOLERANCE
+
+    return {
+        "profile": profile_key,
+        "items": items,
+        "items_total": items_total,
+        "printed_total": printed_total,
+        "savings": round(savings, 2),
+        "confidence": round(confidence, 4),
+        "reconciled": reconciled
+    }
+
+def build_local_insights(parsed: Dict[str, Any], store_name: str, currency: str) -> Dict[str, Any]:
+    """Receipt insights for receipts handled by the fast path"""
+    by_category: Dict[str, float] = {}
+    for item in parsed["items"]:
+        by_category[item["category"]] = by_category.get(item["category"], 0) + item["total_price"]
+    top_category = max(by_category.items(), key=lambda pair: pair[1]) if by_category else None
+
+    highlights = [f"Total: {currency} {parsed['items_total']:.2f} across {len(parsed['items'])} items"]
+    if top_category:
+        highlights.append(f"Largest category: {top_category[0]} ({currency} {top_category[1]:.2f})")
+    if parsed["savings"]:
+        highlights.append(f"Savings from offers: {currency} {parsed['savings']:.2f}")
+
+    return {
+        "summary": f"Shopping trip at {store_name} with {len(parsed['items'])} items",
+        "highlights": highlights,
+        "category_totals": {category: round(total, 2) for category, total in by_category.items()}
+    }
+
+def try_fast_path(ocr_lines: List[str], store_name: str, total_amount: float, currency: str) -> Optional[Dict[str, Any]]:
+    """
+    Returns enhanced receipt data without calling the LLM when the local
+    parse is confident and reconciles with the total, otherwise None.
+    """
+    parser_stats["attempts"] += 1
+    parsed = parse_receipt_lines(ocr_lines, store_name, total_amount)
+
+    if not parsed["items"]:
+        parser_stats["fallback_no_items"] += 1
+        return None
+    if parsed["confidence"] < FAST_PATH_MIN_CONFIDENCE:
+        parser_stats["fallback_low_confidence"] += 1
+        return None
+    if not parsed["reconciled"]:
+        parser_stats["fallback_unreconciled"] += 1
+        logger.info(
+            f"Fast path items total {parsed['items_total']} does not match {total_amount}, falling back to LLM"
+        )
+        return None
+
+    parser_stats["fast_path_hits"] += 1
+    return {
+        "items": parsed["items"],
+        "receipt_insights": build_local_insights(parsed, store_name, currency),
+        "parser": {
+            "profile": parsed["profile"],
+            "confidence": parsed["confidence"]
+        }
+    }
+
+def get_parser_stats() -> Dict[str, Any]:
+    attempts = parser_stats["attempts"]
+    return {
+        **parser_stats,
+        "fast_path_hit_rate": round(parser_stats["fast_path_hits"] / attempts, 4) if attempts else None,
+        "min_confidence": FAST_PATH_MIN_CONFIDENCE
+    }
@@ -0,0 +1,30 @@
+import os
+from typing import Any, Optional
+from fastapi.responses import Response, ORJSONResponse
+from pydantic import TypeAdapter
+
+from models import Page, Receipt, ReceiptSummary, Budget
+
+# ==================== CONFIGURATION ====================
+
+# Opt-in: list endpoints skip FastAPI's response_model re-validation and
+# jsonable_encoder walk, validating once in pydantic-core (or not at all
+# for schemaless pages) and writing JSON bytes directly
+FAST_JSON_RESPONSES = os.environ.get('FAST_JSON_RESPONSES', 'false').lower() == 'true'
+
+# Adapters are built once; building one compiles the model's core schema
+RECEIPT_PAGE = TypeAdapter(Page[Receipt])
+RECEIPT_SUMMARY_PAGE = TypeAdapter(Page[ReceiptSummary])
+BUDGET_PAGE = TypeAdapter(Page[Budget])
+
+# ==================== RESPONSES ====================
+
+def fast_json_response(content: Any, adapter: Optional[TypeAdapter] = None) -> Response:
+    """
+    JSON response for content that needs no further encoding. With an
+    adapter the content is validated and dumped in one pass; without one
+    it must already be JSON-ready apart from datetimes, and goes to orjson.
+    """
+    if adapter is not None:
+        return Response(adapter.dump_json(adapter.validate_python(content)), media_type="application/json")
+    return ORJSONResponse(content)
@@ -1,5 +1,5 @@
-from fastapi import FastAPI, APIRouter, HTTPException, File, UploadFile, BackgroundTasks
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, APIRouter, HTTPException, File, UploadFile, Request
+from fastapi.responses import JSONResponse, StreamingResponse, PlainTextResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
@@ -9,6 +9,13 @@ from pathlib import Path
 from typing import List, Optional, Dict, Any
 from datetime import datetime
 import shutil
+import json
+from pydantic import ValidationError
+from pymongo.errors import BulkWriteError
+
+# Load .env before importing modules that read configuration at import time
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
 
 # Import models
 from models import (
@@ -20,12 +27,11 @@ from models import (
     FailedNutritionLookup, FailedNutritionLookupCreate,
     Recipe, RecipeCreate, IngredientMap, IngredientMapCreate,
     MealPlan, MealPlanCreate, AggregatedGroceryData, AggregatedGroceryDataCreate,
-    FailedScanLog, FailedScanLogCreate
+    FailedScanLog, FailedScanLogCreate, Page, ReceiptSummary
 )
 
 # Import functions
 from functions import (
-    process_receipt_in_background,
     generate_receipt_insights_in_background,
     ons_data_fetcher,
     send_invitation,
@@ -40,17 +46,101 @@ from functions import (
     send_test_email,
     rollover_budget,
     aggregate_grocery_data,
-    calorie_ninjas_nutrition_placeholder
+    start_ons_refresher,
+    stop_ons_refresher,
+    stop_nutrition_batcher,
+    get_ons_rates,
+    schedule_personal_inflation,
+    calorie_ninjas_nutrition_placeholder,
+    get_llm_stats,
+    ensure_llm_cache,
+    get_nutrition_cache_stats,
+    get_nutrition_batch,
+    NUTRITION_BATCH_ENDPOINT_MAX_NAMES,
+    JOB_HANDLERS,
+    JOB_FAILURE_HANDLERS
 )
 
-ROOT_DIR = Path(__file__).parent
-load_dotenv(ROOT_DIR / '.env')
+# Import receipt parser
+from receipt_parser import get_parser_stats
+
+# Import personal inflation
+from inflation import get_household_inflation, materialize_household_inflation
+
+# Import credit rollups
+from credits import (
+    write_credit_log,
+    rebuild_credit_rollups,
+    start_credit_writer,
+    stop_credit_writer,
+    get_credit_writer_stats,
+    get_household_balance,
+    households_over_quota,
+    CreditBufferFull
+)
+
+# Import index registry
+from indexes import ensure_indexes, check_index_errors, get_index_errors, get_index_report
+
+# Import price series
+from price_series import get_price_history, downsample_prices, DOWNSAMPLE_INTERVALS
+
+# Import keyset pagination
+from pagination import fetch_page
+
+# Import read cache
+from read_cache import (
+    get_read_cache, get_read_cache_stats,
+    invalidate_receipt, invalidate_budgets, receipt_cacheable,
+    ENTITY_HOUSEHOLD, ENTITY_RECEIPT, ENTITY_BUDGETS
+)
+
+# Import fast JSON responses
+from serialization import (
+    FAST_JSON_RESPONSES, fast_json_response,
+    RECEIPT_PAGE, RECEIPT_SUMMARY_PAGE, BUDGET_PAGE
+)
+
+# Import receipt events
+from events import (
+    configure_event_broker,
+    get_event_broker,
+    TERMINAL_STAGES
+)
+
+# Import shared HTTP client
+from http_client import start_http_client, close_http_client, get_http_stats
+
+# Import metrics
+from metrics import render_prometheus, flatten_stats, get_stage_summary
+
+# Import job queue
+from job_queue import (
+    ReceiptWorkerPool,
+    enqueue_job,
+    enqueue_jobs,
+    get_queue_stats,
+    JOB_TYPE_PROCESS_RECEIPT,
+    JOB_TYPE_RECONCILE_CREDIT_BALANCES,
+    WORKER_MODE
+)
 
 # MongoDB connection
 mongo_url = os.environ['MONGO_URL']
 client = AsyncIOMotorClient(mongo_url)
 db = client[os.environ.get('DB_NAME', 'grocerytrack_db')]
 
+# Bulk ingestion limits
+BULK_RECEIPT_MAX_ITEMS = int(os.environ.get('BULK_RECEIPT_MAX_ITEMS', '5000'))
+BULK_RECEIPT_INSERT_BATCH = 1000
+# Bulk imports queue behind interactive scans (lower priority value runs first)
+BULK_RECEIPT_JOB_PRIORITY = 10
+# Maintenance jobs run when nothing else is waiting
+RECONCILE_JOB_PRIORITY = 200
+
+# Receipt processing workers (only when running in-process)
+worker_pool = ReceiptWorkerPool(db, JOB_HANDLERS, failure_handlers=JOB_FAILURE_HANDLERS) if WORKER_MODE == 'inprocess' else None
+
 # Create the main app
 app = FastAPI(title="GroceryTrack API", version="1.0.0")
 
@@ -83,93 +173,266 @@ async def health_check():
     try:
         # Test MongoDB connection
         await db.command('ping')
+        index_errors = get_index_errors()
+        if index_errors:
+            return {"status": "degraded", "database": "connected", "index_errors": index_errors}
         return {"status": "healthy", "database": "connected"}
     except Exception as e:
         return {"status": "unhealthy", "database": "disconnected", "error": str(e)}
 
+async def list_page(collection, query: Dict[str, Any], sort_field: str, cursor: Optional[str], limit: Optional[int]) -> Dict[str, Any]:
+    """A keyset page of a collection; a malformed cursor is a 400"""
+    try:
+        return await fetch_page(collection, query, sort_field, cursor, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def stamp_update(update_data: Dict[str, Any]) -> None:
+    """
+    Prepares a client update for $set: created_date is immutable (and keys
+    list pages), updated_date is a native datetime
+    """
+    update_data.pop('created_date', None)
+    update_data['updated_date'] = datetime.utcnow()
+
 # ==================== RECEIPT ENDPOINTS ====================
+async def ensure_within_quota(household_id: Optional[str]) -> None:
+    """Rejects receipt intake for households over their monthly credits"""
+    if household_id and household_id in await households_over_quota(db, [household_id]):
+        raise HTTPException(status_code=429, detail="Monthly credit quota exceeded for this household")
+
 @api_router.post("/receipts", response_model=Receipt)
-async def create_receipt(receipt: ReceiptCreate, background_tasks: BackgroundTasks):
+async def create_receipt(receipt: ReceiptCreate):
     """Create a new receipt"""
+    if receipt.validation_status == 'processing_background':
+        await ensure_within_quota(receipt.household_id)
     try:
         receipt_dict = receipt.model_dump()
         receipt_obj = Receipt(**receipt_dict)
         
         doc = receipt_obj.model_dump()
-        doc['created_date'] = doc['created_date'].isoformat()
-        doc['updated_date'] = doc['updated_date'].isoformat()
-        
         await db.receipts.insert_one(doc)
         
-        # Trigger background processing if needed
+        # Queue background processing if needed
         if receipt_obj.validation_status == 'processing_background':
-            background_tasks.add_task(
-                process_receipt_in_background,
-                receipt_obj.id,
-                receipt_obj.receipt_image_urls,
-                receipt_obj.supermarket,
-                receipt_obj.total_amount,
-                receipt_obj.household_id,
-                receipt_obj.user_email,
-                db
-            )
+            await enqueue_job(db, JOB_TYPE_PROCESS_RECEIPT, {
+                "receipt_id": receipt_obj.id,
+                "image_urls": receipt_obj.receipt_image_urls,
+                "store_name": receipt_obj.supermarket,
+                "total_amount": receipt_obj.total_amount,
+                "household_id": receipt_obj.household_id,
+                "user_email": receipt_obj.user_email
+            })
         
         return receipt_obj
     except Exception as e:
         logger.error(f"Error creating receipt: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@api_router.post("/receipts/bulk")
+async def create_receipts_bulk(payloads: List[Any]):
+    """Validate and insert a batch of receipts, returning per-item results"""
+    if len(payloads) > BULK_RECEIPT_MAX_ITEMS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch too large: {len(payloads)} receipts (max {BULK_RECEIPT_MAX_ITEMS})"
+        )
+    
+    try:
+        results: List[Dict[str, Any]] = []
+        docs: List[Dict[str, Any]] = []
+        doc_indexes: List[int] = []
+        over_quota = await households_over_quota(
+            db, [payload.get("household_id") for payload in payloads if isinstance(payload, dict)]
+        )
+        
+        for index, payload in enumerate(payloads):
+            try:
+                receipt_obj = Receipt(**ReceiptCreate.model_validate(payload).model_dump())
+            except ValidationError as e:
+                results.append({"index": index, "status": "invalid", "errors": e.errors(include_url=False, include_context=False)})
+                continue
+            if receipt_obj.household_id in over_quota and receipt_obj.validation_status == 'processing_background':
+                results.append({"index": index, "status": "rejected", "error": "Monthly credit quota exceeded"})
+                continue
+            
+            doc = receipt_obj.model_dump()
+            docs.append(doc)
+            doc_indexes.append(index)
+            results.append({"index": index, "status": "created", "id": receipt_obj.id})
+        
+        results_by_index = {result["index"]: result for result in results}
+        for start in range(0, len(docs), BULK_RECEIPT_INSERT_BATCH):
+            batch = docs[start:start + BULK_RECEIPT_INSERT_BATCH]
+            try:
+                await db.receipts.insert_many(batch, ordered=False)
+            except BulkWriteError as e:
+                for write_error in e.details.get("writeErrors", []):
+                    result = results_by_index[doc_indexes[start + write_error["index"]]]
+                    result["status"] = "failed"
+                    result["error"] = write_error.get("errmsg")
+        
+        created_ids = {result.get("id") for result in results if result["status"] == "created"}
+        job_payloads = [
+            {
+                "receipt_id": doc["id"],
+                "image_urls": doc["receipt_image_urls"],
+                "store_name": doc["supermarket"],
+                "total_amount": doc["total_amount"],
+                "household_id": doc["household_id"],
+                "user_email": doc["user_email"]
+            }
+            for doc in docs
+            if doc["id"] in created_ids and doc["validation_status"] == 'processing_background'
+        ]
+        jobs_enqueued = await enqueue_jobs(
+            db, JOB_TYPE_PROCESS_RECEIPT, job_payloads, priority=BULK_RECEIPT_JOB_PRIORITY
+        ) if job_payloads else 0
+        
+        results.sort(key=lambda result: result["index"])
+        return {
+            "received": len(payloads),
+            "created": len(created_ids),
+            "invalid": sum(1 for result in results if result["status"] == "invalid"),
+            "failed": sum(1 for result in results if result["status"] == "failed"),
+            "rejected": sum(1 for result in results if result["status"] == "rejected"),
+            "jobs_enqueued": jobs_enqueued,
+            "results": results
+        }
+    except Exception as e:
+        logger.error(f"Error bulk creating receipts: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @api_router.get("/receipts/{receipt_id}", response_model=Receipt)
 async def get_receipt(receipt_id: str):
     """Get a single receipt by ID"""
-    receipt = await db.receipts.find_one({"id": receipt_id}, {"_id": 0})
+    receipt = await get_read_cache().get_or_load(
+        ENTITY_RECEIPT, receipt_id,
+        lambda: db.receipts.find_one({"id": receipt_id}, RECEIPT_FULL_PROJECTION),
+        cacheable=receipt_cacheable
+    )
     if not receipt:
         raise HTTPException(status_code=404, detail="Receipt not found")
     
-    # Convert ISO strings back to datetime
-    if isinstance(receipt.get('created_date'), str):
-        receipt['created_date'] = datetime.fromisoformat(receipt['created_date'])
-    if isinstance(receipt.get('updated_date'), str):
-        receipt['updated_date'] = datetime.fromisoformat(receipt['updated_date'])
-    
     return receipt
 
-@api_router.get("/receipts", response_model=List[Receipt])
-async def get_receipts(household_id: Optional[str] = None, limit: int = 100):
-    """Get all receipts, optionally filtered by household"""
+@api_router.get("/receipts/{receipt_id}/events")
+async def stream_receipt_events(receipt_id: str, request: Request):
+    """Server-sent events for receipt processing stage transitions"""
+    subscription = await get_event_broker().subscribe(receipt_id)
+    receipt = await db.receipts.find_one({"id": receipt_id}, {"_id": 0, "validation_status": 1})
+    if not receipt:
+        await subscription.close()
+        raise HTTPException(status_code=404, detail="Receipt not found")
+    
+    def format_event(event_name: str, data: Dict[str, Any]) -> str:
+        return f"event: {event_name}\ndata: {json.dumps(data, default=str)}\n\n"
+    
+    async def event_stream():
+        try:
+            status = receipt.get("validation_status")
+            yield format_event("status", {"receipt_id": receipt_id, "validation_status": status})
+            if status != 'processing_background':
+                return
+            
+            while not await request.is_disconnected():
+                event = await subscription.next(timeout=15)
+                if event is None:
+                    # Comment line keeps proxies from closing an idle stream
+                    yield ": keep-alive\n\n"
+                    continue
+                yield format_event(event["stage"], event)
+                if event["stage"] in TERMINAL_STAGES:
+                    return
+        finally:
+            await subscription.close()
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# The raw OCR blob is never part of a response
+RECEIPT_FULL_PROJECTION = {"_id": 0, "textract_data": 0}
+RECEIPT_SUMMARY_PROJECTION = {
+    "_id": 0,
+    **{field: 1 for field in ReceiptSummary.model_fields if field != "item_count"},
+    "item_count": {"$size": {"$ifNull": ["$items", []]}}
+}
+
+def receipt_fields_projection(fields: str) -> Dict[str, Any]:
+    """
+    Projection for a comma-separated list of top-level receipt fields.
+    id and created_date are always returned as pages are keyed on them.
+    """
+    requested = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in requested if field not in Receipt.model_fields]
+    if unknown:
+        raise ValueError(f"Unknown receipt fields: {', '.join(unknown)}")
+    return {"_id": 0, "id": 1, "created_date": 1, **{field: 1 for field in requested}}
+
+@api_router.get("/receipts", response_model=None)
+async def get_receipts(
+    household_id: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+    view: str = 'full',
+    fields: Optional[str] = None
+):
+    """
+    Get a page of receipts, newest first, optionally filtered by household.
+    view=summary returns ReceiptSummary rows (store, date, total, item count);
+    fields=a,b,c returns only those receipt fields and overrides view.
+    """
     try:
         query = {}
         if household_id:
             query["household_id"] = household_id
+        if fields:
+            projection = receipt_fields_projection(fields)
+        elif view == 'summary':
+            projection = RECEIPT_SUMMARY_PROJECTION
+        elif view == 'full':
+            projection = RECEIPT_FULL_PROJECTION
+        else:
+            raise ValueError("view must be full or summary")
         
-        receipts = await db.receipts.find(query, {"_id": 0}).sort("created_date", -1).limit(limit).to_list(limit)
-        
-        # Convert ISO strings to datetime
-        for receipt in receipts:
-            if isinstance(receipt.get('created_date'), str):
-                receipt['created_date'] = datetime.fromisoformat(receipt['created_date'])
-            if isinstance(receipt.get('updated_date'), str):
-                receipt['updated_date'] = datetime.fromisoformat(receipt['updated_date'])
-        
-        return receipts
+        page = await fetch_page(db.receipts, query, "created_date", cursor, limit, projection)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error fetching receipts: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
+    
+    if FAST_JSON_RESPONSES:
+        adapter = None if fields else RECEIPT_SUMMARY_PAGE if view == 'summary' else RECEIPT_PAGE
+        return fast_json_response(page, adapter)
+    if fields:
+        return page
+    if view == 'summary':
+        return Page[ReceiptSummary](**page)
+    return Page[Receipt](**page)
 
 @api_router.put("/receipts/{receipt_id}")
 async def update_receipt(receipt_id: str, update_data: Dict[str, Any]):
     """Update a receipt"""
     try:
-        update_data['updated_date'] = datetime.utcnow().isoformat()
+        stamp_update(update_data)
         
         result = await db.receipts.update_one(
             {"id": receipt_id},
             {"$set": update_data}
         )
+        invalidate_receipt(receipt_id)
         
         if result.matched_count == 0:
             raise HTTPException(status_code=404, detail="Receipt not found")
         
+        if 'items' in update_data or 'validation_status' in update_data:
+            receipt = await db.receipts.find_one({"id": receipt_id}, {"_id": 0, "household_id": 1})
+            await schedule_personal_inflation((receipt or {}).get("household_id"), db)
+        
         return {"status": "success", "message": "Receipt updated"}
     except Exception as e:
         logger.error(f"Error updating receipt: {str(e)}")
@@ -179,6 +442,7 @@ async def update_receipt(receipt_id: str, update_data: Dict[str, Any]):
 async def delete_receipt(receipt_id: str):
     """Delete a receipt"""
     result = await db.receipts.delete_one({"id": receipt_id})
+    invalidate_receipt(receipt_id)
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Receipt not found")
     return {"status": "success", "message": "Receipt deleted"}
@@ -192,10 +456,8 @@ async def create_budget(budget: BudgetCreate):
         budget_obj = Budget(**budget_dict)
         
         doc = budget_obj.model_dump()
-        doc['created_date'] = doc['created_date'].isoformat()
-        doc['updated_date'] = doc['updated_date'].isoformat()
-        
         await db.budgets.insert_one(doc)
+        invalidate_budgets(budget_obj.household_id)
         return budget_obj
     except Exception as e:
         logger.error(f"Error creating budget: {str(e)}")
@@ -208,51 +470,52 @@ async def get_budget(budget_id: str):
     if not budget:
         raise HTTPException(status_code=404, detail="Budget not found")
     
-    if isinstance(budget.get('created_date'), str):
-        budget['created_date'] = datetime.fromisoformat(budget['created_date'])
-    if isinstance(budget.get('updated_date'), str):
-        budget['updated_date'] = datetime.fromisoformat(budget['updated_date'])
-    
     return budget
 
-@api_router.get("/budgets", response_model=List[Budget])
-async def get_budgets(household_id: Optional[str] = None):
-    """Get all budgets, optionally filtered by household"""
+@api_router.get("/budgets", response_model=Page[Budget])
+async def get_budgets(household_id: Optional[str] = None, cursor: Optional[str] = None, limit: Optional[int] = None):
+    """Get a page of budgets, newest first, optionally filtered by household"""
     query = {}
     if household_id:
         query["household_id"] = household_id
     
-    budgets = await db.budgets.find(query, {"_id": 0}).to_list(100)
-    
-    for budget in budgets:
-        if isinstance(budget.get('created_date'), str):
-            budget['created_date'] = datetime.fromisoformat(budget['created_date'])
-        if isinstance(budget.get('updated_date'), str):
-            budget['updated_date'] = datetime.fromisoformat(budget['updated_date'])
-    
-    return budgets
+    if cursor is None and limit is None:
+        # Only the default first page is cached, so one key per household
+        # covers what a write has to invalidate
+        page = await get_read_cache().get_or_load(
+            ENTITY_BUDGETS, household_id or None,
+            lambda: list_page(db.budgets, query, "created_date", None, None)
+        )
+    else:
+        page = await list_page(db.budgets, query, "created_date", cursor, limit)
+    if FAST_JSON_RESPONSES:
+        return fast_json_response(page, BUDGET_PAGE)
+    return page
 
 @api_router.put("/budgets/{budget_id}")
 async def update_budget(budget_id: str, update_data: Dict[str, Any]):
     """Update a budget"""
-    update_data['updated_date'] = datetime.utcnow().isoformat()
+    stamp_update(update_data)
     
-    result = await db.budgets.update_one(
+    previous = await db.budgets.find_one_and_update(
         {"id": budget_id},
-        {"$set": update_data}
+        {"$set": update_data},
+        projection={"_id": 0, "household_id": 1}
     )
     
-    if result.matched_count == 0:
+    if previous is None:
         raise HTTPException(status_code=404, detail="Budget not found")
+    invalidate_budgets(previous.get("household_id"), update_data.get("household_id"))
     
     return {"status": "success", "message": "Budget updated"}
 
 @api_router.delete("/budgets/{budget_id}")
 async def delete_budget(budget_id: str):
     """Delete a budget"""
-    result = await db.budgets.delete_one({"id": budget_id})
-    if result.deleted_count == 0:
+    deleted = await db.budgets.find_one_and_delete({"id": budget_id}, projection={"_id": 0, "household_id": 1})
+    if deleted is None:
         raise HTTPException(status_code=404, detail="Budget not found")
+    invalidate_budgets(deleted.get("household_id"))
     return {"status": "success", "message": "Budget deleted"}
 
 # ==================== HOUSEHOLD ENDPOINTS ====================
@@ -264,9 +527,6 @@ async def create_household(household: HouseholdCreate):
         household_obj = Household(**household_dict)
         
         doc = household_obj.model_dump()
-        doc['created_date'] = doc['created_date'].isoformat()
-        doc['updated_date'] = doc['updated_date'].isoformat()
-        
         await db.households.insert_one(doc)
         return household_obj
     except Exception as e:
@@ -276,29 +536,21 @@ async def create_household(household: HouseholdCreate):
 @api_router.get("/households/{household_id}", response_model=Household)
 async def get_household(household_id: str):
     """Get a single household by ID"""
-    household = await db.households.find_one({"id": household_id}, {"_id": 0})
+    household = await get_read_cache().get_or_load(
+        ENTITY_HOUSEHOLD, household_id,
+        lambda: db.households.find_one({"id": household_id}, {"_id": 0})
+    )
     if not household:
         raise HTTPException(status_code=404, detail="Household not found")
     
-    if isinstance(household.get('created_date'), str):
-        household['created_date'] = datetime.fromisoformat(household['created_date'])
-    if isinstance(household.get('updated_date'), str):
-        household['updated_date'] = datetime.fromisoformat(household['updated_date'])
-    
     return household
 
 @api_router.get("/households")
-async def get_households():
-    """Get all households"""
-    households = await db.households.find({}, {"_id": 0}).to_list(100)
-    
-    for household in households:
-        if isinstance(household.get('created_date'), str):
-            household['created_date'] = datetime.fromisoformat(household['created_date'])
-        if isinstance(household.get('updated_date'), str):
-            household['updated_date'] = datetime.fromisoformat(household['updated_date'])
+async def get_households(cursor: Optional[str] = None, limit: Optional[int] = None):
+    """Get a page of households, newest first"""
+    page = await list_page(db.households, {}, "created_date", cursor, limit)
     
-    return households
+    return page
 
 # ==================== FILE UPLOAD ====================
 @api_router.post("/upload")
@@ -333,20 +585,23 @@ async def upload_file(file: UploadFile = File(...)):
 
 # ==================== FUNCTION INVOCATION ENDPOINTS ====================
 @api_router.post("/functions/processReceiptInBackground")
-async def invoke_process_receipt(data: Dict[str, Any], background_tasks: BackgroundTasks):
+async def invoke_process_receipt(data: Dict[str, Any]):
     """Invoke processReceiptInBackground function"""
+    await ensure_within_quota(data.get('householdId'))
     try:
-        background_tasks.add_task(
-            process_receipt_in_background,
-            data['receiptId'],
-            data['imageUrls'],
-            data['storeName'],
-            data['totalAmount'],
-            data['householdId'],
-            data['userEmail'],
-            db
-        )
-        return {"status": "processing", "message": "Receipt processing started in background"}
+        job = await enqueue_job(db, JOB_TYPE_PROCESS_RECEIPT, {
+            "receipt_id": data['receiptId'],
+            "image_urls": data['imageUrls'],
+            "store_name": data['storeName'],
+            "total_amount": data['totalAmount'],
+            "household_id": data['householdId'],
+            "user_email": data['userEmail']
+        })
+        return {
+            "status": "processing",
+            "message": "Receipt processing queued",
+            "job_id": job["id"]
+        }
     except Exception as e:
         logger.error(f"Error invoking function: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -357,23 +612,86 @@ async def invoke_nutrition_lookup(data: Dict[str, Any]):
     try:
         result = await calorie_ninjas_nutrition_placeholder(
             data['canonical_name'],
-            data['household_id']
+            data['household_id'],
+            db,
+            data.get('user_email', '')
         )
         return result
     except Exception as e:
         logger.error(f"Error invoking nutrition lookup: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@api_router.post("/functions/calorieNinjasNutritionBatch")
+async def invoke_nutrition_lookup_batch(data: Dict[str, Any]):
+    """Nutrition lookup for many canonical names in one request"""
+    canonical_names = data.get('canonical_names') or []
+    if len(canonical_names) > NUTRITION_BATCH_ENDPOINT_MAX_NAMES:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Too many names: {len(canonical_names)} (max {NUTRITION_BATCH_ENDPOINT_MAX_NAMES})"
+        )
+    try:
+        results = await get_nutrition_batch(
+            canonical_names,
+            data['household_id'],
+            db,
+            data.get('user_email', '')
+        )
+        return {"results": results}
+    except Exception as e:
+        logger.error(f"Error invoking batch nutrition lookup: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@api_router.get("/http/stats")
+async def get_outbound_http_stats():
+    """Shared outbound HTTP client pool utilisation"""
+    return get_http_stats()
+
+@api_router.get("/nutrition/cache/stats")
+async def get_nutrition_cache_statistics():
+    """Nutrition cache hit ratios per tier"""
+    return get_nutrition_cache_stats()
+
+@api_router.get("/read-cache/stats")
+async def get_read_cache_statistics():
+    """Household, receipt and budget read cache hit ratios"""
+    return get_read_cache_stats()
+
 @api_router.get("/functions/onsDataFetcher")
 async def invoke_ons_data():
     """Fetch ONS inflation data"""
     try:
-        result = await ons_data_fetcher()
+        result = await ons_data_fetcher(db)
         return result
     except Exception as e:
         logger.error(f"Error fetching ONS data: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@api_router.get("/inflation/personal")
+async def get_personal_inflation(household_id: str, month: Optional[str] = None):
+    """
+    Household's materialized monthly inflation vs ONS CPI. ONS rates are
+    overlaid from the in-memory series so newly published months show up
+    without recomputing.
+    """
+    rows = await get_household_inflation(db, household_id, month)
+    ons_rates = await get_ons_rates(db)
+    for row in rows:
+        ons = ons_rates.get(row["month"], row.get("ons_inflation_rate"))
+        personal = row.get("personal_inflation_rate")
+        row["ons_inflation_rate"] = ons
+        row["difference_vs_ons"] = round(personal - ons, 2) if personal is not None and ons is not None else None
+    return rows
+
+@api_router.post("/functions/computePersonalInflation")
+async def invoke_compute_personal_inflation(data: Dict[str, Any]):
+    """Recompute a household's personal inflation now (admin/backfill)"""
+    try:
+        return await materialize_household_inflation(db, data['household_id'], await get_ons_rates(db))
+    except Exception as e:
+        logger.error(f"Error computing personal inflation: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @api_router.post("/functions/sendInvitation")
 async def invoke_send_invitation(data: Dict[str, Any]):
     """Send household invitation"""
@@ -443,6 +761,15 @@ async def invoke_credit_report(start_date: Optional[str] = None, end_date: Optio
         logger.error(f"Error generating credit report: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@api_router.post("/functions/rebuildCreditRollups")
+async def invoke_rebuild_credit_rollups():
+    """Backfill daily credit rollups from credit_logs (admin)"""
+    try:
+        return await rebuild_credit_rollups(db)
+    except Exception as e:
+        logger.error(f"Error rebuilding credit rollups: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @api_router.post("/functions/createTestRun")
 async def invoke_create_test_run(data: Dict[str, Any]):
     """Create OCR test run"""
@@ -525,6 +852,96 @@ async def invoke_aggregate_data():
         logger.error(f"Error aggregating data: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+# ==================== PRICE HISTORY ====================
+@api_router.get("/prices/history")
+async def get_item_price_history(
+    item: str,
+    start_date: str,
+    end_date: str,
+    store: Optional[str] = None,
+    interval: str = 'raw'
+):
+    """
+    Price history for a canonical item over a date range, per store.
+    interval: raw (every observation), daily or weekly (min/mean/max)
+    """
+    try:
+        start = datetime.fromisoformat(start_date)
+        end = datetime.fromisoformat(end_date)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="start_date and end_date must be ISO dates")
+    if len(end_date) == 10:
+        # A bare end date includes that whole day
+        end = end.replace(hour=23, minute=59, second=59, microsecond=999999)
+    if interval != 'raw' and interval not in DOWNSAMPLE_INTERVALS:
+        raise HTTPException(status_code=400, detail="interval must be raw, daily or weekly")
+    
+    history = await get_price_history(db, item, start, end, store)
+    if interval != 'raw':
+        history["stores"] = {
+            store_name: downsample_prices(series["timestamps"], series["prices"], interval)
+            for store_name, series in history["stores"].items()
+        }
+    history["interval"] = interval
+    return history
+
+# ==================== METRICS ====================
+@api_router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Prometheus metrics: pipeline stage histograms plus subsystem gauges"""
+    gauges = {}
+    gauges.update(flatten_stats("grocerytrack_llm", get_llm_stats()))
+    gauges.update(flatten_stats("grocerytrack_parser", get_parser_stats()))
+    gauges.update(flatten_stats("grocerytrack_nutrition_cache", get_nutrition_cache_stats()))
+    gauges.update(flatten_stats("grocerytrack_http", get_http_stats()))
+    gauges.update(flatten_stats("grocerytrack_credit_writer", get_credit_writer_stats()))
+    gauges.update(flatten_stats("grocerytrack_read_cache", get_read_cache_stats()))
+    gauges["grocerytrack_receipt_event_subscribers"] = float(get_event_broker().subscriber_count())
+    if worker_pool:
+        gauges.update(flatten_stats("grocerytrack_worker_pool", worker_pool.snapshot()))
+    try:
+        gauges.update(flatten_stats("grocerytrack_jobs", await get_queue_stats(db)))
+    except Exception as e:
+        logger.error(f"Error collecting job queue metrics: {str(e)}")
+    return PlainTextResponse(render_prometheus(gauges), media_type="text/plain; version=0.0.4")
+
+@api_router.get("/metrics/stages")
+async def get_stage_metrics():
+    """p50/p95/p99 per pipeline stage and store"""
+    return get_stage_summary()
+
+# ==================== JOB QUEUE ====================
+@api_router.get("/jobs/stats")
+async def get_job_stats(window_minutes: int = 60):
+    """Receipt processing queue depth and latency"""
+    try:
+        stats = await get_queue_stats(db, window_minutes)
+        stats["local_pool"] = worker_pool.snapshot() if worker_pool else None
+        return stats
+    except Exception as e:
+        logger.error(f"Error fetching job stats: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+# ==================== LLM ====================
+@api_router.get("/llm/stats")
+async def get_llm_call_stats():
+    """LLM enhancement concurrency, queue wait and call time"""
+    return get_llm_stats()
+
+@api_router.get("/admin/indexes")
+async def get_admin_index_report():
+    """Index usage ($indexStats), unused indexes and query shapes planned as COLLSCAN"""
+    try:
+        return await get_index_report(db)
+    except Exception as e:
+        logger.error(f"Error building index report: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@api_router.get("/parser/stats")
+async def get_receipt_parser_stats():
+    """Local receipt parser fast-path hit rate"""
+    return get_parser_stats()
+
 # ==================== ADDITIONAL ENTITY ENDPOINTS ====================
 # Credit Logs
 @api_router.post("/credit-logs", response_model=CreditLog)
@@ -534,42 +951,70 @@ async def create_credit_log(log: CreditLogCreate):
         log_dict = log.model_dump()
         log_obj = CreditLog(**log_dict)
         
+        # Stored as a native date so range filters and rollups match
         doc = log_obj.model_dump()
-        doc['timestamp'] = doc['timestamp'].isoformat()
         
-        await db.credit_logs.insert_one(doc)
+        await write_credit_log(db, doc)
         return log_obj
+    except CreditBufferFull as e:
+        logger.error(f"Rejecting credit log: {str(e)}")
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logger.error(f"Error creating credit log: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@api_router.get("/credit-logs/writer/stats")
+async def get_credit_log_writer_stats():
+    """Buffered credit log writer: flush sizes, lag and backlog"""
+    return get_credit_writer_stats()
+
+@api_router.get("/households/{household_id}/credits")
+async def get_household_credit_balance(household_id: str, period: Optional[str] = None):
+    """Credits used by a household this month (or period=YYYY-MM)"""
+    return await get_household_balance(db, household_id, period)
+
+@api_router.post("/functions/reconcileCreditBalances")
+async def invoke_reconcile_credit_balances(data: Dict[str, Any]):
+    """Queue a recompute of household credit balances from credit_logs"""
+    try:
+        job = await enqueue_job(db, JOB_TYPE_RECONCILE_CREDIT_BALANCES, {
+            "period": data.get('period'),
+            "household_id": data.get('household_id'),
+            "fix": data.get('fix', True)
+        }, priority=RECONCILE_JOB_PRIORITY)
+        return {"status": "queued", "job_id": job["id"]}
+    except Exception as e:
+        logger.error(f"Error queueing credit reconcile: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @api_router.get("/credit-logs")
-async def get_credit_logs(household_id: Optional[str] = None, user_email: Optional[str] = None):
-    """Get credit logs"""
+async def get_credit_logs(
+    household_id: Optional[str] = None,
+    user_email: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None
+):
+    """Get a page of credit logs, newest first (keyed on timestamp, as logs have no created_date)"""
     query = {}
     if household_id:
         query["household_id"] = household_id
     if user_email:
         query["user_email"] = user_email
     
-    logs = await db.credit_logs.find(query, {"_id": 0}).to_list(1000)
-    
-    for log in logs:
-        if isinstance(log.get('timestamp'), str):
-            log['timestamp'] = datetime.fromisoformat(log['timestamp'])
-    
-    return logs
+    page = await list_page(db.credit_logs, query, "timestamp", cursor, limit)
+    if FAST_JSON_RESPONSES:
+        return fast_json_response(page)
+    return page
 
 # Nutrition Facts
 @api_router.get("/nutrition-facts")
-async def get_nutrition_facts(household_id: Optional[str] = None):
-    """Get nutrition facts"""
+async def get_nutrition_facts(household_id: Optional[str] = None, cursor: Optional[str] = None, limit: Optional[int] = None):
+    """Get a page of nutrition facts, newest first"""
     query = {}
     if household_id:
         query["household_id"] = household_id
     
-    facts = await db.nutrition_facts.find(query, {"_id": 0}).to_list(1000)
-    return facts
+    return await list_page(db.nutrition_facts, query, "created_date", cursor, limit)
 
 # Recipes
 @api_router.post("/recipes", response_model=Recipe)
@@ -580,9 +1025,6 @@ async def create_recipe(recipe: RecipeCreate):
         recipe_obj = Recipe(**recipe_dict)
         
         doc = recipe_obj.model_dump()
-        doc['created_date'] = doc['created_date'].isoformat()
-        doc['updated_date'] = doc['updated_date'].isoformat()
-        
         await db.recipes.insert_one(doc)
         return recipe_obj
     except Exception as e:
@@ -590,10 +1032,9 @@ async def create_recipe(recipe: RecipeCreate):
         raise HTTPException(status_code=500, detail=str(e))
 
 @api_router.get("/recipes")
-async def get_recipes():
-    """Get all recipes"""
-    recipes = await db.recipes.find({}, {"_id": 0}).to_list(100)
-    return recipes
+async def get_recipes(cursor: Optional[str] = None, limit: Optional[int] = None):
+    """Get a page of recipes, newest first"""
+    return await list_page(db.recipes, {}, "created_date", cursor, limit)
 
 # Include the router in the main app
 app.include_router(api_router)
@@ -607,8 +1048,30 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.on_event("startup")
+async def startup_services():
+    await start_http_client()
+    await configure_event_broker(db)
+    try:
+        await ensure_indexes(db)
+        await ensure_llm_cache(db)
+    except Exception as e:
+        logger.error(f"Error preparing indexes and caches: {str(e)}")
+    check_index_errors()
+    start_ons_refresher(db)
+    await start_credit_writer(db)
+    if worker_pool:
+        await worker_pool.start()
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    if worker_pool:
+        await worker_pool.stop()
+    stop_ons_refresher()
+    await stop_nutrition_batcher()
+    await stop_credit_writer()
+    await get_event_broker().stop()
+    await close_http_client()
     client.close()
 
 if __name__ == "__main__":
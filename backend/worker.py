@@ -0,0 +1,65 @@
+"""
+Standalone receipt processing worker.
+
+Run alongside the API with RECEIPT_WORKER_MODE=external to move OCR/LLM work
+out of the request process:
+
+    python worker.py --concurrency 8
+"""
+import os
+import asyncio
+import argparse
+import logging
+import signal
+from pathlib import Path
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+from functions import JOB_HANDLERS, JOB_FAILURE_HANDLERS, stop_nutrition_batcher
+from events import configure_event_broker, MongoEventBroker
+from http_client import start_http_client, close_http_client
+from job_queue import ReceiptWorkerPool, WORKER_CONCURRENCY
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+async def main(concurrency: int) -> None:
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = client[os.environ.get('DB_NAME', 'grocerytrack_db')]
+
+    await start_http_client()
+    broker = await configure_event_broker(db)
+    if not isinstance(broker, MongoEventBroker):
+        logger.warning(
+            "Receipt events stay in this process; set RECEIPT_WORKER_MODE=external "
+            "or RECEIPT_EVENTS_BACKEND=mongo so the API sees processing stages"
+        )
+    pool = ReceiptWorkerPool(db, JOB_HANDLERS, concurrency=concurrency, failure_handlers=JOB_FAILURE_HANDLERS)
+    stop = asyncio.Event()
+
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    await pool.start()
+    try:
+        await stop.wait()
+    finally:
+        await pool.stop()
+        await stop_nutrition_batcher()
+        await broker.stop()
+        await close_http_client()
+        client.close()
+        logger.info(f"Worker exiting: {pool.snapshot()}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="GroceryTrack receipt processing worker")
+    parser.add_argument("--concurrency", type=int, default=WORKER_CONCURRENCY)
+    args = parser.parse_args()
+    asyncio.run(main(args.concurrency))
@@ -14,6 +14,34 @@ const apiClient = axios.create({
   },
 });
 
+// ==================== PAGINATION ====================
+
+// List endpoints return { items, next_cursor }; pass next_cursor back as
+// `cursor` to get the following page
+export async function listPage(path, params = {}, cursor = null, pageSize = 100) {
+  const search = new URLSearchParams();
+  Object.entries(params).forEach(([key, value]) => {
+    if (value !== undefined && value !== null && value !== '') search.append(key, value);
+  });
+  if (cursor) search.append('cursor', cursor);
+  if (pageSize) search.append('limit', pageSize.toString());
+
+  const response = await apiClient.get(`${path}?${search.toString()}`);
+  return response.data;
+}
+
+// Follows cursors until `limit` items are collected or the list ends
+async function listAll(path, params = {}, limit = 100) {
+  const items = [];
+  let cursor = null;
+  do {
+    const page = await listPage(path, params, cursor, Math.min(limit - items.length, 500));
+    items.push(...page.items);
+    cursor = page.next_cursor;
+  } while (cursor && items.length < limit);
+  return items;
+}
+
 // ==================== ENTITIES API ====================
 
 // Receipt entity
@@ -23,13 +51,10 @@ export const Receipt = {
     return response.data;
   },
   
+  // query.view = 'summary' or query.fields = 'a,b' fetch lighter list rows
   async find(query = {}, sort = '-created_date', limit = 100) {
-    const params = new URLSearchParams();
-    if (query.household_id) params.append('household_id', query.household_id);
-    if (limit) params.append('limit', limit.toString());
-    
-    const response = await apiClient.get(`/receipts?${params.toString()}`);
-    return response.data;
+    const { household_id, view, fields } = query;
+    return listAll('/receipts', { household_id, view, fields }, limit);
   },
   
   async filter(query = {}, sort = '-created_date', limit = 100) {
@@ -60,11 +85,7 @@ export const Budget = {
   },
   
   async find(query = {}) {
-    const params = new URLSearchParams();
-    if (query.household_id) params.append('household_id', query.household_id);
-    
-    const response = await apiClient.get(`/budgets?${params.toString()}`);
-    return response.data;
+    return listAll('/budgets', { household_id: query.household_id });
   },
   
   async filter(query = {}, sort = '-created_date', limit = 10) {
@@ -95,8 +116,7 @@ export const Household = {
   },
   
   async find(query = {}) {
-    const response = await apiClient.get('/households');
-    return response.data;
+    return listAll('/households');
   },
   
   async get(id) {
@@ -113,12 +133,7 @@ export const CreditLog = {
   },
   
   async find(query = {}) {
-    const params = new URLSearchParams();
-    if (query.household_id) params.append('household_id', query.household_id);
-    if (query.user_email) params.append('user_email', query.user_email);
-    
-    const response = await apiClient.get(`/credit-logs?${params.toString()}`);
-    return response.data;
+    return listAll('/credit-logs', { household_id: query.household_id, user_email: query.user_email }, 1000);
   }
 };
 
@@ -146,11 +161,7 @@ export const FailedScanLog = {
 
 export const NutritionFact = {
   async find(query = {}) {
-    const params = new URLSearchParams();
-    if (query.household_id) params.append('household_id', query.household_id);
-    
-    const response = await apiClient.get(`/nutrition-facts?${params.toString()}`);
-    return response.data;
+    return listAll('/nutrition-facts', { household_id: query.household_id }, 1000);
   }
 };
 
@@ -175,8 +186,7 @@ export const Recipe = {
   },
   
   async find(query = {}) {
-    const response = await apiClient.get('/recipes');
-    return response.data;
+    return listAll('/recipes');
   }
 };
 
@@ -236,11 +246,25 @@ export const calorieNinjasNutrition = async function(data) {
   return functions.invoke('calorieNinjasNutrition', data);
 };
 
+// data: { canonical_names: [...], household_id, user_email }
+export const calorieNinjasNutritionBatch = async function(data) {
+  return functions.invoke('calorieNinjasNutritionBatch', data);
+};
+
 export const onsDataFetcher = async function() {
   const response = await apiClient.get('/functions/onsDataFetcher');
   return response.data;
 };
 
+export const getPersonalInflation = async function(householdId, month) {
+  const params = new URLSearchParams();
+  params.append('household_id', householdId);
+  if (month) params.append('month', month);
+  
+  const response = await apiClient.get(`/inflation/personal?${params.toString()}`);
+  return response.data;
+};
+
 export const sendInvitation = async function(data) {
   return functions.invoke('sendInvitation', data);
 };
@@ -0,0 +1,11 @@
+import os
+import sys
+from pathlib import Path
+
+# Backend modules import each other as top-level modules
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+# server.py reads these at import; the Motor client does not connect until used
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "grocerytrack_test")
@@ -0,0 +1,110 @@
+"""
+An in-memory collection covering the query operators the pagination and
+migration code issues, with BSON's cross-type ordering for sorts
+"""
+from datetime import datetime
+from types import SimpleNamespace
+
+# BSON sort order of the types the fakes hold: null < numbers < strings < dates
+def _type_rank(value):
+    if value is None:
+        return 0
+    if isinstance(value, (int, float)):
+        return 1
+    if isinstance(value, str):
+        return 2
+    if isinstance(value, datetime):
+        return 4
+    raise TypeError(f"Unsupported value {value!r}")
+
+def sort_key(value):
+    return (_type_rank(value), value if value is not None else 0)
+
+def _compare(value, op, operand):
+    # Range comparisons never cross BSON types
+    if _type_rank(value) != _type_rank(operand) or value is None:
+        return False
+    return {"$lt": value < operand, "$gt": value > operand}[op]
+
+def matches(doc, query):
+    for key, condition in query.items():
+        if key == "$and":
+            if not all(matches(doc, clause) for clause in condition):
+                return False
+        elif key == "$or":
+            if not any(matches(doc, clause) for clause in condition):
+                return False
+        elif isinstance(condition, dict):
+            value = doc.get(key)
+            for op, operand in condition.items():
+                if op == "$type":
+                    if not isinstance(value, {"string": str, "date": datetime}[operand]):
+                        return False
+                elif not _compare(value, op, operand):
+                    return False
+        elif doc.get(key) != condition:
+            return False
+    return True
+
+class FakeCursor:
+    def __init__(self, docs, projection):
+        self.docs = docs
+        self.projection = projection or {}
+        self._limit = None
+
+    def sort(self, key_or_list, direction=None):
+        keys = [(key_or_list, direction)] if isinstance(key_or_list, str) else key_or_list
+        for field, field_direction in reversed(keys):
+            self.docs.sort(key=lambda doc: sort_key(doc.get(field)), reverse=field_direction < 0)
+        return self
+
+    def limit(self, count):
+        self._limit = count
+        return self
+
+    def _project(self, doc):
+        included = [field for field, flag in self.projection.items() if flag and field != "_id"]
+        if included:
+            projected = {field: doc[field] for field in included if field in doc}
+            if self.projection.get("_id", 1):
+                projected["_id"] = doc["_id"]
+            return projected
+        return {field: value for field, value in doc.items() if self.projection.get(field, 1)}
+
+    async def to_list(self, length):
+        return [self._project(doc) for doc in self.docs[:self._limit]]
+
+class FakeCollection:
+    def __init__(self, docs=()):
+        self.docs = [dict(doc) for doc in docs]
+        self.bulk_write_calls = 0
+
+    def find(self, query=None, projection=None):
+        return FakeCursor([doc for doc in self.docs if matches(doc, query or {})], projection)
+
+    async def find_one(self, query):
+        return next((dict(doc) for doc in self.docs if matches(doc, query)), None)
+
+    async def update_one(self, query, update, upsert=False):
+        doc = next((doc for doc in self.docs if matches(doc, query)), None)
+        if doc is None:
+            if not upsert:
+                return SimpleNamespace(modified_count=0)
+            doc = dict(query)
+            self.docs.append(doc)
+        doc.update(update.get("$set", {}))
+        for field, amount in update.get("$inc", {}).items():
+            doc[field] = doc.get(field, 0) + amount
+        for field in update.get("$unset", {}):
+            doc.pop(field, None)
+        return SimpleNamespace(modified_count=1)
+
+    async def bulk_write(self, requests, ordered=True):
+        self.bulk_write_calls += 1
+        for request in requests:
+            await self.update_one(request._filter, request._doc)
+
+class FakeDB(dict):
+    def __missing__(self, name):
+        self[name] = FakeCollection()
+        return self[name]
@@ -0,0 +1,127 @@
+import asyncio
+from datetime import datetime
+
+from pymongo.errors import AutoReconnect, BulkWriteError
+
+import credits
+from credits import CreditLogWriter, DUPLICATE_KEY_ERROR
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for doc in self.docs:
+            yield doc
+
+class FakeCreditLogs:
+    """insert_many with a unique index on id and unordered error reporting"""
+
+    def __init__(self):
+        self.docs = {}
+        self.ambiguous_failures = 0
+        self.rejected_ids = set()
+
+    async def insert_many(self, docs, ordered=True):
+        errors = []
+        for index, doc in enumerate(docs):
+            if doc["id"] in self.docs:
+                errors.append({"index": index, "code": DUPLICATE_KEY_ERROR, "errmsg": "duplicate key"})
+            elif doc["id"] in self.rejected_ids:
+                errors.append({"index": index, "code": 121, "errmsg": "Document failed validation"})
+            else:
+                self.docs[doc["id"]] = dict(doc)
+        if self.ambiguous_failures:
+            # Written on the server, but the client never saw the reply
+            self.ambiguous_failures -= 1
+            raise AutoReconnect("connection reset")
+        if errors:
+            raise BulkWriteError({"writeErrors": errors})
+
+    async def update_many(self, query, update):
+        for log_id in query["id"]["$in"]:
+            self.docs[log_id].update(update["$set"])
+
+    def find(self, query, projection=None):
+        ids = set(query["id"]["$in"])
+        return FakeCursor([
+            {"id": doc["id"]} for doc in self.docs.values()
+            if doc["id"] in ids and doc.get(credits.ROLLED_UP_FIELD) is not True
+        ])
+
+class FakeCollection:
+    def __init__(self):
+        self.docs = []
+        self.requests = []
+
+    async def insert_many(self, docs, ordered=True):
+        self.docs.extend(docs)
+
+    async def bulk_write(self, requests, ordered=True):
+        self.requests.extend(requests)
+
+class FakeDB:
+    def __init__(self):
+        self.credit_logs = FakeCreditLogs()
+        self.collections = {}
+
+    def __getitem__(self, name):
+        return self.collections.setdefault(name, FakeCollection())
+
+    def rolled_up_events(self):
+        return sum(
+            request._doc["$inc"]["events"]
+            for request in self[credits.CREDIT_ROLLUPS_COLLECTION].requests
+        )
+
+def _log(log_id):
+    return {
+        "id": log_id, "user_id": "u", "user_email": "u@example.com", "household_id": "h",
+        "event_type": "ocr_textract", "credits_consumed": 1, "timestamp": datetime(2026, 10, 1)
+    }
+
+async def _add_and_flush(writer, logs, flushes=1):
+    for log in logs:
+        await writer.add(log)
+    return [await writer.flush() for _ in range(flushes)]
+
+def test_retry_after_ambiguous_failure_rolls_up_each_log_once():
+    db = FakeDB()
+    db.credit_logs.ambiguous_failures = 1
+    writer = CreditLogWriter(db, max_events=10)
+
+    written = asyncio.run(_add_and_flush(writer, [_log("a"), _log("b")], flushes=2))
+
+    assert written == [0, 2]
+    assert db.rolled_up_events() == 2
+    assert all(doc[credits.ROLLED_UP_FIELD] for doc in db.credit_logs.docs.values())
+
+def test_duplicates_already_rolled_up_are_not_counted_again():
+    db = FakeDB()
+    writer = CreditLogWriter(db, max_events=10)
+
+    async def scenario():
+        await _add_and_flush(writer, [_log("a")])
+        # The same log buffered again, e.g. by a retried request
+        return await _add_and_flush(writer, [_log("a"), _log("b")])
+
+    assert asyncio.run(scenario()) == [1]
+    assert db.rolled_up_events() == 2
+
+def test_rejected_logs_are_dead_lettered_after_max_attempts():
+    db = FakeDB()
+    db.credit_logs.rejected_ids = {"bad"}
+    writer = CreditLogWriter(db, max_events=10, max_attempts=3)
+
+    written = asyncio.run(_add_and_flush(writer, [_log("bad"), _log("good")], flushes=3))
+
+    assert written == [1, 0, 0]
+    dead = db[credits.CREDIT_DEAD_LETTER_COLLECTION].docs
+    assert [doc["log"]["id"] for doc in dead] == ["bad"]
+    assert dead[0]["attempts"] == 3 and dead[0]["error_code"] == 121
+    assert writer._buffer == [] and writer._write_failures == {}
+    assert writer.stats["dead_lettered"] == 1
+    assert db.rolled_up_events() == 1
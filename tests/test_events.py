@@ -0,0 +1,86 @@
+import asyncio
+
+from bson import ObjectId
+from pymongo.errors import OperationFailure
+
+import events
+from events import MongoEventBroker, RECEIPT_EVENTS_COLLECTION
+
+class FakeEvents:
+    """A standalone server's receipt_events: no change streams"""
+
+    def __init__(self):
+        self.docs = []
+
+    async def create_index(self, *args, **kwargs):
+        pass
+
+    def watch(self, pipeline):
+        raise OperationFailure("The $changeStream stage is only supported on replica sets")
+
+    async def insert_one(self, doc):
+        self.docs.append({"_id": ObjectId(), **doc})
+
+    async def find_one(self, query, projection=None, sort=None):
+        return {"_id": self.docs[-1]["_id"]} if self.docs else None
+
+    def find(self, query):
+        matched = [
+            dict(doc) for doc in self.docs
+            if doc["receipt_id"] in query["receipt_id"]["$in"] and doc["_id"] > query["_id"]["$gt"]
+        ]
+        return FakeCursor(matched)
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def sort(self, field, direction):
+        self.docs.sort(key=lambda doc: doc[field], reverse=direction < 0)
+        return self
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for doc in self.docs:
+            yield doc
+
+def test_polling_delivers_each_event_once_in_insert_order(monkeypatch):
+    monkeypatch.setattr(events, "RECEIPT_EVENTS_POLL_SECONDS", 0.01)
+    collection = FakeEvents()
+    db = {RECEIPT_EVENTS_COLLECTION: collection}
+
+    async def scenario():
+        broker = MongoEventBroker(db)
+        await broker.publish({"receipt_id": "r1", "stage": "ocr_started"})
+        await broker.start()
+        subscription = await broker.subscribe("r1")
+        await asyncio.sleep(0.03)
+        # Same wall-clock instant: ordering and dedupe rely on _id alone
+        for stage in ("ocr_done", "llm_done", "saved"):
+            await broker.publish({"receipt_id": "r1", "stage": stage})
+        await broker.publish({"receipt_id": "r2", "stage": "saved"})
+        received = []
+        while (event := await subscription.next(timeout=0.2)) is not None:
+            received.append(event)
+        await broker.stop()
+        return received, broker._tail_task
+
+    received, tail_task = asyncio.run(scenario())
+    assert [event["stage"] for event in received] == ["ocr_done", "llm_done", "saved"]
+    assert all("_id" not in event and "created_date" not in event for event in received)
+    assert tail_task is None
+
+def test_stop_waits_for_the_tail_task():
+    db = {RECEIPT_EVENTS_COLLECTION: FakeEvents()}
+
+    async def scenario():
+        broker = MongoEventBroker(db)
+        await broker.start()
+        task = broker._tail_task
+        await asyncio.sleep(0)
+        await broker.stop()
+        return task.done()
+
+    assert asyncio.run(scenario())
@@ -0,0 +1,19 @@
+import importlib
+
+import pytest
+
+@pytest.mark.parametrize("module", ["functions", "server", "worker"])
+def test_entrypoint_modules_import(module):
+    importlib.import_module(module)
+
+def test_job_handlers_cover_every_job_type():
+    import functions
+    import job_queue
+
+    job_types = {
+        value for name, value in vars(job_queue).items()
+        if name.startswith("JOB_TYPE_")
+    }
+    assert set(functions.JOB_HANDLERS) == job_types
+    assert all(callable(handler) for handler in functions.JOB_HANDLERS.values())
+    assert set(functions.JOB_FAILURE_HANDLERS) <= set(functions.JOB_HANDLERS)
@@ -0,0 +1,85 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from pymongo.errors import OperationFailure
+
+import indexes
+from indexes import IndexCreationError, check_index_errors, ensure_indexes
+
+class FakeLookups:
+    """failed_nutrition_lookups written before its unique index existed"""
+
+    def __init__(self, docs, unique_index=False):
+        self.docs = docs
+        self.unique_index = unique_index
+        self.created = False
+
+    async def index_information(self):
+        info = {"_id_": {"key": [("_id", 1)]}}
+        if self.unique_index:
+            info["normalized_name_1"] = {"key": [("normalized_name", 1)], "unique": True}
+        return info
+
+    def aggregate(self, pipeline, allowDiskUse=False):
+        keep = pipeline[0]["$sort"]
+
+        async def groups():
+            ordered = sorted(self.docs, key=lambda doc: tuple(doc[field] for field in keep), reverse=True)
+            by_name = {}
+            for doc in ordered:
+                by_name.setdefault(doc["normalized_name"], []).append(doc["_id"])
+            for ids in by_name.values():
+                if len(ids) > 1:
+                    yield {"ids": ids, "count": len(ids)}
+        return groups()
+
+    async def delete_many(self, query):
+        before = len(self.docs)
+        self.docs = [doc for doc in self.docs if doc["_id"] not in query["_id"]["$in"]]
+        return SimpleNamespace(deleted_count=before - len(self.docs))
+
+    async def create_indexes(self, models):
+        names = [doc["normalized_name"] for doc in self.docs]
+        if len(names) != len(set(names)):
+            raise OperationFailure("E11000 duplicate key error")
+        self.created = True
+        return ["normalized_name_1"]
+
+@pytest.fixture(autouse=True)
+def no_index_errors(monkeypatch):
+    monkeypatch.setattr(indexes, "_index_errors", {})
+
+def _lookup(doc_id, name, attempted):
+    return {"_id": doc_id, "normalized_name": name, "last_attempt_date": attempted}
+
+def test_duplicates_are_removed_before_the_unique_index_is_built():
+    lookups = FakeLookups([_lookup(1, "kale", 1), _lookup(2, "kale", 3), _lookup(3, "leek", 1)])
+    db = {"failed_nutrition_lookups": lookups}
+
+    result = asyncio.run(ensure_indexes(db, ["failed_nutrition_lookups"]))
+
+    assert result["errors"] == {}
+    assert lookups.created
+    assert sorted(doc["_id"] for doc in lookups.docs) == [2, 3]
+    check_index_errors(required=True)
+
+def test_existing_unique_index_skips_the_dedupe():
+    lookups = FakeLookups([_lookup(1, "kale", 1)], unique_index=True)
+    lookups.aggregate = None
+    db = {"failed_nutrition_lookups": lookups}
+
+    assert asyncio.run(indexes.dedupe_unique_field(db, "failed_nutrition_lookups", "normalized_name", {})) == 0
+
+def test_index_failures_are_reported_and_fail_startup_when_required(monkeypatch):
+    class Conflicting:
+        async def create_indexes(self, models):
+            raise OperationFailure("Index already exists with different options")
+
+    result = asyncio.run(ensure_indexes({"receipts": Conflicting()}, ["receipts"]))
+
+    assert "receipts" in result["errors"]
+    assert "receipts" in indexes.get_index_errors()
+    with pytest.raises(IndexCreationError):
+        check_index_errors(required=True)
+    check_index_errors(required=False)
@@ -0,0 +1,138 @@
+import asyncio
+
+import pytest
+
+import job_queue
+from job_queue import ReceiptWorkerPool
+
+class FakeQueue:
+    """Stands in for the queue operations the pool calls"""
+
+    def __init__(self, jobs):
+        self.jobs = list(jobs)
+        self.completed = []
+        self.failed = []
+        self.released = []
+        self.complete_errors = 0
+        self.renew_result = True
+
+    async def claim(self, db, worker_id, job_types=None):
+        return self.jobs.pop(0) if self.jobs else None
+
+    async def complete(self, db, job, worker_id):
+        if self.complete_errors:
+            self.complete_errors -= 1
+            raise RuntimeError("transient mongo error")
+        self.completed.append(job["id"])
+
+    async def fail(self, db, job, worker_id, error):
+        self.failed.append((job["id"], error))
+        return job["attempts"] < job["max_attempts"]
+
+    async def release(self, db, job, worker_id):
+        self.released.append(job["id"])
+
+    async def renew(self, db, job_id, worker_id):
+        return self.renew_result
+
+@pytest.fixture
+def queue(monkeypatch):
+    fake = FakeQueue([])
+
+    async def no_indexes(db):
+        pass
+
+    monkeypatch.setattr(job_queue, "claim_next_job", fake.claim)
+    monkeypatch.setattr(job_queue, "complete_job", fake.complete)
+    monkeypatch.setattr(job_queue, "fail_job", fake.fail)
+    monkeypatch.setattr(job_queue, "release_job", fake.release)
+    monkeypatch.setattr(job_queue, "renew_job_lease", fake.renew)
+    monkeypatch.setattr(job_queue, "ensure_job_indexes", no_indexes)
+    return fake
+
+def _job(job_id):
+    return {"id": job_id, "job_type": "test", "payload": {}, "attempts": 1, "max_attempts": 5}
+
+async def _drain(pool, until, timeout=5.0):
+    await pool.start()
+    try:
+        deadline = asyncio.get_running_loop().time() + timeout
+        while not until():
+            assert asyncio.get_running_loop().time() < deadline, "pool did not make progress"
+            await asyncio.sleep(0.01)
+    finally:
+        await pool.stop(timeout=1)
+
+def test_worker_survives_a_failure_to_record_completion(queue):
+    queue.jobs = [_job("a"), _job("b")]
+    queue.complete_errors = 1
+
+    async def handler(payload, db):
+        return None
+
+    pool = ReceiptWorkerPool(None, {"test": handler}, concurrency=1, poll_interval=0.01)
+    asyncio.run(_drain(pool, lambda: queue.completed == ["b"]))
+    assert pool.stats["worker_errors"] == 1
+    assert pool.stats["succeeded"] == 1
+
+def test_handler_errors_are_recorded_as_failed_attempts(queue):
+    queue.jobs = [_job("a")]
+
+    async def handler(payload, db):
+        raise ValueError("bad receipt")
+
+    pool = ReceiptWorkerPool(None, {"test": handler}, concurrency=1, poll_interval=0.01)
+    asyncio.run(_drain(pool, lambda: bool(queue.failed)))
+    assert queue.failed == [("a", "bad receipt")]
+    assert pool.stats["retried"] == 1
+
+def test_lost_lease_abandons_the_job(queue, monkeypatch):
+    # Renewal runs every max(lease / 3, 1) seconds
+    monkeypatch.setattr(job_queue, "JOB_LEASE_SECONDS", 3)
+    queue.jobs = [_job("a")]
+    queue.renew_result = False
+    cancelled = asyncio.Event()
+
+    async def handler(payload, db):
+        try:
+            await asyncio.sleep(30)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    pool = ReceiptWorkerPool(None, {"test": handler}, concurrency=1, poll_interval=0.01)
+    asyncio.run(_drain(pool, lambda: pool.stats["lease_lost"] == 1))
+    assert cancelled.is_set()
+    assert queue.completed == [] and queue.failed == [] and queue.released == []
+
+def test_stopping_mid_job_releases_it(queue):
+    queue.jobs = [_job("a")]
+    started = asyncio.Event()
+
+    async def handler(payload, db):
+        started.set()
+        await asyncio.sleep(30)
+
+    async def scenario():
+        pool = ReceiptWorkerPool(None, {"test": handler}, concurrency=1, poll_interval=0.01)
+        await pool.start()
+        await asyncio.wait_for(started.wait(), timeout=1)
+        await pool.stop(timeout=0.05)
+
+    asyncio.run(scenario())
+    assert queue.released == ["a"]
+
+def test_failure_handler_runs_only_after_the_last_attempt(queue):
+    queue.jobs = [_job("a"), {**_job("b"), "attempts": 5}]
+    failures = []
+
+    async def handler(payload, db):
+        raise ValueError("bad receipt")
+
+    async def on_failed(payload, db, error):
+        failures.append(error)
+
+    pool = ReceiptWorkerPool(None, {"test": handler}, concurrency=1, poll_interval=0.01, failure_handlers={"test": on_failed})
+    asyncio.run(_drain(pool, lambda: len(queue.failed) == 2))
+    assert failures == ["bad receipt"]
+    assert pool.stats["retried"] == 1 and pool.stats["failed"] == 1
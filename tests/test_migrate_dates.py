@@ -0,0 +1,59 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+
+import migrate_dates
+from migrate_dates import MIGRATION_STATE_COLLECTION, migrate_collection, parse_stored_date
+from tests.fake_mongo import FakeDB
+
+def _receipts(count):
+    return [
+        {"_id": i, "id": f"r{i}", "created_date": f"2025-06-{i + 1:02d}T08:00:00.123456", "updated_date": datetime(2026, 1, 1)}
+        for i in range(count)
+    ]
+
+def test_parse_stored_date_normalises_to_naive_utc():
+    assert parse_stored_date("2025-06-01T10:00:00+02:00") == datetime(2025, 6, 1, 8, 0)
+    assert parse_stored_date("2025-06-01T08:00:00Z") == datetime(2025, 6, 1, 8, 0)
+    assert parse_stored_date("yesterday") is None
+
+def test_interrupted_migration_resumes_from_its_checkpoint():
+    db = FakeDB()
+    db["receipts"].docs = _receipts(7)
+    fields = migrate_dates.DATE_FIELDS["receipts"]
+    bulk_write = db["receipts"].bulk_write
+
+    async def fail_third_batch(requests, ordered=True):
+        if db["receipts"].bulk_write_calls == 2:
+            raise RuntimeError("connection lost")
+        await bulk_write(requests, ordered)
+
+    db["receipts"].bulk_write = fail_third_batch
+    with pytest.raises(RuntimeError):
+        asyncio.run(migrate_collection(db, "receipts", fields, batch_size=2))
+    checkpoint = asyncio.run(db[MIGRATION_STATE_COLLECTION].find_one({"_id": "native_dates:receipts"}))
+    assert checkpoint["last_id"] == 3 and checkpoint["converted"] == 4
+
+    db["receipts"].bulk_write = bulk_write
+    totals = asyncio.run(migrate_collection(db, "receipts", fields, batch_size=2))
+
+    # Only the documents after the checkpoint are scanned again
+    assert totals == {"scanned": 3, "converted": 3, "unparseable": 0}
+    assert all(isinstance(doc["created_date"], datetime) for doc in db["receipts"].docs)
+    assert db["receipts"].docs[0]["created_date"] == datetime(2025, 6, 1, 8, 0, 0, 123456)
+    state = asyncio.run(db[MIGRATION_STATE_COLLECTION].find_one({"_id": "native_dates:receipts"}))
+    assert "last_id" not in state and state["converted"] == 7 and "completed_date" in state
+
+def test_finished_migration_only_rescans_stragglers_and_counts_unparseable():
+    db = FakeDB()
+    db["receipts"].docs = _receipts(3)
+    fields = migrate_dates.DATE_FIELDS["receipts"]
+    asyncio.run(migrate_collection(db, "receipts", fields, batch_size=10))
+
+    db["receipts"].docs.append({"_id": 10, "id": "late", "created_date": "2026-02-01T09:00:00", "updated_date": "soon"})
+    totals = asyncio.run(migrate_collection(db, "receipts", fields, batch_size=10))
+
+    assert totals == {"scanned": 1, "converted": 1, "unparseable": 1}
+    assert db["receipts"].docs[-1]["created_date"] == datetime(2026, 2, 1, 9, 0)
+    assert db["receipts"].docs[-1]["updated_date"] == "soon"
@@ -0,0 +1,26 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from functions import _negative_result
+
+def test_recent_failure_is_a_cached_not_found():
+    failed = {"canonical_name": "Quark", "last_attempt_date": datetime.utcnow(), "attempt_count": 1}
+
+    result = _negative_result(failed, "quark")
+
+    assert result["status"] == "not_found"
+    assert result["canonical_name"] == "Quark"
+
+def test_failure_past_its_backoff_has_expired():
+    failed = {"last_attempt_date": datetime.utcnow() - timedelta(days=365), "attempt_count": 1}
+
+    assert _negative_result(failed, "quark") is None
+
+@pytest.mark.parametrize("last_attempt", [None, "2025-06-01T08:00:00.123456", "not a date"])
+def test_missing_or_legacy_attempt_dates_are_treated_as_expired(last_attempt):
+    failed = {"attempt_count": 2}
+    if last_attempt is not None:
+        failed["last_attempt_date"] = last_attempt
+
+    assert _negative_result(failed, "quark") is None
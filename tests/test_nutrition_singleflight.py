@@ -0,0 +1,123 @@
+import asyncio
+
+import pytest
+
+import functions
+
+@pytest.fixture(autouse=True)
+def empty_nutrition_cache():
+    functions._nutrition_memory_cache.clear()
+    functions._nutrition_inflight.clear()
+    yield
+    functions._nutrition_memory_cache.clear()
+    functions._nutrition_inflight.clear()
+
+def _success(name):
+    return {"status": "success", "canonical_name": name, "calories": 52.0}
+
+def test_follower_takes_over_when_leader_is_cancelled(monkeypatch):
+    calls = []
+
+    async def resolve(canonical_name, normalized, household_id, db, user_email):
+        calls.append(canonical_name)
+        if len(calls) == 1:
+            await asyncio.sleep(10)
+        return _success(canonical_name)
+
+    monkeypatch.setattr(functions, "_resolve_nutrition", resolve)
+
+    async def scenario():
+        leader = asyncio.create_task(functions.get_nutrition_cached("apple", "h"))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(functions.get_nutrition_cached("apple", "h"))
+        await asyncio.sleep(0)
+        leader.cancel()
+        result = await asyncio.wait_for(follower, timeout=1)
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return result
+
+    result = asyncio.run(scenario())
+    assert result["status"] == "success"
+    assert len(calls) == 2
+    assert functions._nutrition_inflight == {}
+
+def test_cancelled_follower_does_not_cancel_shared_lookup(monkeypatch):
+    release = None
+
+    async def resolve(canonical_name, normalized, household_id, db, user_email):
+        await release.wait()
+        return _success(canonical_name)
+
+    monkeypatch.setattr(functions, "_resolve_nutrition", resolve)
+
+    async def scenario():
+        nonlocal release
+        release = asyncio.Event()
+        leader = asyncio.create_task(functions.get_nutrition_cached("pear", "h"))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(functions.get_nutrition_cached("pear", "h"))
+        await asyncio.sleep(0)
+        follower.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        return await asyncio.wait_for(leader, timeout=1), follower.cancelled()
+
+    result, follower_cancelled = asyncio.run(scenario())
+    assert result["status"] == "success"
+    assert follower_cancelled
+
+def test_leader_failure_reaches_followers(monkeypatch):
+    async def resolve(canonical_name, normalized, household_id, db, user_email):
+        await asyncio.sleep(0.01)
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(functions, "_resolve_nutrition", resolve)
+
+    async def scenario():
+        return await asyncio.gather(
+            functions.get_nutrition_cached("plum", "h"),
+            functions.get_nutrition_cached("plum", "h"),
+            return_exceptions=True
+        )
+
+    results = asyncio.run(scenario())
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+def test_batcher_resolves_waiters_when_batch_is_cancelled(monkeypatch):
+    async def slow_batch(names):
+        await asyncio.sleep(10)
+        return {}
+
+    monkeypatch.setattr(functions, "calorie_ninjas_nutrition_batch_real", slow_batch)
+
+    async def scenario():
+        batcher = functions.NutritionBatcher(window_seconds=0, max_names=1)
+        waiter = asyncio.create_task(batcher.fetch("kiwi"))
+        await asyncio.sleep(0.01)
+        assert len(batcher._tasks) == 1
+        for task in list(batcher._tasks):
+            task.cancel()
+        result = await asyncio.wait_for(waiter, timeout=1)
+        await batcher.stop()
+        return result, batcher._tasks
+
+    result, tasks = asyncio.run(scenario())
+    assert result["status"] == "error"
+    assert not tasks
+
+def test_batcher_stop_waits_for_running_batches(monkeypatch):
+    async def batch(names):
+        await asyncio.sleep(0.01)
+        return {functions.normalize_canonical_name(name): _success(name) for name in names}
+
+    monkeypatch.setattr(functions, "calorie_ninjas_nutrition_batch_real", batch)
+
+    async def scenario():
+        batcher = functions.NutritionBatcher(window_seconds=10, max_names=50)
+        waiter = asyncio.create_task(batcher.fetch("fig"))
+        await asyncio.sleep(0)
+        await batcher.stop()
+        return waiter.done() and waiter.result()
+
+    assert asyncio.run(scenario())["status"] == "success"
@@ -0,0 +1,61 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+import pagination
+from pagination import decode_cursor, encode_cursor, fetch_page
+from tests.fake_mongo import FakeCollection
+
+@pytest.mark.parametrize("value", [datetime(2026, 3, 1, 12, 30, 15, 123456), "2026-03-01T12:30:15", None])
+def test_cursor_round_trips_value_type_and_id(value):
+    assert decode_cursor(encode_cursor(value, "doc-9")) == (value, "doc-9")
+
+@pytest.mark.parametrize("cursor", [
+    "not-a-cursor",
+    "",
+    encode_cursor("x", "id")[:-3],
+    # Well-formed base64 JSON that encode_cursor would never produce
+    "eyJ0IjoiaW50IiwidiI6MSwiaWQiOiJhIn0",
+    "eyJ0Ijoic3RyIiwidiI6IngiLCJpZCI6MX0"
+])
+def test_malformed_cursors_are_rejected(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+def _all_pages(collection, limit):
+    async def walk():
+        pages, cursor = [], None
+        while True:
+            page = await fetch_page(collection, {}, "created_date", cursor, limit)
+            pages.append([doc["id"] for doc in page["items"]])
+            cursor = page["next_cursor"]
+            if cursor is None:
+                return pages
+    return asyncio.run(walk())
+
+def test_pages_cover_every_document_once_across_ties_and_legacy_values():
+    start = datetime(2026, 1, 1)
+    docs = [{"id": f"d{i:02d}", "created_date": start + timedelta(minutes=i // 3)} for i in range(12)]
+    # Written before native dates, or without a timestamp at all
+    docs += [{"id": f"s{i}", "created_date": "2025-12-31T00:00:00"} for i in range(3)]
+    docs += [{"id": f"n{i}", "created_date": None} for i in range(2)]
+    collection = FakeCollection([{"_id": index, **doc} for index, doc in enumerate(docs)])
+
+    pages = _all_pages(collection, limit=4)
+
+    ids = [doc_id for page in pages for doc_id in page]
+    assert sorted(ids) == sorted(doc["id"] for doc in docs)
+    assert len(ids) == len(set(ids))
+    assert all(len(page) == 4 for page in pages[:-1])
+    # Newest first, and dates before legacy strings before missing values
+    assert ids[:3] == ["d11", "d10", "d09"]
+    assert ids[-5:] == ["s2", "s1", "s0", "n1", "n0"]
+
+def test_page_size_is_clamped(monkeypatch):
+    monkeypatch.setattr(pagination, "MAX_PAGE_SIZE", 5)
+    collection = FakeCollection([{"_id": i, "id": f"d{i:02d}", "created_date": datetime(2026, 1, 1)} for i in range(8)])
+
+    pages = _all_pages(collection, limit=50)
+
+    assert [len(page) for page in pages] == [5, 3]
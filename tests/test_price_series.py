@@ -0,0 +1,48 @@
+import asyncio
+from types import SimpleNamespace
+
+import price_series
+from price_series import PRICE_BUCKETS_COLLECTION, pull_receipt_observations
+
+class FakeBuckets:
+    def __init__(self, bucket_ids):
+        self.bucket_ids = bucket_ids
+        self.calls = []
+
+    def find(self, query, projection=None):
+        self.calls.append(("find", query))
+
+        async def cursor():
+            for bucket_id in self.bucket_ids:
+                yield {"_id": bucket_id}
+        return cursor()
+
+    async def update_many(self, query, update):
+        self.calls.append(("update_many", query, update))
+        return SimpleNamespace(modified_count=len(self.bucket_ids))
+
+    async def delete_many(self, query):
+        self.calls.append(("delete_many", query))
+
+def test_pull_removes_receipts_from_every_bucket_they_appear_in():
+    buckets = FakeBuckets(["b1", "b2"])
+    db = {PRICE_BUCKETS_COLLECTION: buckets}
+
+    assert asyncio.run(pull_receipt_observations(db, ["r1"])) == 2
+
+    (_, find_query), (_, update_query, pipeline), (_, delete_query) = buckets.calls
+    assert find_query == {"receipt_ids": {"$in": ["r1"]}}
+    assert update_query == {"_id": {"$in": ["b1", "b2"]}}
+    assert delete_query == {**update_query, "count": 0}
+    keep = pipeline[0]["$set"]["_keep"]["$filter"]["cond"]["$not"][0]["$in"][1]
+    assert keep == {"$literal": ["r1"]}
+    assert set(pipeline[1]["$set"]) == set(price_series.BUCKET_ARRAY_FIELDS)
+    assert set(price_series.BUCKET_STATS) <= set(pipeline[2]["$set"])
+
+def test_pull_without_receipts_or_buckets_writes_nothing():
+    buckets = FakeBuckets([])
+    db = {PRICE_BUCKETS_COLLECTION: buckets}
+
+    assert asyncio.run(pull_receipt_observations(db, [])) == 0
+    assert asyncio.run(pull_receipt_observations(db, ["r1"])) == 0
+    assert [call[0] for call in buckets.calls] == ["find"]
@@ -0,0 +1,62 @@
+import asyncio
+
+import pytest
+
+import functions
+
+class FakeReceipts:
+    def __init__(self):
+        self.updates = []
+
+    async def update_one(self, query, update):
+        self.updates.append(update["$set"])
+
+@pytest.fixture
+def failing_pipeline(monkeypatch):
+    events = []
+
+    async def failing_ocr(image_urls):
+        raise RuntimeError("textract unavailable")
+
+    async def publish(receipt_id, stage, **details):
+        events.append(stage)
+
+    monkeypatch.setattr(functions, "textract_ocr_real", failing_ocr)
+    monkeypatch.setattr(functions, "publish_receipt_event", publish)
+    return events
+
+def _payload():
+    return {
+        "receipt_id": "r1", "image_urls": ["/uploads/r1.jpg"], "store_name": "Tesco",
+        "total_amount": 12.5, "household_id": "h", "user_email": "u@example.com"
+    }
+
+def test_failed_attempt_with_retries_left_keeps_the_receipt_processing(failing_pipeline):
+    db = type("DB", (), {"receipts": FakeReceipts()})()
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(functions.run_process_receipt_job(_payload(), db))
+
+    assert failing_pipeline == [functions.STAGE_OCR_STARTED, functions.STAGE_RETRYING]
+    assert db.receipts.updates == [{"processing_error": "textract unavailable"}]
+
+def test_last_failed_attempt_marks_the_receipt_errored(failing_pipeline):
+    db = type("DB", (), {"receipts": FakeReceipts()})()
+
+    asyncio.run(functions.fail_process_receipt_job(_payload(), db, "textract unavailable"))
+
+    assert failing_pipeline == [functions.STAGE_ERROR]
+    assert db.receipts.updates == [{"validation_status": "error", "processing_error": "textract unavailable"}]
+
+def test_direct_calls_still_mark_the_receipt_errored(failing_pipeline):
+    db = type("DB", (), {"receipts": FakeReceipts()})()
+    payload = _payload()
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(functions.process_receipt_in_background(
+            payload["receipt_id"], payload["image_urls"], payload["store_name"],
+            payload["total_amount"], payload["household_id"], payload["user_email"], db
+        ))
+
+    assert failing_pipeline[-1] == functions.STAGE_ERROR
+    assert db.receipts.updates[-1]["validation_status"] == "error"
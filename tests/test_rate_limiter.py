@@ -0,0 +1,25 @@
+import asyncio
+import time
+
+from functions import RateLimiter
+
+def test_requests_larger_than_the_burst_pay_every_token():
+    limiter = RateLimiter(100, burst=10)
+
+    async def scenario():
+        started = time.monotonic()
+        waited = [await limiter.acquire(50), await limiter.acquire(50)]
+        return time.monotonic() - started, waited
+
+    elapsed, waited = asyncio.run(scenario())
+    # 100 tokens with 10 in the bucket: 90 more at 100 per second
+    assert 0.85 <= elapsed < 1.5
+    assert abs(sum(waited) - elapsed) < 0.05
+
+def test_requests_within_the_bucket_do_not_wait():
+    limiter = RateLimiter(5)
+
+    assert asyncio.run(limiter.acquire(5)) < 0.01
+
+def test_zero_rate_disables_limiting():
+    assert asyncio.run(RateLimiter(0).acquire(1000)) == 0.0
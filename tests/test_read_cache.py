@@ -0,0 +1,89 @@
+import asyncio
+
+from read_cache import ReadCache, ENTITY_RECEIPT, receipt_cacheable
+
+def test_load_overtaken_by_invalidation_is_not_cached():
+    cache = ReadCache(enabled=True)
+    loaded = None
+
+    async def scenario():
+        nonlocal loaded
+        loaded = asyncio.Event()
+        release = asyncio.Event()
+
+        async def stale_loader():
+            loaded.set()
+            await release.wait()
+            return {"total_amount": 10}
+
+        load = asyncio.create_task(cache.get_or_load(ENTITY_RECEIPT, "r1", stale_loader))
+        await loaded.wait()
+        # The write lands and invalidates while the old document is in flight
+        cache.invalidate(ENTITY_RECEIPT, "r1")
+        release.set()
+        stale = await load
+
+        async def fresh_loader():
+            return {"total_amount": 12}
+
+        return stale, await cache.get_or_load(ENTITY_RECEIPT, "r1", fresh_loader)
+
+    stale, fresh = asyncio.run(scenario())
+    assert stale == {"total_amount": 10}
+    assert fresh == {"total_amount": 12}
+    assert cache.counters[ENTITY_RECEIPT]["stale_loads"] == 1
+    assert cache._generations == {} and cache._loads == {}
+
+def test_loads_are_cached_until_invalidated():
+    cache = ReadCache(enabled=True)
+    calls = []
+
+    async def loader():
+        calls.append(1)
+        return {"id": "r1"}
+
+    async def scenario():
+        await cache.get_or_load(ENTITY_RECEIPT, "r1", loader)
+        await cache.get_or_load(ENTITY_RECEIPT, "r1", loader)
+        cache.invalidate(ENTITY_RECEIPT, "r1")
+        await cache.get_or_load(ENTITY_RECEIPT, "r1", loader)
+
+    asyncio.run(scenario())
+    assert len(calls) == 2
+    assert cache.counters[ENTITY_RECEIPT]["hits"] == 1
+
+def test_clear_discards_loads_in_flight():
+    cache = ReadCache(enabled=True)
+
+    async def scenario():
+        release = asyncio.Event()
+
+        async def loader():
+            await release.wait()
+            return {"id": "r1"}
+
+        load = asyncio.create_task(cache.get_or_load(ENTITY_RECEIPT, "r1", loader))
+        await asyncio.sleep(0)
+        cache.clear()
+        release.set()
+        await load
+
+    asyncio.run(scenario())
+    assert cache.backend.stats()["size"] == 0
+
+def test_receipts_still_processing_are_not_cached():
+    cache = ReadCache(enabled=True)
+    receipt = {"id": "r1", "validation_status": "processing_background"}
+
+    async def loader():
+        return dict(receipt)
+
+    async def read():
+        return await cache.get_or_load(ENTITY_RECEIPT, "r1", loader, cacheable=receipt_cacheable)
+
+    assert asyncio.run(read())["validation_status"] == "processing_background"
+    # Saved by a worker in another process, which cannot invalidate this cache
+    receipt["validation_status"] = "review_insights"
+    assert asyncio.run(read())["validation_status"] == "review_insights"
+    receipt["validation_status"] = "validated"
+    assert asyncio.run(read())["validation_status"] == "review_insights"
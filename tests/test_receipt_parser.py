@@ -0,0 +1,75 @@
+import pytest
+
+import receipt_parser
+from receipt_parser import get_store_profile, try_fast_path
+
+def _items(result):
+    return [
+        (item["canonical_name"], item["quantity"], item["unit_price"], item["total_price"], item["discount_applied"])
+        for item in result["items"]
+    ]
+
+# (store, OCR lines, receipt total, expected (canonical name, quantity, unit price, line total, discounted))
+FAST_PATH_CASES = {
+    "totals reconcile": (
+        "Tesco Extra",
+        ["TESCO STORES LTD", "SEMI SKIMMED MILK 2L 1.45", "WHITE BREAD 800G 1.10", "TOTAL 2.55", "VISA 2.55"],
+        2.55,
+        [("Semi Skimmed Milk", 1.0, 1.45, 1.45, False), ("White Bread", 1.0, 1.10, 1.10, False)]
+    ),
+    "quantity prefix": (
+        "Aldi",
+        ["2 x BANANAS 0.90", "TOTAL 0.90"],
+        0.90,
+        [("Bananas", 2.0, 0.45, 0.90, False)]
+    ),
+    "quantity line before the item": (
+        "Lidl",
+        ["3 x £0.50", "APPLES 1.50", "TOTAL 1.50"],
+        1.50,
+        [("Apples", 3.0, 0.50, 1.50, False)]
+    ),
+    "store discount line": (
+        "Tesco",
+        ["MATURE CHEDDAR 3.00", "CLUBCARD PRICE -0.50", "TOTAL 2.50"],
+        2.50,
+        [("Mature Cheddar", 1.0, 3.00, 2.50, True)]
+    ),
+    "multi-buy saving with trailing minus": (
+        "Sainsbury's",
+        ["2 x PASTA 500G 2.00", "MULTIBUY SAVING 0.75-", "ORANGE JUICE 1L 1.25", "BALANCE DUE 2.50"],
+        2.50,
+        [("Pasta", 2.0, 1.00, 1.25, True), ("Orange Juice", 1.0, 1.25, 1.25, False)]
+    )
+}
+
+@pytest.mark.parametrize("store, lines, total, expected", FAST_PATH_CASES.values(), ids=FAST_PATH_CASES.keys())
+def test_fast_path_extracts_reconciled_receipts(store, lines, total, expected):
+    result = try_fast_path(lines, store, total, "GBP")
+
+    assert result is not None
+    assert _items(result) == expected
+    assert result["parser"]["profile"] == get_store_profile(store)
+
+# (store, OCR lines, receipt total, parser_stats counter for the fallback)
+FALLBACK_CASES = {
+    "no priced lines": ("Tesco", ["TESCO STORES LTD", "THANK YOU FOR SHOPPING"], 5.00, "fallback_no_items"),
+    "items do not sum to the total": ("Asda", ["CHICKEN BREAST 4.50", "RICE 1KG 1.20"], 7.00, "fallback_unreconciled"),
+    "printed total disagrees": ("Asda", ["CHICKEN BREAST 4.50", "TOTAL 5.70"], 4.50, "fallback_unreconciled"),
+    "discount with no item to apply to": ("Tesco", ["CLUBCARD PRICE -1.00", "MILK 1.00"], 1.00, "fallback_low_confidence"),
+    "unknown store without a discount profile": ("Corner Shop", ["CRISPS 1.00", "NECTAR PRICE 0.20"], 0.80, "fallback_unreconciled")
+}
+
+@pytest.mark.parametrize("store, lines, total, reason", FALLBACK_CASES.values(), ids=FALLBACK_CASES.keys())
+def test_receipts_the_parser_cannot_settle_fall_back_to_the_llm(monkeypatch, store, lines, total, reason):
+    monkeypatch.setattr(receipt_parser, "parser_stats", dict.fromkeys(receipt_parser.parser_stats, 0))
+
+    assert try_fast_path(lines, store, total, "GBP") is None
+    assert receipt_parser.parser_stats[reason] == 1
+    assert receipt_parser.parser_stats["fast_path_hits"] == 0
+
+def test_local_insights_report_savings():
+    result = try_fast_path(["MATURE CHEDDAR 3.00", "CLUBCARD PRICE -0.50", "TOTAL 2.50"], "Tesco", 2.50, "GBP")
+
+    assert "Savings from offers: GBP 0.50" in result["receipt_insights"]["highlights"]
+    assert result["receipt_insights"]["category_totals"] == {"Dairy": 2.50}
@@ -0,0 +1,54 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+import functions
+
+class StubTextract:
+    """detect_document_text echoing the image bytes, slower for earlier pages"""
+
+    def __init__(self, pages):
+        self.pages = pages
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def detect_document_text(self, Document):
+        text = Document["Bytes"].decode()
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            # Later pages finish first, so ordering cannot come from completion
+            time.sleep(0.01 * (self.pages - int(text.split()[-1])))
+            return {"Blocks": [{"BlockType": "LINE", "Text": text, "Confidence": 99.0}]}
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+@pytest.fixture
+def textract(monkeypatch, tmp_path):
+    pages = 7
+    for page in range(pages):
+        (tmp_path / f"receipt-{page}.jpg").write_bytes(f"page {page}".encode())
+    stub = StubTextract(pages)
+    monkeypatch.setattr(functions, "UPLOAD_DIR", tmp_path)
+    monkeypatch.setattr(functions, "TEXTRACT_MAX_CONCURRENCY", 3)
+    monkeypatch.setattr(functions, "_textract_executor", None)
+    monkeypatch.setattr(functions, "_textract_client", None)
+    functions.set_textract_client(stub)
+    yield stub
+    if functions._textract_executor is not None:
+        functions._textract_executor.shutdown(wait=True)
+
+def test_pages_come_back_in_order_within_the_concurrency_bound(textract):
+    image_urls = [f"/uploads/receipt-{page}.jpg" for page in range(textract.pages)]
+
+    result = asyncio.run(functions.textract_ocr_real(image_urls))
+
+    assert result["status"] == "success"
+    assert [page["page"] for page in result["results"]] == list(range(textract.pages))
+    assert [page["detected_lines"] for page in result["results"]] == [[f"page {page}"] for page in range(textract.pages)]
+    assert 1 < textract.max_in_flight <= functions.TEXTRACT_MAX_CONCURRENCY